@@ -2,13 +2,36 @@
 
 from __future__ import annotations
 
+import hashlib
+import heapq
+import json
 import math
 import random
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Set, Tuple
+from functools import lru_cache
+from itertools import starmap
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    FrozenSet,
+    Generator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+if TYPE_CHECKING:
+    from catan_profile import GameProfiler
 
 
 RESOURCES = ["wood", "brick", "sheep", "wheat", "ore"]
+# Every kind of tile in a fixed order; saves and board arrays store a tile as its index here.
+TILE_KINDS = tuple(RESOURCES) + ("desert",)
 RESOURCE_COUNTS = {
     "wood": 4,
     "brick": 3,
@@ -22,6 +45,12 @@ NUMBER_TOKENS = [2, 3, 3, 4, 4, 5, 5, 6, 6, 8, 8, 9, 9, 10, 10, 11, 11, 12]
 ROAD_COST = {"wood": 1, "brick": 1}
 SETTLEMENT_COST = {"wood": 1, "brick": 1, "sheep": 1, "wheat": 1}
 CITY_COST = {"wheat": 2, "ore": 3}
+WINNING_POINTS = 10
+LONGEST_ROAD_MIN = 5
+LONGEST_ROAD_POINTS = 2
+BUILD_KINDS = ("road", "settlement", "city")
+# Pips on a number token: the ways two dice roll it out of 36. No token carries a 7.
+PIPS = (0, 0, 1, 2, 3, 4, 5, 0, 5, 4, 3, 2, 1)
 
 
 def axial_hexes(radius: int = 2) -> List[Tuple[int, int]]:
@@ -40,8 +69,328 @@ def hex_center(q: int, r: int) -> Tuple[float, float]:
     return x, y
 
 
-def key_point(x: float, y: float) -> Tuple[int, int]:
-    return (round(x * 1000), round(y * 1000))
+# Corner i of a hex (at 30 + 60 * i degrees, as hex_center lays tiles out) relative to its
+# center, in axial units of 1/3. Corners are then exact integer points 3 * (q, r) + offset,
+# so tiles that share a corner compute the identical key with no trig or rounding.
+CORNER_OFFSETS = ((1, 1), (-1, 2), (-2, 1), (-1, -1), (1, -2), (2, -1))
+
+
+def resource_counts(num_tiles: int) -> Dict[str, int]:
+    """Tile count per resource for a board of num_tiles, in the proportions of the base game."""
+    deserts = max(1, round(num_tiles * RESOURCE_COUNTS["desert"] / 19))
+    weights = {res: count for res, count in RESOURCE_COUNTS.items() if res != "desert"}
+    counts = _apportion(weights, num_tiles - deserts)
+    counts["desert"] = deserts
+    return counts
+
+
+def number_tokens(count: int) -> List[int]:
+    """count number tokens: whole copies of the base set, topped up with evenly spread picks from it."""
+    copies, extra = divmod(count, len(NUMBER_TOKENS))
+    tokens = NUMBER_TOKENS * copies
+    tokens.extend(NUMBER_TOKENS[(2 * i + 1) * len(NUMBER_TOKENS) // (2 * extra)] for i in range(extra))
+    return tokens
+
+
+@lru_cache(maxsize=None)
+def board_deck(num_tiles: int) -> Tuple[Tuple[str, ...], Tuple[int, ...]]:
+    """The unshuffled resource tiles and number tokens for a board of num_tiles, built once per size."""
+    resources: List[str] = []
+    for res, count in resource_counts(num_tiles).items():
+        resources.extend([res] * count)
+    return tuple(resources), tuple(number_tokens(len(resources) - resources.count("desert")))
+
+
+def _apportion(weights: Dict[str, int], total: int) -> Dict[str, int]:
+    """Split total in proportion to weights by largest remainder; ties go to the earlier key."""
+    scale = sum(weights.values())
+    counts = {key: total * w // scale for key, w in weights.items()}
+    by_remainder = sorted(weights, key=lambda key: -(total * weights[key] % scale))
+    for key in by_remainder[: total - sum(counts.values())]:
+        counts[key] += 1
+    return counts
+
+
+@dataclass(frozen=True)
+class BoardTopology:
+    """The node/edge graph of a board, which never depends on the resource shuffle.
+
+    Built once per radius by `board_topology()` and shared by every game; tile i
+    sits at coords[i], the *_masks tables feed `BoardBits`, and node_rows /
+    edge_rows are the constructor arguments for each game's Node and Edge objects.
+    """
+
+    radius: int
+    coords: Tuple[Tuple[int, int], ...]
+    tile_nodes: Tuple[Tuple[int, ...], ...]
+    node_points: Tuple[Tuple[int, int], ...]
+    node_hexes: Tuple[Tuple[int, ...], ...]
+    node_edges: Tuple[FrozenSet[int], ...]
+    node_neighbors: Tuple[FrozenSet[int], ...]
+    edge_ends: Tuple[Tuple[int, int], ...]
+    node_nbr_masks: Tuple[int, ...]
+    node_edge_masks: Tuple[int, ...]
+    edge_node_masks: Tuple[int, ...]
+    edge_nbr_masks: Tuple[int, ...]
+    tile_node_masks: Tuple[int, ...]
+    node_links: Tuple[Tuple[Tuple[int, int], ...], ...]
+    node_rows: Tuple[tuple, ...]
+    edge_rows: Tuple[Tuple[int, int, int], ...]
+
+
+@lru_cache(maxsize=None)
+def board_topology(radius: int = 2) -> BoardTopology:
+    coords = axial_hexes(radius)
+    node_index_by_point: Dict[Tuple[int, int], int] = {}
+    edge_index_by_pair: Dict[Tuple[int, int], int] = {}
+    node_points: List[Tuple[int, int]] = []
+    node_hexes: List[List[int]] = []
+    edge_ends: List[Tuple[int, int]] = []
+    tile_nodes: List[Tuple[int, ...]] = []
+
+    for idx, (q, r) in enumerate(coords):
+        corner_ids: List[int] = []
+        for dq, dr in CORNER_OFFSETS:
+            k = (3 * q + dq, 3 * r + dr)
+            if k not in node_index_by_point:
+                node_index_by_point[k] = len(node_points)
+                node_points.append(k)
+                node_hexes.append([])
+            nidx = node_index_by_point[k]
+            corner_ids.append(nidx)
+            node_hexes[nidx].append(idx)
+        tile_nodes.append(tuple(corner_ids))
+
+        for i in range(6):
+            a = corner_ids[i]
+            b = corner_ids[(i + 1) % 6]
+            pair = (a, b) if a < b else (b, a)
+            if pair not in edge_index_by_pair:
+                edge_index_by_pair[pair] = len(edge_ends)
+                edge_ends.append(pair)
+
+    node_edges: List[Set[int]] = [set() for _ in node_points]
+    node_neighbors: List[Set[int]] = [set() for _ in node_points]
+    for eidx, (a, b) in enumerate(edge_ends):
+        node_edges[a].add(eidx)
+        node_edges[b].add(eidx)
+        node_neighbors[a].add(b)
+        node_neighbors[b].add(a)
+
+    def mask(ids) -> int:
+        out = 0
+        for i in ids:
+            out |= 1 << i
+        return out
+
+    node_edge_masks = tuple(mask(edges) for edges in node_edges)
+    frozen_hexes = tuple(tuple(h) for h in node_hexes)
+    frozen_edges = tuple(frozenset(e) for e in node_edges)
+    return BoardTopology(
+        radius=radius,
+        coords=tuple(coords),
+        tile_nodes=tuple(tile_nodes),
+        node_points=tuple(node_points),
+        node_hexes=frozen_hexes,
+        node_edges=frozen_edges,
+        node_neighbors=tuple(frozenset(n) for n in node_neighbors),
+        edge_ends=tuple(edge_ends),
+        node_nbr_masks=tuple(mask(n) for n in node_neighbors),
+        node_edge_masks=node_edge_masks,
+        edge_node_masks=tuple(mask(pair) for pair in edge_ends),
+        edge_nbr_masks=tuple(
+            (node_edge_masks[a] | node_edge_masks[b]) & ~(1 << eidx) for eidx, (a, b) in enumerate(edge_ends)
+        ),
+        tile_node_masks=tuple(mask(corners) for corners in tile_nodes),
+        node_links=tuple(
+            tuple((1 << eidx, edge_ends[eidx][0] + edge_ends[eidx][1] - nidx) for eidx in sorted(edges))
+            for nidx, edges in enumerate(node_edges)
+        ),
+        node_rows=tuple(zip(range(len(node_points)), node_points, frozen_hexes, frozen_edges)),
+        edge_rows=tuple((eidx, a, b) for eidx, (a, b) in enumerate(edge_ends)),
+    )
+
+
+@dataclass(frozen=True)
+class BoardLayout:
+    """One deal of resources and number tokens over a shared topology; never mutated."""
+
+    topology: BoardTopology
+    resources: Tuple[str, ...]
+    numbers: Tuple[Optional[int], ...]
+    tiles_by_number: Tuple[Tuple[int, ...], ...] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        by_number: List[List[int]] = [[] for _ in range(13)]
+        for tidx, number in enumerate(self.numbers):
+            if number is not None:
+                by_number[number].append(tidx)
+        object.__setattr__(self, "tiles_by_number", tuple(tuple(t) for t in by_number))
+
+    @classmethod
+    def shuffled(cls, rng: random.Random, topology: Optional[BoardTopology] = None) -> "BoardLayout":
+        topology = topology or board_topology(2)
+        deck_resources, deck_tokens = board_deck(len(topology.coords))
+        resources = list(deck_resources)
+        rng.shuffle(resources)
+        tokens = list(deck_tokens)
+        rng.shuffle(tokens)
+        numbers = [None if res == "desert" else tokens.pop() for res in resources]
+        return cls(topology, tuple(resources), tuple(numbers))
+
+    @property
+    def desert_tile(self) -> int:
+        return self.resources.index("desert")
+
+
+def derive_seed(seed: int, *path: object) -> int:
+    """A 64-bit seed for a named sub-stream of `seed`, independent of every other path."""
+    key = ":".join(str(part) for part in (seed,) + path).encode()
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+def seed64(seed: object) -> int:
+    """seed if it is already an unsigned 64-bit int, otherwise derive_seed(seed); what saves and logs store."""
+    if isinstance(seed, int) and 0 <= seed < 1 << 64:
+        return seed
+    return derive_seed(seed)
+
+
+def iter_bits(mask: int):
+    """Yield the index of every set bit in mask, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+# Two-dice sums and their cumulative number of ways out of 36, for drawing whole rolls.
+DICE_SUMS = tuple(range(2, 13))
+DICE_CUM_WAYS = tuple(sum(6 - abs(7 - s) for s in range(2, n + 1)) for n in DICE_SUMS)
+DICE_BLOCK = 256
+
+
+class RandomSource:
+    """Where a CatanGame gets its dice rolls, robber steals and board shuffle."""
+
+    def roll(self) -> int:
+        """The sum of two dice."""
+        raise NotImplementedError
+
+    def steal(self, hand: Dict[str, int]) -> str:
+        """A resource drawn from hand with probability proportional to its count."""
+        raise NotImplementedError
+
+    def shuffle(self, items: list) -> None:
+        raise NotImplementedError
+
+    def getstate(self) -> tuple:
+        raise NotImplementedError
+
+    def setstate(self, state: tuple) -> None:
+        raise NotImplementedError
+
+
+def _weighted_pick(hand: Dict[str, int], index: int) -> str:
+    """The resource holding card number index when hand is laid out in RESOURCES order."""
+    for res in RESOURCES:
+        index -= hand[res]
+        if index < 0:
+            return res
+    raise ValueError("index is past the end of the hand")
+
+
+class GameRandom(RandomSource):
+    """Independent streams for dice, steals and the board, all derived from one seed.
+
+    Each purpose has its own generator, so extra draws for one never shift another's
+    sequence: a recorded game's dice stay the same however often the robber steals.
+    Dice come from a block of DICE_BLOCK sums drawn in one call. Every dice and steal
+    draw uses a fixed number of the generator's outputs, so the play state is just
+    (seed, rolls, steals) and `setstate()` rebuilds it by fast-forwarding. Board
+    shuffles happen before play and are not part of it. Each generator is seeded on
+    its first draw, so a game pays for seeding only the streams it uses. The seed is
+    passed through seed64() first, so negative, huge or string seeds still fit a save.
+    """
+
+    def __init__(self, seed: Optional[object] = None):
+        if seed is None:
+            seed = random.SystemRandom().getrandbits(64)
+        self.setstate((seed64(seed), 0, 0))
+
+    def _next_block(self) -> bytes:
+        if self.dice is None:
+            self.dice = random.Random(derive_seed(self.seed, "dice"))
+        return bytes(self.dice.choices(DICE_SUMS, cum_weights=DICE_CUM_WAYS, k=DICE_BLOCK))
+
+    def roll(self) -> int:
+        if self.pos == len(self.block):
+            self.block = self._next_block()
+            self.pos = 0
+        roll = self.block[self.pos]
+        self.pos += 1
+        self.rolls += 1
+        return roll
+
+    def steal(self, hand: Dict[str, int]) -> str:
+        if self.steals is None:
+            self.steals = random.Random(derive_seed(self.seed, "steal"))
+        self.stolen += 1
+        return _weighted_pick(hand, int(self.steals.random() * sum(hand.values())))
+
+    def shuffle(self, items: list) -> None:
+        if self.board is None:
+            self.board = random.Random(derive_seed(self.seed, "board"))
+        self.board.shuffle(items)
+
+    def getstate(self) -> tuple:
+        return (self.seed, self.rolls, self.stolen)
+
+    def setstate(self, state: tuple) -> None:
+        seed, rolls, stolen = state
+        self.seed = seed
+        self.dice: Optional[random.Random] = None
+        self.steals: Optional[random.Random] = None
+        self.board: Optional[random.Random] = None
+        self.block = b""
+        self.pos = 0
+        if rolls >= DICE_BLOCK:
+            self.dice = random.Random(derive_seed(seed, "dice"))
+            for _ in range(rolls - rolls % DICE_BLOCK):
+                self.dice.random()
+        if rolls % DICE_BLOCK:
+            self.block = self._next_block()
+            self.pos = rolls % DICE_BLOCK
+        if stolen:
+            self.steals = random.Random(derive_seed(seed, "steal"))
+            for _ in range(stolen):
+                self.steals.random()
+        self.rolls, self.stolen = rolls, stolen
+
+
+class SharedRandom(RandomSource):
+    """Every draw from one random.Random, in the order games used before GameRandom.
+
+    Kept so saves and action logs recorded with that order still load and replay exactly.
+    """
+
+    def __init__(self, seed: Optional[int] = None):
+        self.rng = random.Random(seed)
+
+    def roll(self) -> int:
+        return self.rng.randint(1, 6) + self.rng.randint(1, 6)
+
+    def steal(self, hand: Dict[str, int]) -> str:
+        return _weighted_pick(hand, self.rng.randrange(sum(hand.values())))
+
+    def shuffle(self, items: list) -> None:
+        self.rng.shuffle(items)
+
+    def getstate(self) -> tuple:
+        return self.rng.getstate()
+
+    def setstate(self, state: tuple) -> None:
+        self.rng.setstate(state)
 
 
 def can_afford(hand: Dict[str, int], cost: Dict[str, int]) -> bool:
@@ -65,10 +414,12 @@ class Player:
     roads: Set[int] = field(default_factory=set)
     settlements: Set[int] = field(default_factory=set)
     cities: Set[int] = field(default_factory=set)
+    has_longest_road: bool = False
 
     @property
     def victory_points(self) -> int:
-        return len(self.settlements) + 2 * len(self.cities)
+        bonus = LONGEST_ROAD_POINTS if self.has_longest_road else 0
+        return len(self.settlements) + 2 * len(self.cities) + bonus
 
     @property
     def resource_count(self) -> int:
@@ -85,15 +436,15 @@ class Tile:
     r: int
     resource: str
     number: Optional[int]
-    nodes: List[int] = field(default_factory=list)
+    nodes: Tuple[int, ...] = ()
 
 
 @dataclass
 class Node:
     idx: int
     point: Tuple[int, int]
-    hexes: List[int] = field(default_factory=list)
-    edges: Set[int] = field(default_factory=set)
+    hexes: Tuple[int, ...] = ()
+    edges: FrozenSet[int] = frozenset()
     owner: Optional[int] = None
     is_city: bool = False
 
@@ -106,73 +457,1228 @@ class Edge:
     owner: Optional[int] = None
 
 
-class CatanGame:
-    def __init__(self, players: List[str], seed: Optional[int] = None):
+class BoardBits:
+    """Ownership stored as integer bitmasks over node and edge ids.
+
+    The adjacency tables come from the shared `BoardTopology`; only the masks
+    after them change as pieces are placed, so every legality check is a few AND/ORs.
+
+    The frontier masks are kept current by the place_* methods so legal moves
+    never need a board scan: free_nodes are nodes that pass the distance rule,
+    road_nodes[p] are nodes touched by p's roads, and road_frontier[p] are
+    empty edges connected to p's roads or buildings.
+    """
+
+    __slots__ = (
+        "node_nbrs",
+        "node_edges",
+        "edge_nodes",
+        "edge_nbrs",
+        "occupied",
+        "settlements",
+        "cities",
+        "roads",
+        "all_roads",
+        "free_nodes",
+        "road_nodes",
+        "road_frontier",
+    )
+
+    def __init__(self, topology: BoardTopology, num_players: int):
+        self.node_nbrs = topology.node_nbr_masks
+        self.node_edges = topology.node_edge_masks
+        self.edge_nodes = topology.edge_node_masks
+        self.edge_nbrs = topology.edge_nbr_masks
+        self.occupied = 0
+        self.settlements = [0] * num_players
+        self.cities = [0] * num_players
+        self.roads = [0] * num_players
+        self.all_roads = 0
+        self.free_nodes = (1 << len(topology.node_points)) - 1
+        self.road_nodes = [0] * num_players
+        self.road_frontier = [0] * num_players
+
+    def distance_ok(self, node_idx: int) -> bool:
+        return not self.node_nbrs[node_idx] & self.occupied
+
+    def has_road_at(self, player_idx: int, node_idx: int) -> bool:
+        return bool(self.node_edges[node_idx] & self.roads[player_idx])
+
+    def place_road(self, player_idx: int, edge_idx: int) -> None:
+        bit = 1 << edge_idx
+        self.roads[player_idx] |= bit
+        self.all_roads |= bit
+        self.road_nodes[player_idx] |= self.edge_nodes[edge_idx]
+        frontier = self.road_frontier
+        for idx in range(len(frontier)):
+            frontier[idx] &= ~bit
+        frontier[player_idx] |= self.edge_nbrs[edge_idx] & ~self.all_roads
+
+    def place_settlement(self, player_idx: int, node_idx: int) -> None:
+        bit = 1 << node_idx
+        self.settlements[player_idx] |= bit
+        self.occupied |= bit
+        self.free_nodes &= ~(bit | self.node_nbrs[node_idx])
+        self.road_frontier[player_idx] |= self.node_edges[node_idx] & ~self.all_roads
+
+    def place_city(self, player_idx: int, node_idx: int) -> None:
+        bit = 1 << node_idx
+        self.settlements[player_idx] &= ~bit
+        self.cities[player_idx] |= bit
+
+    def settlement_spots(self, player_idx: int) -> int:
+        return self.free_nodes & self.road_nodes[player_idx]
+
+    def snapshot(self) -> tuple:
+        """Every mutable mask, copied; `restore()` puts them back exactly."""
+        return (
+            self.occupied,
+            self.settlements[:],
+            self.cities[:],
+            self.roads[:],
+            self.all_roads,
+            self.free_nodes,
+            self.road_nodes[:],
+            self.road_frontier[:],
+        )
+
+    def restore(self, saved: tuple) -> None:
+        (
+            self.occupied,
+            self.settlements,
+            self.cities,
+            self.roads,
+            self.all_roads,
+            self.free_nodes,
+            self.road_nodes,
+            self.road_frontier,
+        ) = saved
+
+    def copy(self) -> "BoardBits":
+        out = BoardBits.__new__(BoardBits)
+        out.node_nbrs = self.node_nbrs
+        out.node_edges = self.node_edges
+        out.edge_nodes = self.edge_nodes
+        out.edge_nbrs = self.edge_nbrs
+        out.restore(self.snapshot())
+        return out
+
+    def popcount_on(self, mask: int, player_idx: int) -> int:
+        """Production weight of player_idx on the nodes in mask: settlements 1, cities 2."""
+        return bin(mask & self.settlements[player_idx]).count("1") + 2 * bin(mask & self.cities[player_idx]).count("1")
+
+
+def award_longest_road(holder: Optional[int], lengths: Sequence[int]) -> Optional[int]:
+    """Award Longest Road as recomputeLongestRoad in catan-rules.js does.
+
+    The holder keeps it until someone is strictly longer; an unheld award goes to the
+    lowest seat among the longest roads.
+    """
+    top = 0 if holder is None else lengths[holder]
+    for pidx, length in enumerate(lengths):
+        if length >= LONGEST_ROAD_MIN and (length > top or holder is None):
+            holder, top = pidx, length
+    return holder if top >= LONGEST_ROAD_MIN else None
+
+
+def _replaced(items: tuple, idx: int, value) -> tuple:
+    return items[:idx] + (value,) + items[idx + 1 :]
+
+
+class RoadNetworks:
+    """Each player's road components with their longest trail, and the Longest Road holder.
+
+    components[p] is a tuple of (edge mask, longest trail) pairs for p's connected
+    roads, where an opponent's building cuts a road at its node. A new road only
+    merges the components at its two ends, and a new building only splits the
+    opponent component running through its node, so every update walks the
+    affected components and nothing else. The per-player tuples are replaced,
+    never mutated, so snapshot() and copy() share them instead of copying.
+    """
+
+    __slots__ = ("edge_ends", "node_edges", "node_links", "buildings", "occupied", "components", "best", "holder")
+
+    def __init__(self, topology: BoardTopology, num_players: int):
+        self.edge_ends = topology.edge_ends
+        self.node_edges = topology.node_edge_masks
+        self.node_links = topology.node_links
+        self.buildings: Tuple[int, ...] = (0,) * num_players
+        self.occupied = 0
+        self.components: Tuple[Tuple[Tuple[int, int], ...], ...] = ((),) * num_players
+        self.best: Tuple[int, ...] = (0,) * num_players
+        self.holder: Optional[int] = None
+
+    def length(self, player_idx: int) -> int:
+        return self.best[player_idx]
+
+    def add_road(self, player_idx: int, edge_idx: int) -> None:
+        blocked = self.occupied & ~self.buildings[player_idx]
+        bit = 1 << edge_idx
+        kept: List[Tuple[int, int]] = []
+        merged, joins, attach, old_length = bit, 0, -1, 0
+        ends = [end for end in self.edge_ends[edge_idx] if not blocked >> end & 1]
+        for comp, length in self.components[player_idx]:
+            touched = [end for end in ends if comp & self.node_edges[end]]
+            if touched:  # touching both ends means the new road closes a loop
+                merged |= comp
+                old_length = length
+                joins += len(touched)
+                attach = touched[0]
+            else:
+                kept.append((comp, length))
+        if joins == 1:
+            # The common case, extending one component at one end: the new edge leads nowhere, so
+            # the only new trails are it plus an old trail from attach, and the length grows by at
+            # most one. It does exactly when some old trail of full length starts at attach.
+            grows = self._walk(merged & ~bit, blocked, (attach,), old_length) >= old_length
+            length = old_length + grows
+        else:
+            length = self._longest_trail(merged, blocked)
+        kept.append((merged, length))
+        self._set(player_idx, kept)
+
+    def add_building(self, player_idx: int, node_idx: int) -> None:
+        bit = 1 << node_idx
+        self.buildings = _replaced(self.buildings, player_idx, self.buildings[player_idx] | bit)
+        self.occupied |= bit
+        touching = self.node_edges[node_idx]
+        for other, comps in enumerate(self.components):
+            if other == player_idx:
+                continue
+            for comp, _ in comps:
+                # Only a component passing through the node (two or more of its roads meet there) can break.
+                if bin(comp & touching).count("1") >= 2:
+                    blocked = self.occupied & ~self.buildings[other]
+                    kept = [pair for pair in comps if pair[0] != comp]
+                    kept.extend((piece, self._longest_trail(piece, blocked)) for piece in self._split(comp, blocked))
+                    self._set(other, kept)
+                    break
+
+    def _set(self, player_idx: int, comps: List[Tuple[int, int]]) -> None:
+        self.components = _replaced(self.components, player_idx, tuple(comps))
+        self.best = _replaced(self.best, player_idx, max(length for _, length in comps))
+        self._award()
+
+    def _award(self) -> None:
+        self.holder = award_longest_road(self.holder, self.best)
+
+    def longest_road(self, roads: int, blocked: int) -> int:
+        """Longest trail over the edge mask roads, searched from scratch; blocked nodes cut it."""
+        return max((self._longest_trail(piece, blocked) for piece in self._split(roads, blocked)), default=0)
+
+    def _split(self, mask: int, blocked: int) -> List[int]:
+        """Connected pieces of the edges in mask, not joining through blocked nodes."""
+        pieces: List[int] = []
+        while mask:
+            piece = todo = mask & -mask
+            while todo:
+                low = todo & -todo
+                todo ^= low
+                for end in self.edge_ends[low.bit_length() - 1]:
+                    if not blocked >> end & 1:
+                        new = self.node_edges[end] & mask & ~piece
+                        piece |= new
+                        todo |= new
+            pieces.append(piece)
+            mask &= ~piece
+        return pieces
+
+    def _longest_trail(self, mask: int, blocked: int) -> int:
+        """Edges in the longest trail over mask that does not continue through a blocked node."""
+        edge_ends, node_edges = self.edge_ends, self.node_edges
+        nodes = 0
+        for eidx in iter_bits(mask):
+            a, b = edge_ends[eidx]
+            nodes |= 1 << a | 1 << b
+        # A longest trail can always be taken to end at odd-degree or blocked nodes: from any
+        # other end an unused edge would extend it. Only a component without such nodes is a
+        # closed circuit, and then any start will do.
+        degrees = [(n, bin(node_edges[n] & mask).count("1")) for n in iter_bits(nodes)]
+        starts = [n for n, degree in degrees if degree & 1 or blocked >> n & 1]
+        # All but two odd-degree nodes must each miss one of their edges, which bounds the search.
+        odd = sum(degree & 1 for _, degree in degrees)
+        limit = bin(mask).count("1") - max(0, odd - 2) // 2
+        return self._walk(mask, blocked, starts or [n for n, _ in degrees], limit)
+
+    def _walk(self, mask: int, blocked: int, starts, limit: int) -> int:
+        """Longest trail over mask from one of starts, searching no further once limit is reached."""
+        links = self.node_links
+        best = 0
+
+        def walk(node: int, used: int, length: int) -> None:
+            nonlocal best
+            if length > best:
+                best = length
+            if best >= limit or length and blocked >> node & 1:
+                return
+            for bit, other in links[node]:
+                if mask & bit and not used & bit:
+                    walk(other, used | bit, length + 1)
+
+        for node in starts:
+            walk(node, 0, 0)
+            if best >= limit:
+                break
+        return best
+
+    def snapshot(self) -> tuple:
+        return (self.buildings, self.occupied, self.components, self.best, self.holder)
+
+    def restore(self, saved: tuple) -> None:
+        self.buildings, self.occupied, self.components, self.best, self.holder = saved
+
+    def copy(self) -> "RoadNetworks":
+        out = RoadNetworks.__new__(RoadNetworks)
+        out.edge_ends = self.edge_ends
+        out.node_edges = self.node_edges
+        out.node_links = self.node_links
+        out.restore(self.snapshot())
+        return out
+
+
+class NodeValue(NamedTuple):
+    """What a settlement on one node is worth, read off the tiles around it.
+
+    income holds the expected cards per roll of each resource (in RESOURCES order),
+    diversity the number of different resources, and exposure the share of the
+    node's pips that a single robber placement can block.
+    """
+
+    node: int
+    pips: int
+    income: Tuple[float, ...]
+    diversity: int
+    exposure: float
+    score: float
+
+
+def node_values(
+    layout: BoardLayout, diversity_weight: float = 1.0, exposure_weight: float = 2.0
+) -> Tuple[NodeValue, ...]:
+    """A NodeValue for every node; score = pips + diversity_weight * diversity - exposure_weight * exposure."""
+    slot = {res: i for i, res in enumerate(RESOURCES)}
+    tiles = [(slot.get(res, 0), PIPS[num or 0]) for res, num in zip(layout.resources, layout.numbers)]
+    values: List[NodeValue] = []
+    for nidx, hexes in enumerate(layout.topology.node_hexes):
+        pips = [0] * len(RESOURCES)
+        for tidx in hexes:
+            res, tile_pips = tiles[tidx]
+            pips[res] += tile_pips
+        total = sum(pips)
+        diversity = len(pips) - pips.count(0)
+        exposure = max(tiles[tidx][1] for tidx in hexes) / total if total else 0.0
+        score = total + diversity_weight * diversity - exposure_weight * exposure
+        values.append(NodeValue(nidx, total, tuple(p / 36 for p in pips), diversity, exposure, score))
+    return tuple(values)
+
+
+class PlacementIndex:
+    """Nodes in a max-heap by NodeValue.score, for picking setup spots without a board scan.
+
+    Entries are invalidated lazily against the live `BoardBits.free_nodes` mask: a node
+    that is occupied or blocked by the distance rule is dropped the next time it reaches
+    the top. Nodes never become free again during a game, so each one is popped at most
+    once and a pick costs O(log n) amortized across both setup rounds.
+    """
+
+    def __init__(self, values: Tuple[NodeValue, ...], bits: BoardBits):
+        self.values = values
+        self.bits = bits
+        self.heap = [(-v.score, v.node) for v in values]
+        heapq.heapify(self.heap)
+
+    def best(self) -> Optional[int]:
+        """The highest-scoring node that still passes the distance rule, or None."""
+        heap = self.heap
+        free = self.bits.free_nodes
+        while heap and not free >> heap[0][1] & 1:
+            heapq.heappop(heap)
+        return heap[0][1] if heap else None
+
+    def top(self, count: int) -> List[int]:
+        """Up to count free nodes, best first; the index is left as it was."""
+        picked: List[Tuple[float, int]] = []
+        while len(picked) < count and self.best() is not None:
+            picked.append(heapq.heappop(self.heap))
+        for entry in picked:
+            heapq.heappush(self.heap, entry)
+        return [node for _, node in picked]
+
+
+class RobberTarget(NamedTuple):
+    """One tile the robber could move to, as seen by the player moving it.
+
+    denied is the expected cards per roll the tile stops paying the mover's opponents,
+    denied_by_player the same per seat (0.0 for the mover), lost what it stops paying
+    the mover; victims are the opponents with cards who have a building there, in seat
+    order, and hand_sizes their card counts.
+    """
+
+    tile: int
+    score: float
+    denied: float
+    denied_by_player: Tuple[float, ...]
+    lost: float
+    victims: Tuple[int, ...]
+    hand_sizes: Tuple[int, ...]
+
+
+class RobberIndex:
+    """Expected production per tile and player, kept current as buildings go up.
+
+    pips[t * num_players + p] is the pips tile t pays player p (twice the token's for a
+    city), kept as integers so equal tiles tie exactly, and occupants[t] the players with a building
+    on it, in seat order. A tile scores denied - lost_weight * lost in cards per roll,
+    plus steal_weight when there is someone to steal from. Each mover's order by
+    production alone is cached until the next build, so `best()` usually looks at only
+    the first tile or two.
+    """
+
+    def __init__(self, layout: BoardLayout, num_players: int, lost_weight: float = 1.0, steal_weight: float = 0.05):
+        self.node_hexes = layout.topology.node_hexes
+        self.num_players = num_players
+        self.tile_pips = [PIPS[num or 0] for num in layout.numbers]
+        self.pips = [0] * (len(layout.numbers) * num_players)
+        self.totals = [0] * len(layout.numbers)
+        self.occupants: List[Tuple[int, ...]] = [()] * len(layout.numbers)
+        self.lost_weight = lost_weight
+        self.steal_weight = steal_weight
+        self._ranked: Dict[int, List[Tuple[float, int]]] = {}
+
+    def add_building(self, player_idx: int, node_idx: int) -> None:
+        """Count a settlement on node_idx, or call again for its upgrade to a city."""
+        for tidx in self.node_hexes[node_idx]:
+            pips = self.tile_pips[tidx]
+            self.pips[tidx * self.num_players + player_idx] += pips
+            self.totals[tidx] += pips
+            if player_idx not in self.occupants[tidx]:
+                self.occupants[tidx] = tuple(sorted(self.occupants[tidx] + (player_idx,)))
+        self._ranked.clear()
+
+    def _ranking(self, player_idx: int) -> List[Tuple[float, int]]:
+        ranked = self._ranked.get(player_idx)
+        if ranked is None:
+            # denied - lost_weight * lost, with denied = total - lost
+            factor = 1.0 + self.lost_weight
+            mine = self.pips[player_idx :: self.num_players]
+            scores = [(total - factor * lost) / 36 for total, lost in zip(self.totals, mine)]
+            ranked = sorted(zip(scores, range(len(scores))), key=lambda entry: (-entry[0], entry[1]))
+            self._ranked[player_idx] = ranked
+        return ranked
+
+    def _target(self, player_idx: int, base: float, tidx: int, hand_sizes: Sequence[int]) -> RobberTarget:
+        victims = tuple(p for p in self.occupants[tidx] if p != player_idx and hand_sizes[p] > 0)
+        start = tidx * self.num_players
+        row = self.pips[start : start + self.num_players]
+        lost = row[player_idx]
+        return RobberTarget(
+            tidx,
+            base + self.steal_weight if victims else base,
+            (self.totals[tidx] - lost) / 36,
+            tuple(0.0 if p == player_idx else pips / 36 for p, pips in enumerate(row)),
+            lost / 36,
+            victims,
+            tuple(hand_sizes[p] for p in victims),
+        )
+
+    def targets(self, player_idx: int, robber_tile: int, hand_sizes: Sequence[int]) -> List[RobberTarget]:
+        """Every tile the robber can move to, best first."""
+        found = [
+            self._target(player_idx, base, tidx, hand_sizes)
+            for base, tidx in self._ranking(player_idx)
+            if tidx != robber_tile
+        ]
+        found.sort(key=lambda target: (-target.score, target.tile))
+        return found
+
+    def best(self, player_idx: int, robber_tile: int, hand_sizes: Sequence[int]) -> Optional[RobberTarget]:
+        """targets(...)[0], found without scoring every tile."""
+        best: Optional[RobberTarget] = None
+        for base, tidx in self._ranking(player_idx):
+            if best is not None and base + self.steal_weight < best.score:
+                break
+            if tidx != robber_tile:
+                target = self._target(player_idx, base, tidx, hand_sizes)
+                if best is None or (target.score, -tidx) > (best.score, -best.tile):
+                    best = target
+        return best
+
+
+# -- events ---------------------------------------------------------------------------
+#
+# Every state change and rejection is published as a small NamedTuple on the game's
+# EventBus instead of being printed. Nothing is built when there are no subscribers.
+
+
+class SetupStarted(NamedTuple):
+    pass
+
+
+class SetupTurn(NamedTuple):
+    player: int
+
+
+class StartingResources(NamedTuple):
+    player: int
+    gains: Tuple[Tuple[str, int], ...]
+
+
+class TurnStarted(NamedTuple):
+    round_num: int
+    player: int
+
+
+class DiceRolled(NamedTuple):
+    player: int
+    roll: int
+
+
+class ResourcesDistributed(NamedTuple):
+    roll: int
+    gains: Tuple[Tuple[Tuple[int, str], int], ...]
+
+
+class MustDiscard(NamedTuple):
+    player: int
+    count: int
+
+
+class Discarded(NamedTuple):
+    player: int
+    resource: str
+
+
+class RobberMoved(NamedTuple):
+    player: int
+    tile: int
+    victims: Tuple[int, ...]
+
+
+class Stolen(NamedTuple):
+    thief: int
+    victim: int
+    resource: str
+
+
+class RoadBuilt(NamedTuple):
+    player: int
+    edge: int
+
+
+class SettlementBuilt(NamedTuple):
+    player: int
+    node: int
+
+
+class CityBuilt(NamedTuple):
+    player: int
+    node: int
+
+
+class LongestRoad(NamedTuple):
+    player: Optional[int]
+    length: int
+
+
+class Traded(NamedTuple):
+    player: int
+    give: str
+    get: str
+
+
+class Rejected(NamedTuple):
+    player: int
+    reason: str
+
+
+class GameWon(NamedTuple):
+    player: int
+    points: int
+
+
+EVENT_TYPES = {
+    cls.__name__: cls
+    for cls in (
+        SetupStarted,
+        SetupTurn,
+        StartingResources,
+        TurnStarted,
+        DiceRolled,
+        ResourcesDistributed,
+        MustDiscard,
+        Discarded,
+        RobberMoved,
+        Stolen,
+        RoadBuilt,
+        SettlementBuilt,
+        CityBuilt,
+        LongestRoad,
+        Traded,
+        Rejected,
+        GameWon,
+    )
+}
+
+Sink = Callable[[tuple], None]
+
+
+class NullSink:
+    """Discards everything. Subscribing it leaves the bus empty, so events are never even built."""
+
+    def __call__(self, event: tuple) -> None:
+        pass
+
+
+class EventBus:
+    __slots__ = ("subscribers",)
+
+    def __init__(self) -> None:
+        self.subscribers: List[Sink] = []
+
+    def subscribe(self, sink: Sink) -> None:
+        if not isinstance(sink, NullSink):
+            self.subscribers.append(sink)
+
+    def unsubscribe(self, sink: Sink) -> None:
+        if sink in self.subscribers:
+            self.subscribers.remove(sink)
+
+    def emit(self, event_type: type, *fields: object) -> None:
+        if self.subscribers:
+            event = event_type(*fields)
+            for sink in self.subscribers:
+                sink(event)
+
+
+class ConsoleRenderer:
+    """Prints events exactly as the terminal game always has."""
+
+    def __init__(self, names: List[str], out: Callable[[str], None] = print):
+        self.names = names
+        self.out = out
+
+    def __call__(self, event: tuple) -> None:
+        text = self.render(event)
+        if text is not None:
+            self.out(text)
+
+    def render(self, event: tuple) -> Optional[str]:
+        names = self.names
+        kind = type(event)
+        if kind is Rejected:
+            return event.reason
+        if kind is SetupStarted:
+            return "Setup phase: each player places 2 settlements and 2 roads."
+        if kind is SetupTurn:
+            return f"\n{names[event.player]}'s setup turn."
+        if kind is StartingResources:
+            return f"{names[event.player]} gains starting resources from second settlement."
+        if kind is TurnStarted:
+            return f"\n=== Round {event.round_num} | {names[event.player]}'s turn ==="
+        if kind is DiceRolled:
+            return f"{names[event.player]} rolled {event.roll}."
+        if kind is ResourcesDistributed:
+            return f"Roll {event.roll}: resources distributed."
+        if kind is MustDiscard:
+            return f"{names[event.player]} must discard {event.count} cards."
+        if kind is RobberMoved:
+            if not event.victims:
+                return "Robber moved. No one to steal from."
+            return "Victims: " + ", ".join(f"{v}:{names[v]}" for v in event.victims)
+        if kind is Stolen:
+            return f"{names[event.thief]} stole 1 {event.resource} from {names[event.victim]}."
+        if kind is RoadBuilt:
+            return f"{names[event.player]} built road on edge {event.edge}."
+        if kind is SettlementBuilt:
+            return f"{names[event.player]} built settlement on node {event.node}."
+        if kind is CityBuilt:
+            return f"{names[event.player]} upgraded node {event.node} to city."
+        if kind is LongestRoad:
+            if event.player is None:
+                return "Nobody holds Longest Road."
+            return f"{names[event.player]} takes Longest Road ({event.length} roads)."
+        if kind is Traded:
+            return f"Traded 4 {event.give} for 1 {event.get}."
+        if kind is GameWon:
+            return f"\n{names[event.player]} wins with {event.points} victory points!"
+        return None
+
+
+class EventLog:
+    """Append-only log: one compact JSON array per event, [type, *fields]."""
+
+    def __init__(self, fh: IO[str]):
+        self.fh = fh
+
+    def __call__(self, event: tuple) -> None:
+        self.fh.write(json.dumps([type(event).__name__, *event], separators=(",", ":")))
+        self.fh.write("\n")
+
+    @staticmethod
+    def read(fh: IO[str]):
+        """Yield the events of a log back as NamedTuples."""
+        for line in fh:
+            kind, *fields = json.loads(line)
+            cls = EVENT_TYPES[kind]
+            yield cls(*(_untuple(f) for f in fields))
+
+
+def _untuple(value: object) -> object:
+    if isinstance(value, list):
+        return tuple(_untuple(v) for v in value)
+    return value
+
+
+Action = Tuple
+
+PHASE_SETUP_SETTLEMENT = "setup_settlement"
+PHASE_SETUP_ROAD = "setup_road"
+PHASE_MAIN = "main"
+
+
+def main_phase_actions(bits: BoardBits, hand: Dict[str, int], player_idx: int) -> List[Action]:
+    """Affordable builds, 4:1 trades and ("end",) for one player, read off the frontier masks."""
+    actions: List[Action] = []
+    if can_afford(hand, CITY_COST):
+        actions.extend(("city", n) for n in iter_bits(bits.settlements[player_idx]))
+    if can_afford(hand, SETTLEMENT_COST):
+        actions.extend(("settlement", n) for n in iter_bits(bits.settlement_spots(player_idx)))
+    if can_afford(hand, ROAD_COST):
+        actions.extend(("road", e) for e in iter_bits(bits.road_frontier[player_idx]))
+    for give in RESOURCES:
+        if hand[give] >= 4:
+            actions.extend(("trade", give, get) for get in RESOURCES if get != give)
+    actions.append(("end",))
+    return actions
+
+
+class Agent:
+    """Makes every decision for one seat; the game only ever asks, never reads stdin."""
+
+    def before_roll(self, game: "CatanGame", player_idx: int) -> None:
+        pass
+
+    def choose_setup_settlement(self, game: "CatanGame", player_idx: int) -> int:
+        raise NotImplementedError
+
+    def choose_setup_road(self, game: "CatanGame", player_idx: int, node_idx: int) -> int:
+        raise NotImplementedError
+
+    def choose_action(self, game: "CatanGame", player_idx: int) -> Action:
+        """Return ("road", e), ("settlement", n), ("city", n), ("trade", give, get), ("robber", t) or ("end",)."""
+        return ("end",)
+
+    def choose_discard(self, game: "CatanGame", player_idx: int, remaining: int) -> str:
+        raise NotImplementedError
+
+    def choose_robber_tile(self, game: "CatanGame", player_idx: int) -> int:
+        raise NotImplementedError
+
+    def choose_victim(self, game: "CatanGame", player_idx: int, victims: List[int]) -> int:
+        return victims[0]
+
+
+def parse_command(text: str) -> Optional[Action]:
+    """The action for one typed main-phase command, or None if it is not one."""
+    parts = text.split()
+    if len(parts) >= 3 and parts[0] == "build" and parts[1] in BUILD_KINDS and parts[2].isdigit():
+        return (parts[1], int(parts[2]))
+    if len(parts) == 3 and parts[0] == "trade":
+        return ("trade", parts[1].lower(), parts[2].lower())
+    if len(parts) == 2 and parts[0] == "robber" and parts[1].isdigit():
+        return ("robber", int(parts[1]))
+    if parts and parts[0] == "end":
+        return ("end",)
+    return None
+
+
+def format_command(action: Action) -> str:
+    """The command text parse_command reads back as action."""
+    if action[0] in BUILD_KINDS:
+        return f"build {action[0]} {action[1]}"
+    return " ".join(str(part) for part in action)
+
+
+def _read_int(prompt: str, error: str) -> int:
+    while True:
+        raw = input(prompt).strip()
+        if raw.isdigit():
+            return int(raw)
+        print(error)
+
+
+class ConsoleAgent(Agent):
+    """The interactive terminal player."""
+
+    def before_roll(self, game: "CatanGame", player_idx: int) -> None:
+        game.print_status()
+        input("Press Enter to roll dice...")
+
+    def choose_setup_settlement(self, game: "CatanGame", player_idx: int) -> int:
+        return _read_int("Choose settlement node id: ", "Enter a node number.")
+
+    def choose_setup_road(self, game: "CatanGame", player_idx: int, node_idx: int) -> int:
+        return _read_int("Choose adjacent road edge id: ", "Enter an edge number.")
+
+    def choose_action(self, game: "CatanGame", player_idx: int) -> Action:
+        player = game.players[player_idx]
+        while True:
+            cmd = input(
+                "Command [help, board, hand, build road <e>, build settlement <n>, build city <n>, "
+                "trade <give> <get>, robber <tile>, end]: "
+            ).strip()
+            parts = cmd.split()
+            if not parts:
+                continue
+            if parts[0] == "help":
+                print("Commands:")
+                print("  board")
+                print("  hand")
+                print("  build road <edge_id>")
+                print("  build settlement <node_id>")
+                print("  build city <node_id>")
+                print("  trade <give_res> <get_res>   (4:1 bank trade)")
+                print("  robber <tile_id>             (only after rolling 7 in official rules)")
+                print("  end")
+                continue
+            if parts[0] == "board":
+                game.print_board()
+                continue
+            if parts[0] == "hand":
+                print(player.hand_str())
+                continue
+            action = parse_command(cmd)
+            if action is not None:
+                return action
+            print("Unknown command. Type 'help'.")
+
+    def choose_discard(self, game: "CatanGame", player_idx: int, remaining: int) -> str:
+        print(f"  Hand: {game.players[player_idx].hand_str()}")
+        return input("  Resource to discard: ").strip().lower()
+
+    def choose_robber_tile(self, game: "CatanGame", player_idx: int) -> int:
+        return _read_int("Move robber to tile id: ", "Enter a tile number.")
+
+    def choose_victim(self, game: "CatanGame", player_idx: int, victims: List[int]) -> int:
+        return _read_int("Choose victim player index to steal from: ", "Enter a number.")
+
+
+class RandomAgent(Agent):
+    """Headless bot: builds whatever it can afford, trades 4:1 toward what it lacks, otherwise ends."""
+
+    def __init__(self, seed: Optional[int] = None):
         self.rng = random.Random(seed)
+
+    def choose_setup_settlement(self, game: "CatanGame", player_idx: int) -> int:
+        return self.rng.choice(game.legal_actions(player_idx))[1]
+
+    def choose_setup_road(self, game: "CatanGame", player_idx: int, node_idx: int) -> int:
+        return self.rng.choice(game.legal_actions(player_idx))[1]
+
+    def choose_action(self, game: "CatanGame", player_idx: int) -> Action:
+        by_kind: Dict[str, List[Action]] = {}
+        for action in game.legal_actions(player_idx):
+            by_kind.setdefault(action[0], []).append(action)
+        for kind in ("city", "settlement", "road"):
+            if kind in by_kind:
+                return self.rng.choice(by_kind[kind])
+        hand = game.players[player_idx].hand
+        trades = [a for a in by_kind.get("trade", ()) if hand[a[2]] == 0]
+        if trades:
+            return self.rng.choice(trades)
+        return ("end",)
+
+    def choose_discard(self, game: "CatanGame", player_idx: int, remaining: int) -> str:
+        hand = game.players[player_idx].hand
+        return max(RESOURCES, key=lambda r: hand[r])
+
+    def choose_robber_tile(self, game: "CatanGame", player_idx: int) -> int:
+        return self.rng.choice([t.idx for t in game.tiles if t.idx != game.robber_tile])
+
+    def choose_victim(self, game: "CatanGame", player_idx: int, victims: List[int]) -> int:
+        return self.rng.choice(victims)
+
+
+class GreedySetupAgent(RandomAgent):
+    """RandomAgent that settles on the best-valued free node from `game.placement` during setup."""
+
+    def choose_setup_settlement(self, game: "CatanGame", player_idx: int) -> int:
+        return game.placement.best()
+
+
+class GreedyRobberAgent(RandomAgent):
+    """RandomAgent that robs the top tile from `game.robber_index`, taking from the biggest hand there."""
+
+    def choose_robber_tile(self, game: "CatanGame", player_idx: int) -> int:
+        hand_sizes = [p.resource_count for p in game.players]
+        return game.robber_index.best(player_idx, game.robber_tile, hand_sizes).tile
+
+    def choose_victim(self, game: "CatanGame", player_idx: int, victims: List[int]) -> int:
+        return max(victims, key=lambda p: game.players[p].resource_count)
+
+
+# Hand sizes of HAND_KEYS - 1 or more share a key: still a function of the state, just a coarser one.
+HAND_KEYS = 64
+
+
+class ZobristKeys:
+    """Random 64-bit keys for each piece of a GameState's identity on one board size.
+
+    A position's Zobrist hash is the XOR of the keys for what is on the board (settlements
+    and cities per player and node, roads per player and edge, the robber tile), every
+    player's count of every resource, the Longest Road holder and the side to move. Any
+    single change updates it with an XOR or two. The holder is keyed because it depends
+    on build order, so the same pieces can be reached with different holders.
+    """
+
+    __slots__ = ("settlement", "city", "road", "robber", "hand", "side", "holder")
+
+    def __init__(self, topology: BoardTopology, num_players: int, seed: int = 0):
+        rng = random.Random(derive_seed(seed, "zobrist", topology.radius, num_players))
+
+        def keys(count: int) -> List[int]:
+            return [rng.getrandbits(64) for _ in range(count)]
+
+        players = range(num_players)
+        self.settlement = [keys(len(topology.node_points)) for _ in players]
+        self.city = [keys(len(topology.node_points)) for _ in players]
+        self.road = [keys(len(topology.edge_ends)) for _ in players]
+        self.robber = keys(len(topology.coords))
+        self.hand = [{res: keys(HAND_KEYS) for res in RESOURCES} for _ in players]
+        self.side = keys(num_players)
+        self.holder = keys(num_players + 1)  # the last key stands for "no holder"
+
+    def holder_key(self, holder: Optional[int]) -> int:
+        return self.holder[-1 if holder is None else holder]
+
+
+@lru_cache(maxsize=None)
+def zobrist_keys(radius: int, num_players: int) -> ZobristKeys:
+    return ZobristKeys(board_topology(radius), num_players)
+
+
+class GameState:
+    """Compact, mutable game state for tree search.
+
+    The board layout and topology are shared; only the bitboards, hands, robber
+    and side to move are copied, so `clone()` costs a few microseconds. Every
+    move pushes an undo record and `undo()` reverses the latest one exactly.
+    Moves are not re-validated: take them from `legal_actions()`.
+
+    `zobrist` is the position's 64-bit hash (see `ZobristKeys`), kept current by every
+    move and undo; call `rehash()` after editing hands or bitboards directly.
+    """
+
+    __slots__ = ("layout", "bits", "road_net", "hands", "robber", "current", "history", "keys", "zobrist")
+
+    def __init__(
+        self,
+        layout: BoardLayout,
+        bits: BoardBits,
+        road_net: RoadNetworks,
+        hands: List[Dict[str, int]],
+        robber: int,
+        current: int,
+        zobrist: Optional[int] = None,
+    ):
+        self.layout = layout
+        self.bits = bits
+        self.road_net = road_net
+        self.hands = hands
+        self.robber = robber
+        self.current = current
+        self.history: List[tuple] = []
+        self.keys = zobrist_keys(layout.topology.radius, len(hands))
+        if zobrist is None:
+            self.rehash()
+        else:
+            self.zobrist = zobrist
+
+    def clone(self) -> "GameState":
+        """Independent copy of the position; the undo history is not carried over."""
+        hands = [dict(h) for h in self.hands]
+        return GameState(
+            self.layout, self.bits.copy(), self.road_net.copy(), hands, self.robber, self.current, self.zobrist
+        )
+
+    def rehash(self) -> int:
+        """Recompute `zobrist` from scratch over the whole position."""
+        keys, bits = self.keys, self.bits
+        h = keys.robber[self.robber] ^ keys.side[self.current] ^ keys.holder_key(self.road_net.holder)
+        for pidx, hand in enumerate(self.hands):
+            for nidx in iter_bits(bits.settlements[pidx]):
+                h ^= keys.settlement[pidx][nidx]
+            for nidx in iter_bits(bits.cities[pidx]):
+                h ^= keys.city[pidx][nidx]
+            for eidx in iter_bits(bits.roads[pidx]):
+                h ^= keys.road[pidx][eidx]
+            for res, count in hand.items():
+                h ^= keys.hand[pidx][res][min(count, HAND_KEYS - 1)]
+        self.zobrist = h
+        return h
+
+    def _adjust(self, player_idx: int, resource: str, delta: int) -> None:
+        """Change one hand count, updating the hash."""
+        hand = self.hands[player_idx]
+        keys = self.keys.hand[player_idx][resource]
+        old = hand[resource]
+        hand[resource] = old + delta
+        self.zobrist ^= keys[min(old, HAND_KEYS - 1)] ^ keys[min(old + delta, HAND_KEYS - 1)]
+
+    def victory_points(self, player_idx: int) -> int:
+        bits = self.bits
+        bonus = LONGEST_ROAD_POINTS if self.road_net.holder == player_idx else 0
+        return bin(bits.settlements[player_idx]).count("1") + 2 * bin(bits.cities[player_idx]).count("1") + bonus
+
+    def legal_actions(self) -> List[Action]:
+        return main_phase_actions(self.bits, self.hands[self.current], self.current)
+
+    def _build(self, kind: str, player_idx: int, idx: int, cost: Optional[Dict[str, int]]) -> None:
+        bits, keys = self.bits, self.keys
+        self.history.append(("build", player_idx, cost, bits.snapshot(), self.road_net.snapshot(), self.zobrist))
+        if cost is not None:
+            for res, amount in cost.items():
+                self._adjust(player_idx, res, -amount)
+        holder = self.road_net.holder
+        if kind == "road":
+            bits.place_road(player_idx, idx)
+            self.road_net.add_road(player_idx, idx)
+            self.zobrist ^= keys.road[player_idx][idx]
+        elif kind == "settlement":
+            bits.place_settlement(player_idx, idx)
+            self.road_net.add_building(player_idx, idx)
+            self.zobrist ^= keys.settlement[player_idx][idx]
+        else:
+            bits.place_city(player_idx, idx)
+            self.zobrist ^= keys.settlement[player_idx][idx] ^ keys.city[player_idx][idx]
+        if self.road_net.holder != holder:
+            self.zobrist ^= keys.holder_key(holder) ^ keys.holder_key(self.road_net.holder)
+
+    def build_road(self, player_idx: int, edge_idx: int, free: bool = False) -> None:
+        self._build("road", player_idx, edge_idx, None if free else ROAD_COST)
+
+    def build_settlement(self, player_idx: int, node_idx: int, free: bool = False) -> None:
+        self._build("settlement", player_idx, node_idx, None if free else SETTLEMENT_COST)
+
+    def build_city(self, player_idx: int, node_idx: int) -> None:
+        self._build("city", player_idx, node_idx, CITY_COST)
+
+    def bank_trade(self, player_idx: int, give: str, get: str) -> None:
+        self._adjust(player_idx, give, -4)
+        self._adjust(player_idx, get, 1)
+        self.history.append(("trade", player_idx, give, get))
+
+    def move_robber(self, tile_idx: int) -> None:
+        self.history.append(("robber", self.robber))
+        self.zobrist ^= self.keys.robber[self.robber] ^ self.keys.robber[tile_idx]
+        self.robber = tile_idx
+
+    def steal(self, thief: int, victim: int, resource: str) -> None:
+        self._adjust(victim, resource, -1)
+        self._adjust(thief, resource, 1)
+        self.history.append(("steal", thief, victim, resource))
+
+    def distribute_resources(self, roll: int) -> None:
+        layout, bits = self.layout, self.bits
+        gains: List[Tuple[int, str, int]] = []
+        for tidx in layout.tiles_by_number[roll]:
+            if tidx == self.robber:
+                continue
+            mask = layout.topology.tile_node_masks[tidx]
+            res = layout.resources[tidx]
+            for pidx in range(len(self.hands)):
+                amount = bits.popcount_on(mask, pidx)
+                if amount:
+                    self._adjust(pidx, res, amount)
+                    gains.append((pidx, res, amount))
+        self.history.append(("roll", gains))
+
+    def end_turn(self) -> None:
+        self.history.append(("end", self.current))
+        self._set_current((self.current + 1) % len(self.hands))
+
+    def _set_current(self, player_idx: int) -> None:
+        self.zobrist ^= self.keys.side[self.current] ^ self.keys.side[player_idx]
+        self.current = player_idx
+
+    def apply(self, action: Action) -> None:
+        """Play one action tuple from legal_actions() for the side to move."""
+        kind, pidx = action[0], self.current
+        if kind == "road":
+            self.build_road(pidx, action[1])
+        elif kind == "settlement":
+            self.build_settlement(pidx, action[1])
+        elif kind == "city":
+            self.build_city(pidx, action[1])
+        elif kind == "trade":
+            self.bank_trade(pidx, action[1], action[2])
+        elif kind == "robber":
+            self.move_robber(action[1])
+        elif kind == "end":
+            self.end_turn()
+        else:
+            raise ValueError(f"Unknown action {action!r}")
+
+    def undo(self) -> None:
+        record = self.history.pop()
+        kind = record[0]
+        if kind == "build":
+            _, pidx, cost, saved, saved_roads, self.zobrist = record
+            self.bits.restore(saved)
+            self.road_net.restore(saved_roads)
+            if cost is not None:
+                add_resources(self.hands[pidx], cost)
+        elif kind == "trade":
+            _, pidx, give, get = record
+            self._adjust(pidx, give, 4)
+            self._adjust(pidx, get, -1)
+        elif kind == "robber":
+            self.zobrist ^= self.keys.robber[self.robber] ^ self.keys.robber[record[1]]
+            self.robber = record[1]
+        elif kind == "steal":
+            _, thief, victim, res = record
+            self._adjust(thief, res, -1)
+            self._adjust(victim, res, 1)
+        elif kind == "roll":
+            for pidx, res, amount in record[1]:
+                self._adjust(pidx, res, -amount)
+        else:
+            self._set_current(record[1])
+
+
+EXACT, LOWER_BOUND, UPPER_BOUND = range(3)
+
+
+class TTEntry(NamedTuple):
+    key: int
+    depth: int
+    value: float
+    bound: int
+    action: Optional[Action]
+
+
+class TranspositionTable:
+    """Fixed-size store of search results keyed by `GameState.zobrist`, shareable between searches.
+
+    Each bucket holds two entries. The first keeps the deepest result stored during the
+    current generation; the second always takes the newest result that did not displace the
+    first, including the entry it displaced. `new_search()` starts a generation, after which
+    deep entries left from earlier searches may be overwritten by shallower ones. The table
+    never grows past `capacity` entries; capacity must hold at least one bucket (2 entries).
+    """
+
+    def __init__(self, capacity: int = 1 << 16):
+        if capacity < 2:
+            raise ValueError("A transposition table needs a capacity of at least 2 entries.")
+        buckets = 1 << max(0, (capacity // 2).bit_length() - 1)
+        self.mask = buckets - 1
+        self.deep: List[Optional[TTEntry]] = [None] * buckets
+        self.recent: List[Optional[TTEntry]] = [None] * buckets
+        self.ages = [0] * buckets
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def capacity(self) -> int:
+        return 2 * len(self.deep)
+
+    def __len__(self) -> int:
+        return sum(e is not None for e in self.deep) + sum(e is not None for e in self.recent)
+
+    def new_search(self) -> None:
+        self.generation += 1
+
+    def probe(self, key: int) -> Optional[TTEntry]:
+        bucket = key & self.mask
+        for entry in (self.deep[bucket], self.recent[bucket]):
+            if entry is not None and entry.key == key:
+                self.hits += 1
+                return entry
+        self.misses += 1
+        return None
+
+    def store(self, key: int, depth: int, value: float, bound: int = EXACT, action: Optional[Action] = None) -> None:
+        bucket = key & self.mask
+        entry = TTEntry(key, depth, value, bound, action)
+        deep = self.deep[bucket]
+        if deep is None or deep.key == key or depth >= deep.depth or self.ages[bucket] != self.generation:
+            self.deep[bucket] = entry
+            self.ages[bucket] = self.generation
+            recent = self.recent[bucket]
+            if recent is not None and recent.key == key:
+                self.recent[bucket] = None
+            if deep is not None and deep.key != key:
+                self.recent[bucket] = deep
+        else:
+            self.recent[bucket] = entry
+
+
+class CatanGame:
+    def __init__(
+        self,
+        players: List[str],
+        seed: Optional[int] = None,
+        agents: Optional[List[Agent]] = None,
+        verbose: bool = True,
+        layout: Optional[BoardLayout] = None,
+        radius: Optional[int] = None,
+        profiler: Optional[GameProfiler] = None,
+        rng: Optional[RandomSource] = None,
+    ):
+        if layout is not None and radius is not None:
+            raise ValueError("Pass either radius or layout, not both; a layout fixes its own radius.")
+        self.rng: RandomSource = rng if rng is not None else GameRandom(seed)
         self.players: List[Player] = [Player(name=p) for p in players]
+        self.agents: List[Agent] = list(agents) if agents is not None else [ConsoleAgent() for _ in players]
+        if len(self.agents) != len(self.players):
+            raise ValueError("Need exactly one agent per player.")
+        self.events = EventBus()
+        if verbose:
+            self.events.subscribe(ConsoleRenderer([p.name for p in self.players]))
         self.tiles: List[Tile] = []
         self.nodes: List[Node] = []
         self.edges: List[Edge] = []
         self.robber_tile: int = -1
         self.current_player: int = 0
         self.round_num: int = 1
-        self._build_board()
-
-    def _build_board(self) -> None:
-        coords = axial_hexes(2)
-        self.rng.shuffle(coords)
-        resources: List[str] = []
-        for res, count in RESOURCE_COUNTS.items():
-            resources.extend([res] * count)
-        self.rng.shuffle(resources)
-        numbers = NUMBER_TOKENS[:]
-        self.rng.shuffle(numbers)
-
-        node_index_by_point: Dict[Tuple[int, int], int] = {}
-        edge_index_by_pair: Dict[Tuple[int, int], int] = {}
-
-        for idx, (q, r) in enumerate(coords):
-            res = resources[idx]
-            number = None if res == "desert" else numbers.pop()
-            tile = Tile(idx=idx, q=q, r=r, resource=res, number=number)
-            self.tiles.append(tile)
-            if res == "desert":
-                self.robber_tile = idx
-
-            cx, cy = hex_center(q, r)
-            corner_ids: List[int] = []
-            for i in range(6):
-                angle = math.radians(60 * i + 30)
-                px = cx + math.cos(angle)
-                py = cy + math.sin(angle)
-                k = key_point(px, py)
-                if k not in node_index_by_point:
-                    nidx = len(self.nodes)
-                    node_index_by_point[k] = nidx
-                    self.nodes.append(Node(idx=nidx, point=k))
-                nidx = node_index_by_point[k]
-                corner_ids.append(nidx)
-                self.nodes[nidx].hexes.append(idx)
-            tile.nodes = corner_ids
-
-            for i in range(6):
-                a = corner_ids[i]
-                b = corner_ids[(i + 1) % 6]
-                pair = tuple(sorted((a, b)))
-                if pair not in edge_index_by_pair:
-                    eidx = len(self.edges)
-                    edge_index_by_pair[pair] = eidx
-                    self.edges.append(Edge(idx=eidx, a=pair[0], b=pair[1]))
-                    self.nodes[pair[0]].edges.add(eidx)
-                    self.nodes[pair[1]].edges.add(eidx)
-
-    def node_neighbors(self, node_idx: int) -> Set[int]:
-        out: Set[int] = set()
-        node = self.nodes[node_idx]
-        for eidx in node.edges:
-            edge = self.edges[eidx]
-            out.add(edge.b if edge.a == node_idx else edge.a)
-        return out
+        self.phase: str = PHASE_SETUP_SETTLEMENT
+        self.setup_node: Optional[int] = None
+        # production[roll][(player, resource)] -> cards paid out on that roll; kept current by
+        # build_settlement, build_city and move_robber so a roll never rescans the board.
+        self.production: List[Dict[Tuple[int, str], int]] = [{} for _ in range(13)]
+        self._build_board(layout, 2 if radius is None else radius)
+        # A catan_profile.GameProfiler shadows the hot methods on this instance only; without
+        # one nothing is wrapped, so an unprofiled game pays nothing.
+        self.profiler = profiler
+        if profiler is not None:
+            profiler.attach(self)
+
+    def _build_board(self, layout: Optional[BoardLayout] = None, radius: int = 2) -> None:
+        if layout is None:
+            layout = BoardLayout.shuffled(self.rng, board_topology(radius))
+        topo = layout.topology
+        self.layout = layout
+        self.topology = topo
+        for idx, (q, r) in enumerate(topo.coords):
+            self.tiles.append(Tile(idx, q, r, layout.resources[idx], layout.numbers[idx], topo.tile_nodes[idx]))
+        self.robber_tile = layout.desert_tile
+        self.nodes = list(starmap(Node, topo.node_rows))
+        self.edges = list(starmap(Edge, topo.edge_rows))
+        self.bits = BoardBits(topo, len(self.players))
+        self.road_net = RoadNetworks(topo, len(self.players))
+        self.robber_index = RobberIndex(layout, len(self.players))
+        self._placement: Optional[PlacementIndex] = None
+
+    @property
+    def placement(self) -> PlacementIndex:
+        """Setup-spot index over this board, built on first use so headless games that never rank nodes skip it."""
+        if self._placement is None:
+            self._placement = PlacementIndex(node_values(self.layout), self.bits)
+        return self._placement
+
+    def node_neighbors(self, node_idx: int) -> FrozenSet[int]:
+        return self.topology.node_neighbors[node_idx]
 
     def print_board(self) -> None:
         print("\nTiles:")
@@ -187,7 +1693,7 @@ class CatanGame:
             if n.owner is not None:
                 piece = "C" if n.is_city else "S"
                 owner = f"{self.players[n.owner].name}:{piece}"
-            print(f"  [{n.idx:02}] owner:{owner:10} hexes:{n.hexes}")
+            print(f"  [{n.idx:02}] owner:{owner:10} pips:{self.placement.values[n.idx].pips:2} hexes:{n.hexes}")
 
         print("\nEdges:")
         for e in self.edges:
@@ -205,64 +1711,71 @@ class CatanGame:
             )
         print()
 
+    def _bump_production(self, number: int, player_idx: int, resource: str, delta: int) -> None:
+        payouts = self.production[number]
+        key = (player_idx, resource)
+        total = payouts.get(key, 0) + delta
+        if total:
+            payouts[key] = total
+        else:
+            del payouts[key]
+
+    def _add_node_production(self, player_idx: int, node_idx: int) -> None:
+        """Count one more card per roll from each producing tile around node_idx."""
+        for tidx in self.nodes[node_idx].hexes:
+            tile = self.tiles[tidx]
+            if tile.number is not None and tidx != self.robber_tile:
+                self._bump_production(tile.number, player_idx, tile.resource, 1)
+
+    def _set_tile_producing(self, tile_idx: int, producing: bool) -> None:
+        tile = self.tiles[tile_idx]
+        if tile.number is None:
+            return
+        sign = 1 if producing else -1
+        for nidx in tile.nodes:
+            node = self.nodes[nidx]
+            if node.owner is not None:
+                self._bump_production(tile.number, node.owner, tile.resource, sign * (2 if node.is_city else 1))
+
     def distribute_resources(self, roll: int) -> None:
-        gains: List[Dict[str, int]] = [{r: 0 for r in RESOURCES} for _ in self.players]
-        for tile in self.tiles:
-            if tile.idx == self.robber_tile or tile.number != roll or tile.resource == "desert":
-                continue
-            for nidx in tile.nodes:
-                node = self.nodes[nidx]
-                if node.owner is None:
-                    continue
-                amount = 2 if node.is_city else 1
-                gains[node.owner][tile.resource] += amount
-        for idx, gain in enumerate(gains):
-            add_resources(self.players[idx].hand, gain)
-        print(f"Roll {roll}: resources distributed.")
+        players = self.players
+        payouts = self.production[roll]
+        for (pidx, res), amount in payouts.items():
+            players[pidx].hand[res] += amount
+        if self.events.subscribers:
+            self.events.emit(ResourcesDistributed, roll, tuple(payouts.items()))
 
     def distance_rule_ok(self, node_idx: int) -> bool:
-        for nbr in self.node_neighbors(node_idx):
-            if self.nodes[nbr].owner is not None:
-                return False
-        return True
+        return self.bits.distance_ok(node_idx)
 
     def has_connected_road(self, player_idx: int, node_idx: int) -> bool:
-        for eidx in self.nodes[node_idx].edges:
-            if self.edges[eidx].owner == player_idx:
-                return True
-        return False
+        return self.bits.has_road_at(player_idx, node_idx)
 
     def can_build_road(self, player_idx: int, edge_idx: int, setup_node: Optional[int] = None) -> Tuple[bool, str]:
         if edge_idx < 0 or edge_idx >= len(self.edges):
             return False, "Invalid edge id."
-        edge = self.edges[edge_idx]
-        if edge.owner is not None:
+        bits = self.bits
+        if bits.all_roads >> edge_idx & 1:
             return False, "Edge already has a road."
         if setup_node is not None:
-            if edge.a == setup_node or edge.b == setup_node:
+            if bits.edge_nodes[edge_idx] >> setup_node & 1:
                 return True, ""
             return False, "Setup road must touch the just-placed settlement."
-
-        p = self.players[player_idx]
-        endpoints = [edge.a, edge.b]
-        for nidx in endpoints:
-            node = self.nodes[nidx]
-            if node.owner == player_idx:
-                return True, ""
-            for eidx in node.edges:
-                if self.edges[eidx].owner == player_idx:
-                    return True, ""
+        if bits.edge_nodes[edge_idx] & (bits.settlements[player_idx] | bits.cities[player_idx]) or (
+            bits.edge_nbrs[edge_idx] & bits.roads[player_idx]
+        ):
+            return True, ""
         return False, "Road must connect to your existing road or building."
 
     def can_build_settlement(self, player_idx: int, node_idx: int, setup: bool = False) -> Tuple[bool, str]:
         if node_idx < 0 or node_idx >= len(self.nodes):
             return False, "Invalid node id."
-        node = self.nodes[node_idx]
-        if node.owner is not None:
+        bits = self.bits
+        if bits.occupied >> node_idx & 1:
             return False, "Node is already occupied."
-        if not self.distance_rule_ok(node_idx):
+        if bits.node_nbrs[node_idx] & bits.occupied:
             return False, "Distance rule violated (adjacent settlement/city)."
-        if not setup and not self.has_connected_road(player_idx, node_idx):
+        if not setup and not bits.node_edges[node_idx] & bits.roads[player_idx]:
             return False, "Settlement must connect to one of your roads."
         return True, ""
 
@@ -276,245 +1789,516 @@ class CatanGame:
             return False, "Node is already a city."
         return True, ""
 
+    # _place_* change the board without any rule check, payment or event; the build_*
+    # methods call them once a move is accepted, and loaders use them to restore a position.
+    def _place_road(self, player_idx: int, edge_idx: int) -> None:
+        self.edges[edge_idx].owner = player_idx
+        self.bits.place_road(player_idx, edge_idx)
+        self.players[player_idx].roads.add(edge_idx)
+        self.road_net.add_road(player_idx, edge_idx)
+        self._sync_longest_road()
+
+    def _place_settlement(self, player_idx: int, node_idx: int) -> None:
+        self.nodes[node_idx].owner = player_idx
+        self.nodes[node_idx].is_city = False
+        self.bits.place_settlement(player_idx, node_idx)
+        self._add_node_production(player_idx, node_idx)
+        self.robber_index.add_building(player_idx, node_idx)
+        self.players[player_idx].settlements.add(node_idx)
+        self.road_net.add_building(player_idx, node_idx)
+        self._sync_longest_road()
+
+    def _place_city(self, player_idx: int, node_idx: int) -> None:
+        player = self.players[player_idx]
+        self.nodes[node_idx].is_city = True
+        self.bits.place_city(player_idx, node_idx)
+        self._add_node_production(player_idx, node_idx)
+        self.robber_index.add_building(player_idx, node_idx)
+        player.settlements.discard(node_idx)
+        player.cities.add(node_idx)
+
+    def _sync_longest_road(self) -> None:
+        holder = self.road_net.holder
+        for idx, player in enumerate(self.players):
+            player.has_longest_road = idx == holder
+
+    def _announce_longest_road(self, previous: Optional[int]) -> None:
+        holder = self.road_net.holder
+        if holder != previous:
+            self.events.emit(LongestRoad, holder, 0 if holder is None else self.road_net.length(holder))
+
     def build_road(self, player_idx: int, edge_idx: int, free: bool = False, setup_node: Optional[int] = None) -> bool:
         ok, reason = self.can_build_road(player_idx, edge_idx, setup_node=setup_node)
         if not ok:
-            print(reason)
+            self.events.emit(Rejected, player_idx, reason)
             return False
         player = self.players[player_idx]
         if not free:
             if not can_afford(player.hand, ROAD_COST):
-                print("Not enough resources for road.")
+                self.events.emit(Rejected, player_idx, "Not enough resources for road.")
                 return False
             pay_cost(player.hand, ROAD_COST)
-        self.edges[edge_idx].owner = player_idx
-        player.roads.add(edge_idx)
-        print(f"{player.name} built road on edge {edge_idx}.")
+        holder = self.road_net.holder
+        self._place_road(player_idx, edge_idx)
+        self.events.emit(RoadBuilt, player_idx, edge_idx)
+        self._announce_longest_road(holder)
         return True
 
     def build_settlement(self, player_idx: int, node_idx: int, free: bool = False, setup: bool = False) -> bool:
         ok, reason = self.can_build_settlement(player_idx, node_idx, setup=setup)
         if not ok:
-            print(reason)
+            self.events.emit(Rejected, player_idx, reason)
             return False
         player = self.players[player_idx]
         if not free:
             if not can_afford(player.hand, SETTLEMENT_COST):
-                print("Not enough resources for settlement.")
+                self.events.emit(Rejected, player_idx, "Not enough resources for settlement.")
                 return False
             pay_cost(player.hand, SETTLEMENT_COST)
-        self.nodes[node_idx].owner = player_idx
-        self.nodes[node_idx].is_city = False
-        player.settlements.add(node_idx)
-        print(f"{player.name} built settlement on node {node_idx}.")
+        holder = self.road_net.holder
+        self._place_settlement(player_idx, node_idx)
+        self.events.emit(SettlementBuilt, player_idx, node_idx)
+        self._announce_longest_road(holder)
         return True
 
     def build_city(self, player_idx: int, node_idx: int) -> bool:
         ok, reason = self.can_build_city(player_idx, node_idx)
         if not ok:
-            print(reason)
+            self.events.emit(Rejected, player_idx, reason)
             return False
         player = self.players[player_idx]
         if not can_afford(player.hand, CITY_COST):
-            print("Not enough resources for city.")
+            self.events.emit(Rejected, player_idx, "Not enough resources for city.")
             return False
         pay_cost(player.hand, CITY_COST)
-        self.nodes[node_idx].is_city = True
-        player.settlements.discard(node_idx)
-        player.cities.add(node_idx)
-        print(f"{player.name} upgraded node {node_idx} to city.")
+        self._place_city(player_idx, node_idx)
+        self.events.emit(CityBuilt, player_idx, node_idx)
+        return True
+
+    def bank_trade(self, player_idx: int, give: str, get: str) -> bool:
+        if give not in RESOURCES or get not in RESOURCES:
+            self.events.emit(Rejected, player_idx, "Invalid resources.")
+            return False
+        player = self.players[player_idx]
+        if player.hand[give] < 4:
+            self.events.emit(Rejected, player_idx, "Need 4 cards of the given resource.")
+            return False
+        player.hand[give] -= 4
+        player.hand[get] += 1
+        self.events.emit(Traded, player_idx, give, get)
         return True
 
     def move_robber(self, player_idx: int, tile_idx: int) -> None:
         if tile_idx < 0 or tile_idx >= len(self.tiles):
-            print("Invalid tile.")
+            self.events.emit(Rejected, player_idx, "Invalid tile.")
             return
         if tile_idx == self.robber_tile:
-            print("Robber is already there.")
+            self.events.emit(Rejected, player_idx, "Robber is already there.")
             return
+        old_tile = self.robber_tile
         self.robber_tile = tile_idx
-        victims: Set[int] = set()
-        for nidx in self.tiles[tile_idx].nodes:
-            owner = self.nodes[nidx].owner
-            if owner is not None and owner != player_idx and self.players[owner].resource_count > 0:
-                victims.add(owner)
+        self._set_tile_producing(old_tile, True)
+        self._set_tile_producing(tile_idx, False)
+        options = self.robber_victims(player_idx, tile_idx)
+        victims = set(options)
+        self.events.emit(RobberMoved, player_idx, tile_idx, tuple(options))
         if not victims:
-            print("Robber moved. No one to steal from.")
             return
-        print("Victims:", ", ".join(f"{v}:{self.players[v].name}" for v in sorted(victims)))
         while True:
-            choice = input("Choose victim player index to steal from: ").strip()
-            if not choice.isdigit():
-                print("Enter a number.")
-                continue
-            vidx = int(choice)
-            if vidx not in victims:
-                print("Invalid victim.")
-                continue
-            break
+            vidx = self.agents[player_idx].choose_victim(self, player_idx, options)
+            if vidx in victims:
+                break
+            self.events.emit(Rejected, player_idx, "Invalid victim.")
         victim = self.players[vidx]
-        bag: List[str] = []
-        for res in RESOURCES:
-            bag.extend([res] * victim.hand[res])
-        stolen = self.rng.choice(bag)
+        stolen = self.rng.steal(victim.hand)
         victim.hand[stolen] -= 1
         self.players[player_idx].hand[stolen] += 1
-        print(f"{self.players[player_idx].name} stole 1 {stolen} from {victim.name}.")
+        self.events.emit(Stolen, player_idx, vidx, stolen)
+
+    def robber_victims(self, player_idx: int, tile_idx: int) -> List[int]:
+        """Opponents with cards in hand and a building on tile_idx, in seat order."""
+        victims: Set[int] = set()
+        for nidx in self.tiles[tile_idx].nodes:
+            owner = self.nodes[nidx].owner
+            if owner is not None and owner != player_idx and self.players[owner].resource_count > 0:
+                victims.add(owner)
+        return sorted(victims)
+
+    def robber_targets(self, player_idx: int) -> List[RobberTarget]:
+        """Every tile player_idx could move the robber to, ranked by the robber index."""
+        return self.robber_index.targets(player_idx, self.robber_tile, [p.resource_count for p in self.players])
 
     def handle_roll_seven(self, player_idx: int) -> None:
         for idx, p in enumerate(self.players):
-            if p.resource_count <= 7:
-                continue
-            to_discard = p.resource_count // 2
-            print(f"{p.name} must discard {to_discard} cards.")
-            while to_discard > 0:
-                print(f"  Hand: {p.hand_str()}")
-                res = input("  Resource to discard: ").strip().lower()
-                if res not in RESOURCES:
-                    print("  Invalid resource.")
-                    continue
-                if p.hand[res] <= 0:
-                    print("  You don't have that resource.")
-                    continue
-                p.hand[res] -= 1
-                to_discard -= 1
+            if p.resource_count > 7:
+                self.discard_half(idx)
         self.prompt_robber_move(player_idx)
 
+    def discard_half(self, player_idx: int) -> None:
+        """Have player_idx discard half their hand, rounded down, one card at a time."""
+        p = self.players[player_idx]
+        to_discard = p.resource_count // 2
+        self.events.emit(MustDiscard, player_idx, to_discard)
+        while to_discard > 0:
+            res = self.agents[player_idx].choose_discard(self, player_idx, to_discard)
+            if res not in RESOURCES:
+                self.events.emit(Rejected, player_idx, "  Invalid resource.")
+                continue
+            if p.hand[res] <= 0:
+                self.events.emit(Rejected, player_idx, "  You don't have that resource.")
+                continue
+            p.hand[res] -= 1
+            to_discard -= 1
+            self.events.emit(Discarded, player_idx, res)
+
     def prompt_robber_move(self, player_idx: int) -> None:
         while True:
-            tile = input("Move robber to tile id: ").strip()
-            if not tile.isdigit():
-                print("Enter a tile number.")
-                continue
-            tidx = int(tile)
+            tidx = self.agents[player_idx].choose_robber_tile(self, player_idx)
             old = self.robber_tile
             self.move_robber(player_idx, tidx)
             if self.robber_tile != old:
                 break
 
-    def setup_phase(self) -> None:
+    # setup_phase and take_turn are sequences of the steps below. Hosts that cannot block on
+    # an agent (catan_server) call the same steps directly as each decision arrives.
+    def setup_order(self) -> List[int]:
         order = list(range(len(self.players)))
-        snake = order + list(reversed(order))
-        print("Setup phase: each player places 2 settlements and 2 roads.")
-        for turn_idx, pidx in enumerate(snake):
-            player = self.players[pidx]
-            print(f"\n{player.name}'s setup turn.")
-            while True:
-                node = input("Choose settlement node id: ").strip()
-                if not node.isdigit():
-                    print("Enter a node number.")
-                    continue
-                nidx = int(node)
-                if self.build_settlement(pidx, nidx, free=True, setup=True):
-                    break
-            while True:
-                edge = input("Choose adjacent road edge id: ").strip()
-                if not edge.isdigit():
-                    print("Enter an edge number.")
-                    continue
-                eidx = int(edge)
-                if self.build_road(pidx, eidx, free=True, setup_node=nidx):
-                    break
-            if turn_idx >= len(order):
-                gains: Dict[str, int] = {r: 0 for r in RESOURCES}
-                for tidx in self.nodes[nidx].hexes:
-                    tile = self.tiles[tidx]
-                    if tile.resource != "desert":
-                        gains[tile.resource] += 1
-                add_resources(player.hand, gains)
-                print(f"{player.name} gains starting resources from second settlement.")
+        return order + list(reversed(order))
 
+    def begin_setup_turn(self, player_idx: int) -> None:
+        self.current_player = player_idx
+        self.phase = PHASE_SETUP_SETTLEMENT
+        self.events.emit(SetupTurn, player_idx)
+
+    def setup_settlement(self, player_idx: int, node_idx: int) -> bool:
+        """Place a free setup settlement; on success the turn moves on to its road."""
+        if not self.build_settlement(player_idx, node_idx, free=True, setup=True):
+            return False
+        self.phase = PHASE_SETUP_ROAD
+        self.setup_node = node_idx
+        return True
+
+    def setup_road(self, player_idx: int, edge_idx: int, second_round: bool) -> bool:
+        """Place the free road by the setup settlement; the second-round one also pays starting resources."""
+        nidx = self.setup_node
+        if not self.build_road(player_idx, edge_idx, free=True, setup_node=nidx):
+            return False
+        if second_round:
+            gains: Dict[str, int] = {r: 0 for r in RESOURCES}
+            for tidx in self.nodes[nidx].hexes:
+                tile = self.tiles[tidx]
+                if tile.resource != "desert":
+                    gains[tile.resource] += 1
+            add_resources(self.players[player_idx].hand, gains)
+            self.events.emit(StartingResources, player_idx, tuple(gains.items()))
+        return True
+
+    def finish_setup(self) -> None:
         self.current_player = 0
+        self.phase = PHASE_MAIN
+        self.setup_node = None
+
+    def setup_phase(self) -> None:
+        self.events.emit(SetupStarted)
+        for turn_idx, pidx in enumerate(self.setup_order()):
+            agent = self.agents[pidx]
+            self.begin_setup_turn(pidx)
+            while not self.setup_settlement(pidx, agent.choose_setup_settlement(self, pidx)):
+                pass
+            second_round = turn_idx >= len(self.players)
+            while not self.setup_road(pidx, agent.choose_setup_road(self, pidx, self.setup_node), second_round):
+                pass
+        self.finish_setup()
+
+    def snapshot(self) -> GameState:
+        """A search copy of the live position that shares this game's board layout."""
+        return GameState(
+            self.layout,
+            self.bits.copy(),
+            self.road_net.copy(),
+            [dict(p.hand) for p in self.players],
+            self.robber_tile,
+            self.current_player,
+        )
+
+    def legal_actions(self, player_idx: int) -> List[Action]:
+        """Every move player_idx can make right now, in the same form agents return.
+
+        Built from the BoardBits frontier masks, so the cost is proportional to the
+        number of moves returned rather than to the board size.
+        """
+        bits = self.bits
+        if self.phase == PHASE_SETUP_SETTLEMENT:
+            return [("settlement", n) for n in iter_bits(bits.free_nodes)]
+        if self.phase == PHASE_SETUP_ROAD:
+            return [("road", e) for e in iter_bits(bits.node_edges[self.setup_node] & ~bits.all_roads)]
+
+        return main_phase_actions(bits, self.players[player_idx].hand, player_idx)
+
+    def apply_action(self, player_idx: int, action: Action) -> bool:
+        """Carry out one non-"end" action; returns False when it was rejected."""
+        kind = action[0]
+        if kind == "road":
+            return self.build_road(player_idx, action[1])
+        if kind == "settlement":
+            return self.build_settlement(player_idx, action[1])
+        if kind == "city":
+            return self.build_city(player_idx, action[1])
+        if kind == "trade":
+            return self.bank_trade(player_idx, action[1], action[2])
+        if kind == "robber":
+            old = self.robber_tile
+            self.move_robber(player_idx, action[1])
+            return self.robber_tile != old
+        self.events.emit(Rejected, player_idx, "Unknown command. Type 'help'.")
+        return False
 
     def take_turn(self) -> bool:
-        player = self.players[self.current_player]
-        print(f"\n=== Round {self.round_num} | {player.name}'s turn ===")
-        self.print_status()
+        pidx = self.current_player
+        player = self.players[pidx]
+        agent = self.agents[pidx]
+        self.events.emit(TurnStarted, self.round_num, pidx)
 
-        input("Press Enter to roll dice...")
-        roll = self.rng.randint(1, 6) + self.rng.randint(1, 6)
-        print(f"{player.name} rolled {roll}.")
+        agent.before_roll(self, pidx)
+        roll = self.roll_dice(pidx)
         if roll == 7:
-            self.handle_roll_seven(self.current_player)
+            self.handle_roll_seven(pidx)
         else:
             self.distribute_resources(roll)
 
         while True:
-            cmd = input(
-                "Command [help, board, hand, build road <e>, build settlement <n>, build city <n>, "
-                "trade <give> <get>, robber <tile>, end]: "
-            ).strip()
-            parts = cmd.split()
-            if not parts:
-                continue
-            if parts[0] == "help":
-                print("Commands:")
-                print("  board")
-                print("  hand")
-                print("  build road <edge_id>")
-                print("  build settlement <node_id>")
-                print("  build city <node_id>")
-                print("  trade <give_res> <get_res>   (4:1 bank trade)")
-                print("  robber <tile_id>             (only after rolling 7 in official rules)")
-                print("  end")
-                continue
-            if parts[0] == "board":
-                self.print_board()
-                continue
-            if parts[0] == "hand":
-                print(player.hand_str())
-                continue
-            if len(parts) >= 3 and parts[0] == "build" and parts[1] == "road" and parts[2].isdigit():
-                self.build_road(self.current_player, int(parts[2]))
-                if player.victory_points >= 10:
-                    return True
-                continue
-            if len(parts) >= 3 and parts[0] == "build" and parts[1] == "settlement" and parts[2].isdigit():
-                self.build_settlement(self.current_player, int(parts[2]))
-                if player.victory_points >= 10:
-                    return True
-                continue
-            if len(parts) >= 3 and parts[0] == "build" and parts[1] == "city" and parts[2].isdigit():
-                self.build_city(self.current_player, int(parts[2]))
-                if player.victory_points >= 10:
-                    return True
-                continue
-            if len(parts) == 3 and parts[0] == "trade":
-                give = parts[1].lower()
-                get = parts[2].lower()
-                if give not in RESOURCES or get not in RESOURCES:
-                    print("Invalid resources.")
-                    continue
-                if player.hand[give] < 4:
-                    print("Need 4 cards of the given resource.")
-                    continue
-                player.hand[give] -= 4
-                player.hand[get] += 1
-                print(f"Traded 4 {give} for 1 {get}.")
-                continue
-            if len(parts) == 2 and parts[0] == "robber" and parts[1].isdigit():
-                self.move_robber(self.current_player, int(parts[1]))
-                continue
-            if parts[0] == "end":
+            action = agent.choose_action(self, pidx)
+            if action[0] == "end":
                 break
-            print("Unknown command. Type 'help'.")
+            if self.apply_action(pidx, action) and player.victory_points >= WINNING_POINTS:
+                return True
 
-        if player.victory_points >= 10:
+        if player.victory_points >= WINNING_POINTS:
             return True
+        self.end_turn()
+        return False
+
+    def roll_dice(self, player_idx: int) -> int:
+        roll = self.rng.roll()
+        self.events.emit(DiceRolled, player_idx, roll)
+        return roll
+
+    def end_turn(self) -> None:
         self.current_player = (self.current_player + 1) % len(self.players)
         if self.current_player == 0:
             self.round_num += 1
-        return False
+
+    def play(self, max_rounds: Optional[int] = None) -> Optional[int]:
+        """Run setup and turns to completion; returns the winner, or None if max_rounds ran out.
+
+        A game that is already in the main phase (e.g. one loaded from a save) skips setup.
+        """
+        if self.phase != PHASE_MAIN:
+            self.setup_phase()
+        while True:
+            if self.take_turn():
+                winner = self.current_player
+                self.events.emit(GameWon, winner, self.players[winner].victory_points)
+                return winner
+            if max_rounds is not None and self.round_num > max_rounds:
+                return None
 
     def run(self) -> None:
         print("\nWelcome to Terminal Catan (base-game inspired).")
         self.print_board()
-        self.setup_phase()
+        self.play()
+
+
+# -- text commands ----------------------------------------------------------------------------
+
+Prompt = Tuple[int, str]  # seat, decision kind
+_Steps = Generator[Prompt, str, None]
+
+
+class _QueuedAgent(Agent):
+    """Answers the engine with decisions a CommandFlow has already read and validated."""
+
+    def __init__(self) -> None:
+        self.discards: List[str] = []
+        self.tile = -1
+        self.victim = -1
+
+    def choose_discard(self, game: "CatanGame", player_idx: int, remaining: int) -> str:
+        return self.discards.pop()
+
+    def choose_robber_tile(self, game: "CatanGame", player_idx: int) -> int:
+        return self.tile
+
+    def choose_victim(self, game: "CatanGame", player_idx: int, victims: List[int]) -> int:
+        return self.victim
+
+
+class CommandFlow:
+    """A game's setup and turns as prompts answered with text commands.
+
+    Hosts that cannot block on an agent (catan_server, catan_script) drive a game
+    through this one flow. `prompt` is the (seat, kind) the game waits on, or None once
+    it is over; `answer(text)` applies one command for that seat and leaves `error` set
+    to why it was refused, if it was, in which case the same decision is asked again.
+    The kinds and the commands they take:
+
+        setup_settlement   build settlement <node>
+        setup_road         build road <edge>
+        roll               roll (or roll <total> when fixed_dice is set)
+        discard            discard <resource> ... (half the hand, for each seat over 7 cards)
+        robber             robber <tile>
+        victim             victim <seat>, from `victims` (only asked when there is a choice)
+        action             build road|settlement|city <id>, trade <give> <get>, robber <tile>, end
+
+    The game's agents are replaced. A game already in the main phase (e.g. a loaded
+    save) starts at its current player's roll.
+    """
+
+    def __init__(self, game: "CatanGame", fixed_dice: bool = False):
+        self.game = game
+        self.fixed_dice = fixed_dice
+        self.agents = [_QueuedAgent() for _ in game.players]
+        game.agents = self.agents
+        self.error: Optional[str] = None
+        self.victims: List[int] = []
+        self.winner: Optional[int] = None
+        self._steps = self._play()
+        self.prompt: Optional[Prompt] = next(self._steps)
+
+    def answer(self, text: str) -> Optional[Prompt]:
+        """Apply one command for the waiting seat; returns the next prompt."""
+        self.error = None
+        try:
+            self.prompt = self._steps.send(text)
+        except StopIteration:
+            self.prompt = None
+        return self.prompt
+
+    def _note(self, event: tuple) -> None:
+        if type(event) is Rejected and self.error is None:
+            self.error = event.reason.strip()
+
+    def _attempt(self, step: Callable[..., bool], *args: object) -> bool:
+        """Call one engine step, keeping the reason if it is rejected.
+
+        The bus only has this subscriber for the length of the call, so a game with no
+        other subscribers still builds no events between commands.
+        """
+        events = self.game.events
+        events.subscribe(self._note)
+        try:
+            ok = step(*args)
+        finally:
+            events.unsubscribe(self._note)
+        if not ok and self.error is None:
+            self.error = "Rejected."
+        return ok
+
+    def _ask_action(self, seat: int, kind: str) -> Generator[Prompt, str, Action]:
         while True:
-            if self.take_turn():
-                winner = self.players[self.current_player]
-                print(f"\n{winner.name} wins with {winner.victory_points} victory points!")
-                break
+            action = parse_command((yield seat, kind))
+            if action is not None:
+                return action
+            self.error = "Unknown command."
+
+    def _ask_id(self, seat: int, kind: str, piece: str) -> Generator[Prompt, str, int]:
+        while True:
+            action = yield from self._ask_action(seat, kind)
+            if action[0] == piece:
+                return action[1]
+            self.error = f"Expected: build {piece} <id>."
+
+    def _ask_roll(self, seat: int) -> Generator[Prompt, str, int]:
+        while True:
+            words = (yield seat, "roll").split()
+            if words == ["roll"]:
+                return self.game.roll_dice(seat)
+            if self.fixed_dice and len(words) == 2 and words[0] == "roll" and words[1].isdigit():
+                if 2 <= int(words[1]) <= 12:
+                    roll = int(words[1])
+                    self.game.events.emit(DiceRolled, seat, roll)
+                    return roll
+            self.error = "Expected: roll, or roll <2-12>." if self.fixed_dice else "Expected: roll."
+
+    def _collect_discards(self) -> _Steps:
+        for idx, player in enumerate(self.game.players):
+            count = player.resource_count // 2
+            if player.resource_count <= 7:
+                continue
+            while True:
+                words = (yield idx, "discard").split()
+                picks = words[1:]
+                if words[:1] == ["discard"] and len(picks) == count and all(
+                    res in RESOURCES and picks.count(res) <= player.hand[res] for res in picks
+                ):
+                    break
+                self.error = f"Expected: discard followed by {count} resources from your hand."
+            self.agents[idx].discards = picks[::-1]
+
+    def _ask_robber(self, seat: int) -> Generator[Prompt, str, int]:
+        game = self.game
+        while True:
+            action = yield from self._ask_action(seat, "robber")
+            if action[0] == "robber" and action[1] < len(game.tiles) and action[1] != game.robber_tile:
+                yield from self._choose_victim(seat, action[1])
+                return action[1]
+            self.error = "Expected: robber <tile> on a tile without the robber."
+
+    def _choose_victim(self, seat: int, tile_idx: int) -> _Steps:
+        if not 0 <= tile_idx < len(self.game.tiles) or tile_idx == self.game.robber_tile:
+            return
+        victims = self.game.robber_victims(seat, tile_idx)
+        if len(victims) == 1:
+            self.agents[seat].victim = victims[0]
+        elif victims:
+            self.victims = victims
+            while True:
+                words = (yield seat, "victim").split()
+                if len(words) == 2 and words[0] == "victim" and words[1].isdigit() and int(words[1]) in victims:
+                    self.agents[seat].victim = int(words[1])
+                    return
+                self.error = "Expected: victim <seat> from the candidates."
+
+    def _play(self) -> _Steps:
+        game = self.game
+        if game.phase != PHASE_MAIN:
+            game.events.emit(SetupStarted)
+            for turn_idx, pidx in enumerate(game.setup_order()):
+                game.begin_setup_turn(pidx)
+                while True:
+                    nidx = yield from self._ask_id(pidx, "setup_settlement", "settlement")
+                    if self._attempt(game.setup_settlement, pidx, nidx):
+                        break
+                second_round = turn_idx >= len(game.players)
+                while True:
+                    eidx = yield from self._ask_id(pidx, "setup_road", "road")
+                    if self._attempt(game.setup_road, pidx, eidx, second_round):
+                        break
+            game.finish_setup()
+
+        while True:
+            pidx = game.current_player
+            player = game.players[pidx]
+            game.events.emit(TurnStarted, game.round_num, pidx)
+            roll = yield from self._ask_roll(pidx)
+            if roll == 7:
+                yield from self._collect_discards()
+                self.agents[pidx].tile = yield from self._ask_robber(pidx)
+                game.handle_roll_seven(pidx)
+            else:
+                game.distribute_resources(roll)
+            while player.victory_points < WINNING_POINTS:
+                action = yield from self._ask_action(pidx, "action")
+                if action[0] == "end":
+                    break
+                if action[0] == "robber":
+                    yield from self._choose_victim(pidx, action[1])
+                self._attempt(game.apply_action, pidx, action)
+            if player.victory_points >= WINNING_POINTS:
+                self.winner = pidx
+                game.events.emit(GameWon, pidx, player.victory_points)
+                return
+            game.end_turn()
 
 
 def prompt_players() -> List[str]:
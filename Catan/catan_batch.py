@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""Run many headless CatanGame matches over a process pool.
+
+Game i is seeded from derive_seed(master_seed, i), so every game is reproducible
+on its own and results do not depend on how many workers ran the batch.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import multiprocessing
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional
+
+from catan import RESOURCES, Agent, CatanGame, RandomAgent, derive_seed
+from catan_profile import GameProfiler
+
+AgentFactory = Callable[[int, int], Agent]
+
+
+def random_agents(seat: int, seed: int) -> Agent:
+    return RandomAgent(seed)
+
+
+@dataclass
+class GameResult:
+    index: int
+    seed: int
+    winner: Optional[int]
+    rounds: int
+    vp_curve: List[List[int]] = field(default_factory=list)
+    produced: List[Dict[str, int]] = field(default_factory=list)
+    profile: Dict[str, List[float]] = field(default_factory=dict)
+
+
+class RecordingGame(CatanGame):
+    """A CatanGame that tallies the cards each player receives from rolls."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.produced: List[Dict[str, int]] = [{r: 0 for r in RESOURCES} for _ in self.players]
+
+    def distribute_resources(self, roll: int) -> None:
+        for (pidx, res), amount in self.production[roll].items():
+            self.produced[pidx][res] += amount
+        super().distribute_resources(roll)
+
+
+def play_one(
+    index: int,
+    master_seed: int,
+    num_players: int,
+    max_rounds: int,
+    agent_factory: AgentFactory,
+    profile: bool = False,
+) -> GameResult:
+    seed = derive_seed(master_seed, index)
+    agents = [agent_factory(seat, derive_seed(seed, "agent", seat)) for seat in range(num_players)]
+    names = [f"P{seat}" for seat in range(num_players)]
+    profiler = GameProfiler() if profile else None
+    game = RecordingGame(names, seed=derive_seed(seed, "game"), agents=agents, verbose=False, profiler=profiler)
+    game.setup_phase()
+    vp_curve: List[List[int]] = []
+    winner: Optional[int] = None
+    while game.round_num <= max_rounds:
+        round_num = game.round_num
+        if game.take_turn():
+            winner = game.current_player
+        if winner is not None or game.round_num != round_num:
+            vp_curve.append([p.victory_points for p in game.players])
+        if winner is not None:
+            break
+    stats = profiler.as_dict() if profiler is not None else {}
+    # A game cut off at the cap has already moved on to round max_rounds + 1 without playing it.
+    rounds = min(game.round_num, max_rounds)
+    return GameResult(index, seed, winner, rounds, vp_curve, game.produced, stats)
+
+
+class _Job:
+    """Picklable single-argument wrapper so Pool.imap can ship the batch settings once per task."""
+
+    def __init__(
+        self, master_seed: int, num_players: int, max_rounds: int, agent_factory: AgentFactory, profile: bool = False
+    ):
+        self.args = (master_seed, num_players, max_rounds, agent_factory, profile)
+
+    def __call__(self, index: int) -> GameResult:
+        return play_one(index, *self.args)
+
+
+class WinRates:
+    """Running win counts per seat with Wilson score confidence intervals.
+
+    Wilson rather than the normal approximation, whose interval collapses to zero
+    width for a seat that has won every game or none of them.
+    """
+
+    def __init__(self, num_players: int, z: float = 1.96):
+        self.z = z
+        self.games = 0
+        self.wins = [0] * num_players
+        self.unfinished = 0
+
+    def add(self, result: GameResult) -> None:
+        self.games += 1
+        if result.winner is None:
+            self.unfinished += 1
+        else:
+            self.wins[result.winner] += 1
+
+    def rates(self) -> List[float]:
+        return [w / self.games if self.games else 0.0 for w in self.wins]
+
+    def halfwidth(self) -> float:
+        """Widest CI half-width over all seats; infinite until some game has a winner."""
+        if not any(self.wins):
+            return math.inf
+        n, z2 = self.games, self.z * self.z
+        return max(self.z * math.sqrt(p * (1 - p) / n + z2 / (4 * n * n)) / (1 + z2 / n) for p in self.rates())
+
+
+def run_batch(
+    games: int,
+    master_seed: int = 0,
+    workers: Optional[int] = None,
+    num_players: int = 4,
+    max_rounds: int = 500,
+    agent_factory: AgentFactory = random_agents,
+    ci_halfwidth: Optional[float] = None,
+    min_games: int = 100,
+    chunksize: int = 64,
+    profile: bool = False,
+) -> Iterator[GameResult]:
+    """Yield results in game order, stopping early once every seat's win-rate CI is within ci_halfwidth.
+
+    Results arrive in index order whatever the worker count, so the early stop
+    triggers on the same game every time for a given master seed.
+    """
+    workers = workers or multiprocessing.cpu_count()
+    job = _Job(master_seed, num_players, max_rounds, agent_factory, profile)
+    stats = WinRates(num_players)
+
+    def stop(result: GameResult) -> bool:
+        stats.add(result)
+        return ci_halfwidth is not None and stats.games >= min_games and stats.halfwidth() <= ci_halfwidth
+
+    if workers == 1:
+        for index in range(games):
+            result = job(index)
+            yield result
+            if stop(result):
+                return
+        return
+
+    with multiprocessing.Pool(workers) as pool:
+        for result in pool.imap(job, range(games), chunksize=chunksize):
+            yield result
+            if stop(result):
+                pool.terminate()
+                return
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run headless Catan games in parallel.")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0, help="master seed for the whole batch")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--max-rounds", type=int, default=500)
+    parser.add_argument("--ci", type=float, default=None, help="stop once every win-rate CI half-width is below this")
+    parser.add_argument("--out", default=None, help="write one JSON line per game to this file")
+    parser.add_argument("--profile", action="store_true", help="time hot paths and agents, and print a summary")
+    args = parser.parse_args()
+
+    stats = WinRates(args.players)
+    profile = GameProfiler()
+    out = open(args.out, "w") if args.out else None
+    try:
+        results = run_batch(
+            args.games,
+            args.seed,
+            args.workers,
+            args.players,
+            args.max_rounds,
+            ci_halfwidth=args.ci,
+            profile=args.profile,
+        )
+        for result in results:
+            stats.add(result)
+            profile.merge_dict(result.profile)
+            if out:
+                out.write(json.dumps(asdict(result)) + "\n")
+    finally:
+        if out:
+            out.close()
+
+    print(f"Games: {stats.games}  unfinished: {stats.unfinished}  CI half-width: {stats.halfwidth():.4f}")
+    for seat, rate in enumerate(stats.rates()):
+        print(f"  P{seat}: {rate:.3f}")
+    if args.profile:
+        print(profile.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""Benchmarks for the Python engine's hot paths.
+
+Every workload is seeded, so runs differ only by machine noise. Results are
+written as JSON and can be compared against a stored baseline:
+
+    python3 catan_bench.py --out bench/latest.json --compare bench/baseline.json
+
+Timings report the best of several repeats; memory is measured with tracemalloc.
+The suite runs --rounds times, interleaved, and keeps each benchmark's best round, so
+a slow stretch on a shared machine has to outlast the whole run to show up; a
+benchmark that still looks slower than the baseline is rerun up to --retries times
+before it is reported, so a regression has to persist across all of those. Timings
+under a microsecond are compared with at least MICRO_TOLERANCE, because a few
+nanoseconds of jitter is already a large fraction of them. The committed baseline was
+recorded on one development machine, so refresh it with --out when comparing on
+different hardware.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+from catan import CatanGame, RandomAgent
+
+PLAYERS = ["A", "B", "C", "D"]
+DEFAULT_BASELINE = "bench/baseline.json"
+MICRO_TOLERANCE = 0.5
+
+
+def headless_game(seed: int) -> CatanGame:
+    agents = [RandomAgent(seed * 10 + i) for i in range(len(PLAYERS))]
+    return CatanGame(PLAYERS, seed=seed, agents=agents, verbose=False)
+
+
+def midgame(seed: int = 1, rounds: int = 30) -> CatanGame:
+    """A fixed position a few dozen rounds in, with pieces spread over the board."""
+    game = headless_game(seed)
+    game.play(max_rounds=rounds)
+    return game
+
+
+def best_time(fn: Callable[[], object], ops: int, repeat: int = 5) -> float:
+    """Best seconds per op over `repeat` calls of fn, where one call performs `ops` operations."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best / ops
+
+
+def per_op(value: float) -> Dict[str, object]:
+    return {"value": round(value * 1e6, 4), "unit": "us/op", "better": "lower"}
+
+
+def bench_game_init() -> Dict[str, object]:
+    return per_op(best_time(lambda: [headless_game(seed) for seed in range(200)], 200))
+
+
+def bench_build_board() -> Dict[str, object]:
+    game = headless_game(0)
+
+    def rebuild() -> None:
+        for _ in range(200):
+            game.tiles.clear()
+            game._build_board()
+
+    return per_op(best_time(rebuild, 200))
+
+
+def bench_distribute_resources() -> Dict[str, object]:
+    game = midgame()
+    rolls = [r for r in range(2, 13) if r != 7] * 100
+    return per_op(best_time(lambda: [game.distribute_resources(r) for r in rolls], len(rolls)))
+
+
+def bench_can_build(kind: str) -> Dict[str, object]:
+    game = midgame()
+    players = range(len(game.players))
+    if kind == "road":
+        ids = range(len(game.edges))
+        check: Callable[[int, int], object] = game.can_build_road
+    else:
+        ids = range(len(game.nodes))
+        check = game.can_build_settlement if kind == "settlement" else game.can_build_city
+
+    def sweep() -> None:
+        for _ in range(20):
+            for p in players:
+                for i in ids:
+                    check(p, i)
+
+    return per_op(best_time(sweep, 20 * len(players) * len(ids)))
+
+
+def bench_legal_actions() -> Dict[str, object]:
+    game = midgame()
+    for player in game.players:
+        player.hand.update({r: 5 for r in player.hand})
+    return per_op(best_time(lambda: [game.legal_actions(p) for _ in range(500) for p in range(4)], 2000))
+
+
+def bench_move_robber_steal() -> Dict[str, object]:
+    game = midgame()
+    hand = {r: 3 for r in game.players[0].hand}
+    occupied = [t.idx for t in game.tiles if any(game.nodes[n].owner not in (None, 0) for n in t.nodes)]
+    a, b = occupied[0], occupied[1]
+
+    def steals() -> None:
+        for _ in range(500):
+            for player in game.players:
+                player.hand.update(hand)
+            game.move_robber(0, a)
+            game.move_robber(0, b)
+
+    return per_op(best_time(steals, 1000))
+
+
+def bench_state_clone() -> Dict[str, object]:
+    state = midgame().snapshot()
+    return per_op(best_time(lambda: [state.clone() for _ in range(2000)], 2000))
+
+
+def bench_full_games() -> Dict[str, object]:
+    seeds = range(100, 160)
+
+    def play() -> None:
+        for seed in seeds:
+            headless_game(seed).play(max_rounds=500)
+
+    seconds = best_time(play, len(seeds), repeat=3)
+    return {"value": round(1 / seconds, 2), "unit": "games/s", "better": "higher"}
+
+
+def bench_game_memory() -> Dict[str, object]:
+    """Bytes retained per fresh CatanGame, averaged over 100 live instances."""
+    headless_game(0)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    games = [headless_game(seed) for seed in range(100)]
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del games
+    return {"value": retained // 100, "unit": "bytes", "better": "lower"}
+
+
+def bench_game_peak_memory() -> Dict[str, object]:
+    """Peak traced bytes while playing one full seeded game."""
+    headless_game(0)
+    tracemalloc.start()
+    headless_game(7).play(max_rounds=500)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"value": peak, "unit": "bytes", "better": "lower"}
+
+
+BENCHMARKS: Dict[str, Callable[[], Dict[str, object]]] = {
+    "game_init": bench_game_init,
+    "build_board": bench_build_board,
+    "distribute_resources": bench_distribute_resources,
+    "can_build_road": lambda: bench_can_build("road"),
+    "can_build_settlement": lambda: bench_can_build("settlement"),
+    "can_build_city": lambda: bench_can_build("city"),
+    "legal_actions": bench_legal_actions,
+    "move_robber_steal": bench_move_robber_steal,
+    "state_clone": bench_state_clone,
+    "full_games": bench_full_games,
+    "game_memory": bench_game_memory,
+    "game_peak_memory": bench_game_peak_memory,
+}
+
+
+def _better(a: Dict[str, object], b: Dict[str, object]) -> Dict[str, object]:
+    if a["better"] == "lower":
+        return a if a["value"] <= b["value"] else b
+    return a if a["value"] >= b["value"] else b
+
+
+def run(names: Optional[List[str]] = None, rounds: int = 1) -> Dict[str, object]:
+    results: Dict[str, Dict[str, object]] = {}
+    for _ in range(rounds):
+        for name in names or list(BENCHMARKS):
+            result = BENCHMARKS[name]()
+            results[name] = _better(results[name], result) if name in results else result
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def _change(cur: Dict[str, object], base: Dict[str, object], tolerance: float) -> Tuple[float, bool]:
+    """Relative change from base to cur, and whether it is a regression beyond tolerance.
+
+    Sub-microsecond timings are allowed MICRO_TOLERANCE instead when that is larger.
+    """
+    change = cur["value"] / base["value"] - 1 if base["value"] else 0.0
+    allowed = max(tolerance, MICRO_TOLERANCE) if base["unit"] == "us/op" and base["value"] < 1 else tolerance
+    return change, change > allowed if base["better"] == "lower" else change < -allowed
+
+
+def confirm(current: Dict[str, object], baseline: Dict[str, object], tolerance: float, retries: int) -> None:
+    """Rerun benchmarks that look regressed, keeping their best result, until they pass or retries run out."""
+    results = current["results"]
+    for _ in range(retries):
+        flagged = [
+            name
+            for name, base in baseline["results"].items()
+            if name in results and _change(results[name], base, tolerance)[1]
+        ]
+        if not flagged:
+            return
+        for name in flagged:
+            results[name] = _better(results[name], BENCHMARKS[name]())
+
+
+def compare(current: Dict[str, object], baseline: Dict[str, object], tolerance: float) -> List[str]:
+    """Names of benchmarks that got worse than baseline by more than `tolerance` (0.2 = 20%)."""
+    regressions = []
+    print(f"{'benchmark':24} {'baseline':>14} {'current':>14} {'change':>8}")
+    for name, base in baseline["results"].items():
+        cur = current["results"].get(name)
+        if cur is None:
+            continue
+        change, worse = _change(cur, base, tolerance)
+        flag = "  REGRESSION" if worse else ""
+        print(f"{name:24} {base['value']:>14} {cur['value']:>14} {change:>+8.1%}{flag}")
+        if worse:
+            regressions.append(name)
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the Python Catan engine.")
+    parser.add_argument("names", nargs="*", help=f"subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--out", default=None, help="write results JSON here")
+    parser.add_argument("--compare", nargs="?", const=DEFAULT_BASELINE, default=None, help="baseline JSON to diff")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before flagging")
+    parser.add_argument("--rounds", type=int, default=5, help="run the suite this many times and keep each best")
+    parser.add_argument("--retries", type=int, default=10, help="reruns of a benchmark that looks regressed")
+    args = parser.parse_args()
+
+    unknown = [n for n in args.names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    current = run(args.names, args.rounds)
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump(current, fh, indent=2)
+            fh.write("\n")
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+        confirm(current, baseline, args.tolerance, args.retries)
+        if compare(current, baseline, args.tolerance):
+            sys.exit(1)
+    else:
+        print(json.dumps(current["results"], indent=2))
+
+
+if __name__ == "__main__":
+    main()
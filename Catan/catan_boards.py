@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""Generate, score and filter Catan board layouts in bulk.
+
+Candidate deals are drawn as (K, T) arrays of tile kinds and numbers, scored
+with whole-batch pip and adjacency metrics, and kept only if they meet a set
+of `FairnessRules`. Accepted layouts can be saved as a `LayoutLibrary`, from
+which a game picks its board with a single lookup:
+
+    library = LayoutLibrary.load("boards.npz")
+    game = CatanGame(names, seed=seed, layout=library.for_seed(seed))
+
+Requires NumPy.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+from catan import (
+    PIPS,
+    RESOURCES,
+    TILE_KINDS,
+    BoardLayout,
+    BoardTopology,
+    board_topology,
+    derive_seed,
+    number_tokens,
+    resource_counts,
+)
+
+DESERT = TILE_KINDS.index("desert")
+TOKEN_PIPS = np.array(PIPS, dtype=np.int16)  # index 0 stands for "no token"
+HEX_DIRECTIONS = ((1, 0), (1, -1), (0, -1), (-1, 0), (-1, 1), (0, 1))
+
+
+@dataclass(frozen=True)
+class FairnessRules:
+    """Limits a layout must meet to be accepted.
+
+    A resource's pip share is its pip total over what its tiles would hold at the
+    board's average pips per numbered tile, so 1.0 is exactly fair.
+    """
+
+    max_red_pairs: int = 0  # adjacent tiles that both carry a 6 or an 8
+    max_twin_pairs: int = 0  # adjacent tiles with the same number
+    max_node_pips: int = 12  # pips on the richest intersection
+    min_resource_share: float = 0.6
+    max_resource_share: float = 1.4
+
+
+@dataclass(frozen=True)
+class BoardArrays:
+    """Index tables for scoring layouts over one topology."""
+
+    tile_pairs: np.ndarray  # (A, 2) tiles that share an edge
+    node_tiles: np.ndarray  # (N, 3) tiles around each node, padded with T
+    kinds: np.ndarray  # (T,) tile kind codes in resource_counts order
+    tokens: np.ndarray  # (T - deserts,) number tokens
+    mean_pips: float
+
+
+@lru_cache(maxsize=None)
+def board_arrays(radius: int = 2) -> BoardArrays:
+    topo = board_topology(radius)
+    index = {coord: tidx for tidx, coord in enumerate(topo.coords)}
+    pairs = [
+        (tidx, index[(q + dq, r + dr)])
+        for tidx, (q, r) in enumerate(topo.coords)
+        for dq, dr in HEX_DIRECTIONS
+        if index.get((q + dq, r + dr), -1) > tidx
+    ]
+    T = len(topo.coords)
+    node_tiles = np.full((len(topo.node_hexes), 3), T, dtype=np.intp)
+    for nidx, hexes in enumerate(topo.node_hexes):
+        node_tiles[nidx, : len(hexes)] = hexes
+    kinds = np.array(
+        [TILE_KINDS.index(res) for res, count in resource_counts(T).items() for _ in range(count)], dtype=np.uint8
+    )
+    tokens = np.array(number_tokens(int((kinds != DESERT).sum())), dtype=np.uint8)
+    return BoardArrays(
+        tile_pairs=np.array(pairs, dtype=np.intp).reshape(-1, 2),
+        node_tiles=node_tiles,
+        kinds=kinds,
+        tokens=tokens,
+        mean_pips=float(TOKEN_PIPS[tokens].mean()),
+    )
+
+
+def deal(rng: np.random.Generator, count: int, radius: int = 2) -> Tuple[np.ndarray, np.ndarray]:
+    """count random layouts as (count, T) kind codes and numbers (0 on deserts)."""
+    arrays = board_arrays(radius)
+    kinds = arrays.kinds[rng.random((count, len(arrays.kinds))).argsort(axis=1)]
+    tokens = arrays.tokens[rng.random((count, len(arrays.tokens))).argsort(axis=1)]
+    numbers = np.zeros(kinds.shape, dtype=np.uint8)
+    numbers[kinds != DESERT] = tokens.ravel()
+    return kinds, numbers
+
+
+def score(kinds: np.ndarray, numbers: np.ndarray, radius: int = 2) -> Dict[str, np.ndarray]:
+    """Fairness metrics for every row of a (K, T) batch of layouts."""
+    arrays = board_arrays(radius)
+    pips = TOKEN_PIPS[numbers]
+    a, b = arrays.tile_pairs.T
+    red = (numbers == 6) | (numbers == 8)
+    twins = (numbers[:, a] == numbers[:, b]) & (numbers[:, a] > 0)
+    padded = np.concatenate([pips, np.zeros((len(pips), 1), dtype=pips.dtype)], axis=1)
+    share = np.empty((len(kinds), len(RESOURCES)))
+    for code in range(len(RESOURCES)):
+        on_kind = kinds == code
+        share[:, code] = (pips * on_kind).sum(axis=1) / (on_kind.sum(axis=1) * arrays.mean_pips)
+    return {
+        "red_pairs": (red[:, a] & red[:, b]).sum(axis=1),
+        "twin_pairs": twins.sum(axis=1),
+        "node_pips": padded[:, arrays.node_tiles].sum(axis=2).max(axis=1),
+        "resource_share": share,
+    }
+
+
+def accepted(metrics: Dict[str, np.ndarray], rules: FairnessRules) -> np.ndarray:
+    """Boolean mask of the rows whose metrics meet rules."""
+    share = metrics["resource_share"]
+    return (
+        (metrics["red_pairs"] <= rules.max_red_pairs)
+        & (metrics["twin_pairs"] <= rules.max_twin_pairs)
+        & (metrics["node_pips"] <= rules.max_node_pips)
+        & (share.min(axis=1) >= rules.min_resource_share)
+        & (share.max(axis=1) <= rules.max_resource_share)
+    )
+
+
+def generate(
+    count: int,
+    rules: FairnessRules = FairnessRules(),
+    seed: Optional[int] = None,
+    radius: int = 2,
+    batch: int = 8192,
+    max_candidates: int = 10_000_000,
+) -> "LayoutLibrary":
+    """Deal candidates batch by batch until count of them pass rules."""
+    rng = np.random.default_rng(seed)
+    kept_kinds, kept_numbers = [], []
+    found = dealt = 0
+    while found < count:
+        if dealt >= max_candidates:
+            raise ValueError(f"Only {found} of {dealt} candidate layouts met {rules}.")
+        kinds, numbers = deal(rng, batch, radius)
+        dealt += batch
+        keep = accepted(score(kinds, numbers, radius), rules)
+        kept_kinds.append(kinds[keep])
+        kept_numbers.append(numbers[keep])
+        found += int(keep.sum())
+    return LayoutLibrary(
+        radius,
+        np.concatenate(kept_kinds)[:count],
+        np.concatenate(kept_numbers)[:count],
+        rules,
+    )
+
+
+class LayoutLibrary:
+    """A fixed, indexable set of accepted layouts for one board radius."""
+
+    def __init__(self, radius: int, kinds: np.ndarray, numbers: np.ndarray, rules: Optional[FairnessRules] = None):
+        self.radius = radius
+        self.kinds = kinds
+        self.numbers = numbers
+        self.rules = rules
+        self.topology: BoardTopology = board_topology(radius)
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def __getitem__(self, index: int) -> BoardLayout:
+        resources = tuple(TILE_KINDS[code] for code in self.kinds[index].tolist())
+        numbers = tuple(n or None for n in self.numbers[index].tolist())
+        return BoardLayout(self.topology, resources, numbers)
+
+    def __iter__(self) -> Iterator[BoardLayout]:
+        return (self[i] for i in range(len(self)))
+
+    def for_seed(self, seed: int) -> BoardLayout:
+        """The library layout a game seeded with seed plays on."""
+        return self[derive_seed(seed, "board") % len(self)]
+
+    def save(self, path: str) -> None:
+        rules = json.dumps(asdict(self.rules)) if self.rules is not None else ""
+        np.savez_compressed(path, radius=self.radius, kinds=self.kinds, numbers=self.numbers, rules=rules)
+
+    @classmethod
+    def load(cls, path: str) -> "LayoutLibrary":
+        with np.load(path) as data:
+            rules = str(data["rules"])
+            return cls(
+                int(data["radius"]),
+                data["kinds"],
+                data["numbers"],
+                FairnessRules(**json.loads(rules)) if rules else None,
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build a library of fair Catan board layouts.")
+    parser.add_argument("out", help="write the library to this .npz file")
+    parser.add_argument("--count", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--radius", type=int, default=2)
+    defaults = FairnessRules()
+    for name, value in asdict(defaults).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    args = parser.parse_args()
+
+    rules = FairnessRules(**{name: getattr(args, name) for name in asdict(defaults)})
+    start = time.perf_counter()
+    library = generate(args.count, rules, args.seed, args.radius)
+    library.save(args.out)
+    print(f"{len(library)} layouts in {time.perf_counter() - start:.2f}s -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""Optional call counters and a sampling profiler for CatanGame runs.
+
+`CatanGame(..., profiler=GameProfiler())` times the game's hot paths and every agent
+decision. The profiler shadows those methods on that one game instance and wraps its
+agents; a game built without one has no wrappers at all, so leaving profiling off
+costs nothing.
+
+Each stat is [calls, total seconds, slowest call]. Agent decisions are kept per seat
+and phase ("agent1.main"), and "agent1.turn" holds the decision time of each of that
+seat's whole turns. `merge()` adds profiles from many games (or worker processes, via
+`as_dict()`) into one report.
+
+`SamplingProfiler` is a separate statistical profiler (Unix only). It samples the
+Python stack on a CPU timer and writes the folded-stack format that flamegraph.pl and
+speedscope read.
+"""
+
+from __future__ import annotations
+
+import argparse
+import signal
+import sys
+import time
+from collections import Counter
+from contextlib import nullcontext
+from typing import IO, Callable, Dict, Iterable, List, Optional
+
+from catan import Agent, CatanGame, RandomAgent, derive_seed
+
+HOT_PATHS = (
+    "distribute_resources",
+    "can_build_road",
+    "can_build_settlement",
+    "can_build_city",
+    "build_road",
+    "build_settlement",
+    "build_city",
+    "move_robber",
+    "discard_half",
+)
+AGENT_HOOKS = (
+    "before_roll",
+    "choose_setup_settlement",
+    "choose_setup_road",
+    "choose_action",
+    "choose_discard",
+    "choose_robber_tile",
+    "choose_victim",
+)
+
+
+class GameProfiler:
+    """Counts and cumulative time per hot path and per agent seat and phase."""
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        self.clock = clock
+        self.stats: Dict[str, List[float]] = {}
+        self._decided = 0.0  # agent time so far, read at each turn boundary
+
+    def _add(self, name: str, elapsed: float) -> None:
+        stat = self.stats.get(name)
+        if stat is None:
+            self.stats[name] = [1, elapsed, elapsed]
+            return
+        stat[0] += 1
+        stat[1] += elapsed
+        if elapsed > stat[2]:
+            stat[2] = elapsed
+
+    def attach(self, game: CatanGame) -> None:
+        for name in HOT_PATHS:
+            setattr(game, name, self._timed(name, getattr(game, name)))
+        game.agents = [_TimedAgent(self, game, seat, agent) for seat, agent in enumerate(game.agents)]
+        take_turn = game.take_turn
+
+        def timed_turn() -> bool:
+            seat, before = game.current_player, self._decided
+            start = self.clock()
+            try:
+                return take_turn()
+            finally:
+                self._add("take_turn", self.clock() - start)
+                self._add(f"agent{seat}.turn", self._decided - before)
+
+        game.take_turn = timed_turn
+
+    def _timed(self, name: str, fn: Callable) -> Callable:
+        clock, add = self.clock, self._add
+
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                add(name, clock() - start)
+
+        return timed
+
+    def merge(self, other: "GameProfiler") -> "GameProfiler":
+        return self.merge_dict(other.stats)
+
+    def merge_dict(self, stats: Dict[str, List[float]]) -> "GameProfiler":
+        for name, (count, total, worst) in stats.items():
+            mine = self.stats.setdefault(name, [0, 0.0, 0.0])
+            mine[0] += count
+            mine[1] += total
+            mine[2] = max(mine[2], worst)
+        return self
+
+    def as_dict(self) -> Dict[str, List[float]]:
+        return {name: list(stat) for name, stat in self.stats.items()}
+
+    def report(self, limit: Optional[int] = None) -> str:
+        """A table of every stat, slowest total first."""
+        rows = sorted(self.stats.items(), key=lambda item: -item[1][1])[:limit]
+        lines = [f"{'':28} {'calls':>9} {'total ms':>10} {'mean us':>9} {'max us':>9}"]
+        for name, (count, total, worst) in rows:
+            lines.append(f"{name:28} {count:9d} {total * 1e3:10.2f} {total / count * 1e6:9.2f} {worst * 1e6:9.1f}")
+        return "\n".join(lines)
+
+
+class _TimedAgent(Agent):
+    """Times each decision of the wrapped agent under "agent<seat>.<phase>"."""
+
+    def __init__(self, profiler: GameProfiler, game: CatanGame, seat: int, inner: Agent):
+        self.inner = inner
+        clock, add = profiler.clock, profiler._add
+
+        def timed(hook: Callable) -> Callable:
+            def decide(*args):
+                start = clock()
+                try:
+                    return hook(*args)
+                finally:
+                    elapsed = clock() - start
+                    profiler._decided += elapsed
+                    add(f"agent{seat}.{game.phase}", elapsed)
+
+            return decide
+
+        for name in AGENT_HOOKS:
+            setattr(self, name, timed(getattr(inner, name)))
+
+
+class SamplingProfiler:
+    """Statistical profiler: counts the Python stack every `interval` seconds of CPU time.
+
+    Use as a context manager around the code to profile; it needs SIGPROF, so it only
+    works on Unix and in the main thread.
+    """
+
+    def __init__(self, interval: float = 0.001):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._previous = None
+
+    def __enter__(self) -> "SamplingProfiler":
+        self._previous = signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self._previous)
+
+    def _sample(self, signum, frame) -> None:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}")
+            frame = frame.f_back
+        self.samples[";".join(reversed(stack))] += 1
+
+    def write_collapsed(self, fh: IO[str]) -> None:
+        """One "frame;frame;frame count" line per distinct stack."""
+        for stack, count in self.samples.most_common():
+            fh.write(f"{stack} {count}\n")
+
+
+def profile_games(
+    games: int, seed: int = 0, num_players: int = 4, max_rounds: int = 500
+) -> Iterable[GameProfiler]:
+    """Play seeded headless games with RandomAgents, yielding each one's profile."""
+    for index in range(games):
+        game_seed = derive_seed(seed, index)
+        agents = [RandomAgent(derive_seed(game_seed, "agent", seat)) for seat in range(num_players)]
+        names = [f"P{seat}" for seat in range(num_players)]
+        profiler = GameProfiler()
+        game = CatanGame(names, seed=derive_seed(game_seed, "game"), agents=agents, verbose=False, profiler=profiler)
+        game.play(max_rounds=max_rounds)
+        yield profiler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Profile headless Catan games.")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--max-rounds", type=int, default=500)
+    parser.add_argument("--folded", default=None, help="also sample the run and write folded stacks here")
+    args = parser.parse_args()
+
+    total = GameProfiler()
+    with SamplingProfiler() if args.folded else nullcontext() as sampler:
+        for profiler in profile_games(args.games, args.seed, args.players, args.max_rounds):
+            total.merge(profiler)
+    print(total.report())
+    if sampler is not None:
+        with open(args.folded, "w") as fh:
+            sampler.write_collapsed(fh)
+        print(f"{sum(sampler.samples.values())} samples -> {args.folded}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
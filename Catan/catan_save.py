@@ -0,0 +1,578 @@
+#!/usr/bin/env python3
+"""Compact binary saves, action logs and record archives for CatanGame.
+
+Two little-endian, versioned record types are defined here:
+
+* a state save ("CATS") holds one position: the board layout, per-player
+  settlement/city/road bitsets, hands, robber, side to move, round, phase,
+  Longest Road holder (from version 2) and the game RNG state, so a loaded
+  game continues exactly as the original would. From version 3 the RNG is
+  stored as a `GameRandom` position (seed, rolls, steals); earlier records
+  hold one Mersenne Twister state and load as a `SharedRandom`;
+* an action log ("CATL") holds a game's seed and every decision its agents
+  returned, three bytes each, so the whole game can be replayed from the seed.
+  Logs before version 3 replay with the single-stream `SharedRandom` they
+  were recorded with.
+
+Archives are plain files of length-prefixed records; `ArchiveReader` maps them
+with mmap and hands out zero-copy views, so multi-gigabyte archives can be
+scanned without reading them into memory.
+"""
+
+from __future__ import annotations
+
+import argparse
+import mmap
+import struct
+from dataclasses import dataclass
+from typing import BinaryIO, Iterator, List, Optional, Sequence, Tuple, Union
+
+from catan import (
+    PHASE_MAIN,
+    PHASE_SETUP_ROAD,
+    PHASE_SETUP_SETTLEMENT,
+    RESOURCES,
+    TILE_KINDS,
+    Action,
+    Agent,
+    BoardLayout,
+    CatanGame,
+    GameRandom,
+    RandomSource,
+    SharedRandom,
+    board_topology,
+    iter_bits,
+    seed64,
+)
+
+Buffer = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+STATE_MAGIC = b"CATS"
+LOG_MAGIC = b"CATL"
+FORMAT_VERSION = 3
+NO_HOLDER = 0xFF
+RNG_SHARED = 0
+RNG_SPLIT = 1
+
+PHASES = (PHASE_SETUP_SETTLEMENT, PHASE_SETUP_ROAD, PHASE_MAIN)
+
+# magic, version, radius, players, phase, robber, current, round, setup node (-1 = none)
+_STATE_HEAD = struct.Struct("<4sBBBBHBIi")
+_HAND = struct.Struct("<5H")
+_MT_STATE = struct.Struct("<625I")
+_GAUSS = struct.Struct("<Bd")
+# seed, rolls, steals
+_SPLIT_STATE = struct.Struct("<QII")
+# magic, version, players, seed
+_LOG_HEAD = struct.Struct("<4sBBQ")
+_DECISION = struct.Struct("<BH")
+_LENGTH = struct.Struct("<I")
+
+
+class SaveFormatError(ValueError):
+    """Raised for data that is not a save of a version this module can read."""
+
+
+def _pack_names(names: Sequence[str]) -> bytes:
+    out = bytearray()
+    for name in names:
+        raw = name.encode()
+        out.append(len(raw))
+        out += raw
+    return bytes(out)
+
+
+def _unpack_names(buf: Buffer, pos: int, count: int) -> Tuple[List[str], int]:
+    names: List[str] = []
+    for _ in range(count):
+        size = buf[pos]
+        names.append(bytes(buf[pos + 1 : pos + 1 + size]).decode())
+        pos += 1 + size
+    return names, pos
+
+
+def _check_head(magic: bytes, version: int, expected: bytes) -> None:
+    if magic != expected:
+        raise SaveFormatError(f"Expected a {expected.decode()} record, got {magic!r}.")
+    if not 1 <= version <= FORMAT_VERSION:
+        raise SaveFormatError(f"Unsupported {expected.decode()} version {version}.")
+
+
+# --- State saves ----------------------------------------------------------------------------
+
+
+@dataclass
+class SavedGame:
+    """A decoded state save; `to_game()` turns it back into a playable CatanGame."""
+
+    names: List[str]
+    radius: int
+    resources: Tuple[str, ...]
+    numbers: Tuple[Optional[int], ...]
+    settlements: List[int]
+    cities: List[int]
+    roads: List[int]
+    hands: List[Tuple[int, ...]]
+    robber: int
+    current: int
+    round_num: int
+    phase: str
+    setup_node: Optional[int]
+    rng_state: tuple
+    version: int = FORMAT_VERSION
+    longest_road: Optional[int] = None
+    rng_kind: int = RNG_SHARED
+
+    def to_game(self, agents: Optional[List[Agent]] = None, verbose: bool = False) -> CatanGame:
+        topology = board_topology(self.radius)
+        layout = BoardLayout(topology, self.resources, self.numbers)
+        rng: RandomSource = GameRandom(0) if self.rng_kind == RNG_SPLIT else SharedRandom()
+        rng.setstate(self.rng_state)
+        game = CatanGame(self.names, agents=agents, verbose=verbose, layout=layout, rng=rng)
+        # The robber goes down before any building so the production index skips its tile.
+        game.robber_tile = self.robber
+        for pidx in range(len(self.names)):
+            for nidx in iter_bits(self.settlements[pidx] | self.cities[pidx]):
+                game._place_settlement(pidx, nidx)
+            for nidx in iter_bits(self.cities[pidx]):
+                game._place_city(pidx, nidx)
+            for eidx in iter_bits(self.roads[pidx]):
+                game._place_road(pidx, eidx)
+            game.players[pidx].hand.update(zip(RESOURCES, self.hands[pidx]))
+        game.current_player = self.current
+        game.round_num = self.round_num
+        game.phase = self.phase
+        game.setup_node = self.setup_node
+        if self.version >= 2:
+            # Who holds a tied Longest Road depends on build order, which the bitsets do not keep.
+            game.road_net.holder = self.longest_road
+            game._sync_longest_road()
+        return game
+
+
+def encode_state(game: CatanGame) -> bytes:
+    """Serialize the position of `game`, including its RNG, to a CATS record."""
+    topo, bits, layout = game.topology, game.bits, game.layout
+    node_bytes = (len(topo.node_points) + 7) // 8
+    edge_bytes = (len(topo.edge_ends) + 7) // 8
+    setup_node = -1 if game.setup_node is None else game.setup_node
+    parts = [
+        _STATE_HEAD.pack(
+            STATE_MAGIC,
+            FORMAT_VERSION,
+            topo.radius,
+            len(game.players),
+            PHASES.index(game.phase),
+            game.robber_tile,
+            game.current_player,
+            game.round_num,
+            setup_node,
+        ),
+        bytes(TILE_KINDS.index(res) for res in layout.resources),
+        bytes(num or 0 for num in layout.numbers),
+    ]
+    for pidx, player in enumerate(game.players):
+        parts.append(bits.settlements[pidx].to_bytes(node_bytes, "little"))
+        parts.append(bits.cities[pidx].to_bytes(node_bytes, "little"))
+        parts.append(bits.roads[pidx].to_bytes(edge_bytes, "little"))
+        parts.append(_HAND.pack(*[player.hand[res] for res in RESOURCES]))
+    parts.append(_pack_names([p.name for p in game.players]))
+    if isinstance(game.rng, GameRandom):
+        parts.append(bytes((RNG_SPLIT,)))
+        parts.append(_SPLIT_STATE.pack(*game.rng.getstate()))
+    elif isinstance(game.rng, SharedRandom):
+        rng_version, mt, gauss = game.rng.getstate()
+        parts.append(bytes((RNG_SHARED, rng_version)))
+        parts.append(_MT_STATE.pack(*mt))
+        parts.append(_GAUSS.pack(gauss is not None, gauss or 0.0))
+    else:
+        raise TypeError(f"Cannot save the state of a {type(game.rng).__name__}.")
+    holder = game.road_net.holder
+    parts.append(bytes((NO_HOLDER if holder is None else holder,)))
+    return b"".join(parts)
+
+
+def decode_state(buf: Buffer) -> SavedGame:
+    """Parse a CATS record produced by `encode_state`."""
+    magic, version, radius, num_players, phase, robber, current, round_num, setup_node = _STATE_HEAD.unpack_from(
+        buf, 0
+    )
+    _check_head(magic, version, STATE_MAGIC)
+    topo = board_topology(radius)
+    num_tiles = len(topo.coords)
+    node_bytes = (len(topo.node_points) + 7) // 8
+    edge_bytes = (len(topo.edge_ends) + 7) // 8
+    pos = _STATE_HEAD.size
+    resources = tuple(TILE_KINDS[code] for code in buf[pos : pos + num_tiles])
+    pos += num_tiles
+    numbers = tuple(num or None for num in buf[pos : pos + num_tiles])
+    pos += num_tiles
+
+    settlements: List[int] = []
+    cities: List[int] = []
+    roads: List[int] = []
+    hands: List[Tuple[int, ...]] = []
+    from_bytes = int.from_bytes
+    for _ in range(num_players):
+        settlements.append(from_bytes(buf[pos : pos + node_bytes], "little"))
+        pos += node_bytes
+        cities.append(from_bytes(buf[pos : pos + node_bytes], "little"))
+        pos += node_bytes
+        roads.append(from_bytes(buf[pos : pos + edge_bytes], "little"))
+        pos += edge_bytes
+        hands.append(_HAND.unpack_from(buf, pos))
+        pos += _HAND.size
+    names, pos = _unpack_names(buf, pos, num_players)
+
+    rng_kind = RNG_SHARED
+    if version >= 3:
+        rng_kind = buf[pos]
+        pos += 1
+    if rng_kind == RNG_SPLIT:
+        rng_state: tuple = _SPLIT_STATE.unpack_from(buf, pos)
+        pos += _SPLIT_STATE.size
+    elif rng_kind == RNG_SHARED:
+        rng_version = buf[pos]
+        mt = _MT_STATE.unpack_from(buf, pos + 1)
+        pos += 1 + _MT_STATE.size
+        has_gauss, gauss = _GAUSS.unpack_from(buf, pos)
+        pos += _GAUSS.size
+        rng_state = (rng_version, mt, gauss if has_gauss else None)
+    else:
+        raise SaveFormatError(f"Unknown RNG kind {rng_kind}.")
+    holder = buf[pos] if version >= 2 else NO_HOLDER
+    return SavedGame(
+        names=names,
+        radius=radius,
+        resources=resources,
+        numbers=numbers,
+        settlements=settlements,
+        cities=cities,
+        roads=roads,
+        hands=hands,
+        robber=robber,
+        current=current,
+        round_num=round_num,
+        phase=PHASES[phase],
+        setup_node=None if setup_node < 0 else setup_node,
+        rng_state=rng_state,
+        version=version,
+        longest_road=None if holder == NO_HOLDER else holder,
+        rng_kind=rng_kind,
+    )
+
+
+def load_game(buf: Buffer, agents: Optional[List[Agent]] = None, verbose: bool = False) -> CatanGame:
+    return decode_state(buf).to_game(agents=agents, verbose=verbose)
+
+
+# --- Action logs ----------------------------------------------------------------------------
+
+# One opcode per kind of decision an Agent can return. Out-of-range ids are clamped to
+# NO_ID and unknown resource names to NO_RESOURCE: the game rejects them either way, and
+# a replayed rejection triggers the same re-prompt as the original one did.
+(
+    OP_SETUP_SETTLEMENT,
+    OP_SETUP_ROAD,
+    OP_ROAD,
+    OP_SETTLEMENT,
+    OP_CITY,
+    OP_TRADE,
+    OP_ROBBER,
+    OP_END,
+    OP_DISCARD,
+    OP_ROBBER_TILE,
+    OP_VICTIM,
+    OP_UNKNOWN,
+) = range(12)
+ACTION_OPS = {"road": OP_ROAD, "settlement": OP_SETTLEMENT, "city": OP_CITY, "robber": OP_ROBBER}
+ACTION_KINDS = {op: kind for kind, op in ACTION_OPS.items()}
+NO_ID = 0xFFFF
+NO_RESOURCE = 0xF
+
+
+def _id(value: int) -> int:
+    return value if 0 <= value < NO_ID else NO_ID
+
+
+def _res_code(res: str) -> int:
+    return RESOURCES.index(res) if res in RESOURCES else NO_RESOURCE
+
+
+def _res_name(code: int) -> str:
+    return RESOURCES[code] if code < len(RESOURCES) else ""
+
+
+def encode_action(action: Action) -> Tuple[int, int]:
+    kind = action[0]
+    if kind in ACTION_OPS:
+        return ACTION_OPS[kind], _id(action[1])
+    if kind == "trade":
+        return OP_TRADE, _res_code(action[1]) << 4 | _res_code(action[2])
+    if kind == "end":
+        return OP_END, 0
+    return OP_UNKNOWN, 0
+
+
+def decode_action(op: int, arg: int) -> Action:
+    if op in ACTION_KINDS:
+        return (ACTION_KINDS[op], arg)
+    if op == OP_TRADE:
+        return ("trade", _res_name(arg >> 4), _res_name(arg & NO_RESOURCE))
+    if op == OP_END:
+        return ("end",)
+    return ("unknown",)
+
+
+class ActionLog:
+    """The seed, seat names and every agent decision of one game.
+
+    The seed is kept as seed64(seed), the value GameRandom plays from, so it always fits the header.
+    """
+
+    def __init__(self, seed: object, names: Sequence[str], data: Buffer = b"", version: int = FORMAT_VERSION):
+        self.seed = seed64(seed)
+        self.names = list(names)
+        self.data = bytearray(data)
+        self.version = version
+
+    def __len__(self) -> int:
+        return len(self.data) // _DECISION.size
+
+    def append(self, op: int, arg: int) -> None:
+        self.data += _DECISION.pack(op, arg)
+
+    def decisions(self) -> Iterator[Tuple[int, int]]:
+        return _DECISION.iter_unpack(self.data)
+
+    def to_bytes(self) -> bytes:
+        head = _LOG_HEAD.pack(LOG_MAGIC, self.version, len(self.names), self.seed)
+        return head + _pack_names(self.names) + bytes(self.data)
+
+    @classmethod
+    def from_bytes(cls, buf: Buffer) -> "ActionLog":
+        magic, version, num_players, seed = _LOG_HEAD.unpack_from(buf, 0)
+        _check_head(magic, version, LOG_MAGIC)
+        names, pos = _unpack_names(buf, _LOG_HEAD.size, num_players)
+        return cls(seed, names, buf[pos:], version)
+
+
+class RecordingAgent(Agent):
+    """Wraps another agent and appends each decision it makes to a shared ActionLog."""
+
+    def __init__(self, inner: Agent, log: ActionLog):
+        self.inner = inner
+        self.log = log
+
+    def before_roll(self, game: CatanGame, player_idx: int) -> None:
+        self.inner.before_roll(game, player_idx)
+
+    def choose_setup_settlement(self, game: CatanGame, player_idx: int) -> int:
+        nidx = self.inner.choose_setup_settlement(game, player_idx)
+        self.log.append(OP_SETUP_SETTLEMENT, _id(nidx))
+        return nidx
+
+    def choose_setup_road(self, game: CatanGame, player_idx: int, node_idx: int) -> int:
+        eidx = self.inner.choose_setup_road(game, player_idx, node_idx)
+        self.log.append(OP_SETUP_ROAD, _id(eidx))
+        return eidx
+
+    def choose_action(self, game: CatanGame, player_idx: int) -> Action:
+        action = self.inner.choose_action(game, player_idx)
+        self.log.append(*encode_action(action))
+        return action
+
+    def choose_discard(self, game: CatanGame, player_idx: int, remaining: int) -> str:
+        res = self.inner.choose_discard(game, player_idx, remaining)
+        self.log.append(OP_DISCARD, _res_code(res))
+        return res
+
+    def choose_robber_tile(self, game: CatanGame, player_idx: int) -> int:
+        tidx = self.inner.choose_robber_tile(game, player_idx)
+        self.log.append(OP_ROBBER_TILE, _id(tidx))
+        return tidx
+
+    def choose_victim(self, game: CatanGame, player_idx: int, victims: List[int]) -> int:
+        vidx = self.inner.choose_victim(game, player_idx, victims)
+        self.log.append(OP_VICTIM, _id(vidx))
+        return vidx
+
+
+def recorded_game(
+    names: Sequence[str], seed: int, agents: List[Agent], verbose: bool = False
+) -> Tuple[CatanGame, ActionLog]:
+    """A CatanGame whose agents' decisions are captured in the returned ActionLog."""
+    log = ActionLog(seed, names)
+    game = CatanGame(list(names), seed=seed, agents=[RecordingAgent(a, log) for a in agents], verbose=verbose)
+    return game, log
+
+
+class ReplayExhausted(Exception):
+    """The action log ran out before the game ended (it was stopped by max_rounds)."""
+
+
+class _ReplayAgent(Agent):
+    """Feeds a decoded decision stream back to the game; every seat shares one stream."""
+
+    def __init__(self, decisions: Iterator[Tuple[int, int]]):
+        self.decisions = decisions
+        self.pending: Optional[Tuple[int, int]] = next(decisions, None)
+
+    def _next(self, expected: int) -> int:
+        if self.pending is None:
+            raise ReplayExhausted()
+        op, arg = self.pending
+        if op != expected:
+            raise SaveFormatError(f"Action log out of sync: expected op {expected}, found {op}.")
+        self.pending = next(self.decisions, None)
+        return arg
+
+    def before_roll(self, game: CatanGame, player_idx: int) -> None:
+        if self.pending is None:
+            raise ReplayExhausted()
+
+    def choose_setup_settlement(self, game: CatanGame, player_idx: int) -> int:
+        return self._next(OP_SETUP_SETTLEMENT)
+
+    def choose_setup_road(self, game: CatanGame, player_idx: int, node_idx: int) -> int:
+        return self._next(OP_SETUP_ROAD)
+
+    def choose_action(self, game: CatanGame, player_idx: int) -> Action:
+        if self.pending is None:
+            raise ReplayExhausted()
+        op, arg = self.pending
+        if op in _NON_ACTION_OPS:
+            raise SaveFormatError(f"Action log out of sync: expected a turn action, found op {op}.")
+        self.pending = next(self.decisions, None)
+        return decode_action(op, arg)
+
+    def choose_discard(self, game: CatanGame, player_idx: int, remaining: int) -> str:
+        return _res_name(self._next(OP_DISCARD))
+
+    def choose_robber_tile(self, game: CatanGame, player_idx: int) -> int:
+        return self._next(OP_ROBBER_TILE)
+
+    def choose_victim(self, game: CatanGame, player_idx: int, victims: List[int]) -> int:
+        return self._next(OP_VICTIM)
+
+
+_NON_ACTION_OPS = frozenset((OP_SETUP_SETTLEMENT, OP_SETUP_ROAD, OP_DISCARD, OP_ROBBER_TILE, OP_VICTIM))
+
+
+def replay(log: Union[ActionLog, Buffer], verbose: bool = False) -> CatanGame:
+    """Rebuild a recorded game from its seed and decisions; returns the game at its final position."""
+    if not isinstance(log, ActionLog):
+        log = ActionLog.from_bytes(log)
+    agent = _ReplayAgent(log.decisions())
+    rng = SharedRandom(log.seed) if log.version < 3 else GameRandom(log.seed)
+    game = CatanGame(log.names, agents=[agent] * len(log.names), verbose=verbose, rng=rng)
+    try:
+        game.play()
+    except ReplayExhausted:
+        pass
+    return game
+
+
+# --- Archives -------------------------------------------------------------------------------
+
+
+class ArchiveWriter:
+    """Appends length-prefixed records (state saves or action logs) to a binary file."""
+
+    def __init__(self, fh: BinaryIO):
+        self.fh = fh
+
+    def write(self, record: bytes) -> None:
+        self.fh.write(_LENGTH.pack(len(record)))
+        self.fh.write(record)
+
+
+class ArchiveReader:
+    """Memory-maps an archive and yields each record as a zero-copy memoryview.
+
+    Use as a context manager; views handed out must be released before close().
+    """
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        try:
+            self._map: Optional[mmap.mmap] = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            self._map = None
+        self._offsets: Optional[List[int]] = None
+
+    def __enter__(self) -> "ArchiveReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+    def __iter__(self) -> Iterator[memoryview]:
+        if self._map is None:
+            return
+        view = memoryview(self._map)
+        pos, end = 0, len(self._map)
+        while pos < end:
+            (size,) = _LENGTH.unpack_from(self._map, pos)
+            pos += _LENGTH.size
+            yield view[pos : pos + size]
+            pos += size
+
+    def offsets(self) -> List[int]:
+        """Start offset of every record; computed once by hopping over the length prefixes."""
+        if self._offsets is None:
+            self._offsets = []
+            pos, end = 0, len(self._map) if self._map is not None else 0
+            while pos < end:
+                (size,) = _LENGTH.unpack_from(self._map, pos)
+                self._offsets.append(pos + _LENGTH.size)
+                pos += _LENGTH.size + size
+        return self._offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets())
+
+    def __getitem__(self, idx: int) -> memoryview:
+        start = self.offsets()[idx]
+        (size,) = _LENGTH.unpack_from(self._map, start - _LENGTH.size)
+        return memoryview(self._map)[start : start + size]
+
+
+def main() -> None:
+    from catan import RandomAgent, derive_seed
+
+    parser = argparse.ArgumentParser(description="Record headless games to an archive, or summarize one.")
+    parser.add_argument("archive")
+    parser.add_argument("--record", type=int, metavar="GAMES", help="append this many recorded random games")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--players", type=int, default=4)
+    args = parser.parse_args()
+
+    names = [f"P{i + 1}" for i in range(args.players)]
+    if args.record:
+        with open(args.archive, "ab") as fh:
+            writer = ArchiveWriter(fh)
+            for i in range(args.record):
+                seed = derive_seed(args.seed, i)
+                agents = [RandomAgent(derive_seed(seed, "agent", s)) for s in range(args.players)]
+                game, log = recorded_game(names, seed, agents)
+                game.play(max_rounds=500)
+                writer.write(log.to_bytes())
+
+    with ArchiveReader(args.archive) as reader:
+        logs = decisions = 0
+        for record in reader:
+            if bytes(record[:4]) == LOG_MAGIC:
+                logs += 1
+                decisions += len(ActionLog.from_bytes(record))
+            del record
+        print(f"{len(reader)} records, {logs} action logs, {decisions} decisions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Drive a CatanGame from a stream of text commands, with no prompts and no stdin.
+
+Scripts use the command language of `catan.CommandFlow`, which catan_server speaks
+too: one command per line, each for the seat the game is waiting on. Scripts may also
+`roll <total>` to set the dice.
+
+Blank lines and lines starting with # are skipped. Every other line gets a
+`CommandResult`. A rejected command leaves the game waiting on the same decision, so
+the rest of the script still runs. `ScriptDriver.feed` takes one command at a time
+and `ScriptDriver.run` takes any iterable of lines: a file, a list or a generator.
+
+    python3 catan_script.py sessions/*.txt --players A B C --seed 1 --strict
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from typing import Iterable, Iterator, List, NamedTuple, Optional
+
+from catan import CatanGame, CommandFlow, Prompt
+
+
+class CommandResult(NamedTuple):
+    line: int  # 1-based line number in the script
+    seat: int  # the seat the command was read for, -1 once the game is over
+    prompt: str  # the decision the game was waiting on
+    command: str
+    error: Optional[str]  # None when the command was accepted
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class ScriptDriver:
+    """Runs game one script line at a time through a `CommandFlow` with fixed dice allowed."""
+
+    def __init__(self, game: CatanGame):
+        self.game = game
+        self.flow = CommandFlow(game, fixed_dice=True)
+        self.line = 0
+
+    @property
+    def prompt(self) -> Optional[Prompt]:
+        return self.flow.prompt
+
+    @property
+    def winner(self) -> Optional[int]:
+        return self.flow.winner
+
+    @property
+    def finished(self) -> bool:
+        return self.flow.prompt is None
+
+    def feed(self, text: str) -> Optional[CommandResult]:
+        """Apply one script line; returns None for blank and comment lines."""
+        self.line += 1
+        command = text.strip()
+        if not command or command.startswith("#"):
+            return None
+        if self.flow.prompt is None:
+            return CommandResult(self.line, -1, "", command, "The game is over.")
+        seat, kind = self.flow.prompt
+        self.flow.answer(command)
+        return CommandResult(self.line, seat, kind, command, self.flow.error)
+
+    def run(self, lines: Iterable[str]) -> Iterator[CommandResult]:
+        for text in lines:
+            result = self.feed(text)
+            if result is not None:
+                yield result
+
+
+def run_script(game: CatanGame, lines: Iterable[str]) -> List[CommandResult]:
+    """Drive game through every command in lines and return all their results."""
+    return list(ScriptDriver(game).run(lines))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay Catan command scripts without prompts.")
+    parser.add_argument("scripts", nargs="+", help="script files, one command per line")
+    parser.add_argument("--players", nargs="+", default=["P0", "P1", "P2", "P3"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--radius", type=int, default=2)
+    parser.add_argument("--strict", action="store_true", help="exit with status 1 if any command is rejected")
+    args = parser.parse_args()
+
+    rejected = 0
+    for path in args.scripts:
+        game = CatanGame(args.players, seed=args.seed, verbose=False, radius=args.radius)
+        driver = ScriptDriver(game)
+        start = time.perf_counter()
+        with open(path) as fh:
+            results = list(driver.run(fh))
+        elapsed = time.perf_counter() - start
+        errors = [r for r in results if not r.ok]
+        rejected += len(errors)
+        for r in errors:
+            print(f"{path}:{r.line}: [{r.prompt} seat {r.seat}] {r.command}: {r.error}")
+        state = "not finished" if driver.winner is None else f"won by seat {driver.winner}"
+        print(f"{path}: {len(results)} commands, {len(errors)} rejected, {state} ({elapsed * 1e3:.1f} ms)")
+    if args.strict and rejected:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
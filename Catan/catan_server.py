@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""Host many concurrent CatanGame rooms in one asyncio process over line-based TCP.
+
+Clients send one command per line. The server answers with one JSON array per line,
+[type, *fields], the same shape as EventLog records; every game event is sent to each
+seat in the room as it happens. Only the thief and the victim learn which card a steal
+took; the other seats get ["Stolen", thief, victim, null].
+
+    join <room> <name>            take the next seat, creating the room  -> ["Joined", room, seat, token]
+    rejoin <room> <seat> <token>  reclaim a seat after a dropped connection
+    start                         seat 0 starts the game once 3-6 players have joined
+    hand                          -> ["Hand", seat, {resource: count}]
+    quit
+
+During the game the room sends ["Prompt", seat, kind, *details] to the seat it waits on,
+and a bare ["Prompt", seat, kind] to everyone else, since the details show that seat's hand:
+
+    setup_settlement  legal nodes     build settlement <node>
+    setup_road        legal edges     build road <edge>
+    roll                              roll
+    action            legal commands  build road|settlement|city <id>, trade <give> <get>, robber <tile>, end
+    discard           count, hand     discard <resource> ... (count of them)
+    robber            current tile    robber <tile>
+    victim            candidates      victim <seat>
+
+Each room is one task reading a bounded queue, so a room costs no thread and an idle one
+costs only memory. A full queue stops the server reading from the sender's socket, and a
+client that does not keep up with its own output is disconnected; either way the seat
+stays reserved and `rejoin` picks the game up where it is. Rooms with no input for
+`idle_timeout` seconds are evicted.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import secrets
+from typing import Dict, List, Optional, Tuple
+
+from catan import CatanGame, CommandFlow, Stolen, derive_seed, format_command
+
+MIN_PLAYERS = 3
+MAX_PLAYERS = 6
+
+
+def visible_prompt(prompt: list, seat: int) -> list:
+    """prompt as seat may see it: the details only go to the seat being asked."""
+    return prompt if prompt[1] == seat else prompt[:3]
+
+
+def encode(message: list) -> bytes:
+    return json.dumps(message, separators=(",", ":")).encode() + b"\n"
+
+
+class Connection:
+    """One client socket and its bounded outgoing queue."""
+
+    def __init__(self, writer: asyncio.StreamWriter, outbox_size: int):
+        self.writer = writer
+        self.outbox: "asyncio.Queue[bytes]" = asyncio.Queue(outbox_size)
+        self.room: Optional[Room] = None
+        self.seat: Optional[int] = None
+        self.closed = False
+        self.sender = asyncio.get_running_loop().create_task(self._send_loop())
+
+    def send(self, message: list) -> None:
+        if self.closed:
+            return
+        try:
+            self.outbox.put_nowait(encode(message))
+        except asyncio.QueueFull:
+            self.close()
+
+    async def _send_loop(self) -> None:
+        try:
+            while True:
+                self.writer.write(await self.outbox.get())
+                await self.writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        if self.sender is not asyncio.current_task():
+            self.sender.cancel()
+        self.writer.close()
+        if self.room is not None:
+            self.room.detach(self)
+
+
+class Seat:
+    def __init__(self, name: str, conn: Connection):
+        self.name = name
+        self.token = secrets.token_hex(8)
+        self.conn: Optional[Connection] = conn
+
+
+class Room:
+    """Seats, a game and the task that runs it, fed by one bounded input queue."""
+
+    def __init__(self, server: "CatanServer", name: str):
+        self.server = server
+        self.name = name
+        self.seats: List[Seat] = []
+        self.inbox: "asyncio.Queue[Tuple[int, str]]" = asyncio.Queue(server.queue_size)
+        self.game: Optional[CatanGame] = None
+        self.flow: Optional[CommandFlow] = None
+        self.prompt: Optional[list] = None
+        self.finished = False
+        self.last_active = asyncio.get_running_loop().time()
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    # -- seats ---------------------------------------------------------------------
+
+    def add_seat(self, name: str, conn: Connection) -> int:
+        self.seats.append(Seat(name, conn))
+        seat = len(self.seats) - 1
+        self.attach(seat, conn)
+        self.broadcast(["Seated", seat, name])
+        return seat
+
+    def attach(self, seat: int, conn: Connection) -> None:
+        old = self.seats[seat].conn
+        self.seats[seat].conn = conn
+        conn.room, conn.seat = self, seat
+        if old is not None and old is not conn:
+            old.room = None
+            old.close()
+        self.touch()
+        conn.send(["Joined", self.name, seat, self.seats[seat].token])
+        if self.prompt is not None:
+            conn.send(visible_prompt(self.prompt, seat))
+
+    def detach(self, conn: Connection) -> None:
+        seat = conn.seat
+        if seat is not None and self.seats[seat].conn is conn:
+            self.seats[seat].conn = None
+        conn.room = conn.seat = None
+
+    def send(self, seat: int, message: list) -> None:
+        conn = self.seats[seat].conn
+        if conn is not None:
+            conn.send(message)
+
+    def broadcast(self, message: list) -> None:
+        for seat in range(len(self.seats)):
+            self.send(seat, message)
+
+    def touch(self) -> None:
+        self.last_active = asyncio.get_running_loop().time()
+
+    def close(self, reason: str) -> None:
+        self.task.cancel()
+        while not self.inbox.empty():
+            self.inbox.get_nowait()  # frees any reader still blocked on a full queue
+        for seat in self.seats:
+            if seat.conn is not None:
+                seat.conn.send(["Closed", self.name, reason])
+                seat.conn.room = seat.conn.seat = None
+                seat.conn = None
+
+    # -- input ---------------------------------------------------------------------
+
+    async def _next(self) -> Tuple[int, str]:
+        """The next command meant for the game; `hand` is answered here for any seat."""
+        while True:
+            seat, line = await self.inbox.get()
+            self.touch()
+            if line == "hand" and self.game is not None:
+                self.send(seat, ["Hand", seat, self.game.players[seat].hand])
+                continue
+            return seat, line
+
+    # -- game ----------------------------------------------------------------------
+
+    async def run(self) -> None:
+        while True:
+            seat, line = await self._next()
+            if line != "start":
+                self.send(seat, ["Error", "The game has not started."])
+            elif seat != 0:
+                self.send(seat, ["Error", "Only seat 0 can start the game."])
+            elif not MIN_PLAYERS <= len(self.seats) <= MAX_PLAYERS:
+                self.send(seat, ["Error", f"Need {MIN_PLAYERS}-{MAX_PLAYERS} players."])
+            else:
+                break
+        try:
+            await self._play()
+        except Exception as exc:
+            self.broadcast(["Error", f"Room stopped: {exc!r}"])
+        self.finished = True
+        self.prompt = None
+        while True:
+            seat, _ = await self._next()
+            self.send(seat, ["Error", "The game is over."])
+
+    def _start_game(self) -> CatanGame:
+        seed = None if self.server.seed is None else derive_seed(self.server.seed, "room", self.name)
+        game = CatanGame([s.name for s in self.seats], seed=seed, verbose=False)
+        game.events.subscribe(self.publish)
+        self.game = game
+        return game
+
+    def publish(self, event: tuple) -> None:
+        """Send a game event to every seat, keeping a stolen card private to the two players involved."""
+        message = [type(event).__name__, *event]
+        if not isinstance(event, Stolen):
+            self.broadcast(message)
+            return
+        redacted = message[:-1] + [None]
+        for seat in range(len(self.seats)):
+            self.send(seat, message if seat in (event.thief, event.victim) else redacted)
+
+    async def _play(self) -> None:
+        flow = self.flow = CommandFlow(self._start_game())
+        while flow.prompt is not None:
+            seat, kind = flow.prompt
+            self.prompt = ["Prompt", seat, kind, *self._details(seat, kind)]
+            for other in range(len(self.seats)):
+                self.send(other, visible_prompt(self.prompt, other))
+            while True:
+                sender, line = await self._next()
+                if sender == seat:
+                    break
+                self.send(sender, ["Error", "Not your turn."])
+            flow.answer(line)
+            if flow.error is not None:
+                self.send(seat, ["Error", flow.error])
+
+    def _details(self, seat: int, kind: str) -> list:
+        """What a client needs to answer a prompt of kind: its options, or the state they depend on."""
+        game = self.game
+        if kind in ("setup_settlement", "setup_road"):
+            return [[action[1] for action in game.legal_actions(seat)]]
+        if kind == "action":
+            return [[format_command(action) for action in game.legal_actions(seat)]]
+        if kind == "discard":
+            player = game.players[seat]
+            return [player.resource_count // 2, player.hand]
+        if kind == "robber":
+            return [game.robber_tile]
+        if kind == "victim":
+            return [self.flow.victims]
+        return []
+
+
+class CatanServer:
+    """Accepts connections, routes lobby commands and evicts idle rooms."""
+
+    def __init__(
+        self,
+        seed: Optional[int] = None,
+        queue_size: int = 32,
+        outbox_size: int = 256,
+        idle_timeout: float = 900.0,
+        sweep_interval: float = 30.0,
+    ):
+        self.seed = seed
+        self.queue_size = queue_size
+        self.outbox_size = outbox_size
+        self.idle_timeout = idle_timeout
+        self.sweep_interval = sweep_interval
+        self.rooms: Dict[str, Room] = {}
+        self.handlers: Dict[asyncio.Task, Connection] = {}
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.sweeper: Optional[asyncio.Task] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8765) -> asyncio.AbstractServer:
+        self.server = await asyncio.start_server(self.handle, host, port)
+        self.sweeper = asyncio.get_running_loop().create_task(self._sweep())
+        return self.server
+
+    async def close(self) -> None:
+        if self.sweeper is not None:
+            self.sweeper.cancel()
+        for room in list(self.rooms.values()):
+            room.close("Server shutting down.")
+        self.rooms.clear()
+        if self.server is not None:
+            self.server.close()
+        for conn in list(self.handlers.values()):
+            conn.close()
+        await asyncio.gather(*self.handlers, return_exceptions=True)
+        if self.server is not None:
+            await self.server.wait_closed()
+
+    async def _sweep(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            self.evict_idle(loop.time())
+
+    def evict_idle(self, now: float) -> List[str]:
+        """Close every room whose last input is older than idle_timeout; returns their names."""
+        stale = [name for name, room in self.rooms.items() if now - room.last_active > self.idle_timeout]
+        for name in stale:
+            self.rooms.pop(name).close("Idle room evicted.")
+        return stale
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        conn = Connection(writer, self.outbox_size)
+        task = asyncio.current_task()
+        self.handlers[task] = conn
+        try:
+            while not conn.closed:
+                raw = await reader.readline()
+                if not raw:
+                    break
+                line = raw.decode(errors="replace").strip()
+                if not line:
+                    continue
+                if line == "quit":
+                    break
+                if conn.room is None:
+                    self._lobby(conn, line.split())
+                else:
+                    await conn.room.inbox.put((conn.seat, line))
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            conn.close()
+            del self.handlers[task]
+
+    def _lobby(self, conn: Connection, words: List[str]) -> None:
+        if len(words) == 3 and words[0] == "join":
+            room = self.rooms.get(words[1])
+            if room is not None and room.finished:
+                self.rooms.pop(words[1]).close("A new game is starting in this room.")
+                room = None
+            if room is None:
+                room = self.rooms[words[1]] = Room(self, words[1])
+            if room.game is not None:
+                conn.send(["Error", "That game has already started."])
+            elif len(room.seats) >= MAX_PLAYERS:
+                conn.send(["Error", "That room is full."])
+            else:
+                room.add_seat(words[2], conn)
+            return
+        if len(words) == 4 and words[0] == "rejoin" and words[2].isdigit():
+            room = self.rooms.get(words[1])
+            seat = int(words[2])
+            if room is None or seat >= len(room.seats) or room.seats[seat].token != words[3]:
+                conn.send(["Error", "No such seat."])
+            else:
+                room.attach(seat, conn)
+            return
+        conn.send(["Error", "Join a room first: join <room> <name> or rejoin <room> <seat> <token>."])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Host Catan rooms over line-based TCP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=None, help="derive every room's game seed from this")
+    parser.add_argument("--idle-timeout", type=float, default=900.0)
+    args = parser.parse_args()
+
+    async def serve() -> None:
+        host = CatanServer(seed=args.seed, idle_timeout=args.idle_timeout)
+        server = await host.start(args.host, args.port)
+        print(f"Serving Catan rooms on {args.host}:{args.port}")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+"""Step thousands of Catan games at once as NumPy struct-of-arrays.
+
+Each of the B games is a row in a handful of arrays (tile resources and
+numbers, node owners and weights, edge owners, hands, robber). Dice, payouts,
+seven-roll discards, the robber and a simple greedy build policy all run as
+whole-batch array operations. The rules follow the scalar `CatanGame`; the
+differential test in test/test_catan_vector.py replays every batch decision
+through the scalar engine to keep the two in step.
+
+Requires NumPy.
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from catan import (
+    LONGEST_ROAD_MIN,
+    LONGEST_ROAD_POINTS,
+    RESOURCES,
+    WINNING_POINTS,
+    BoardLayout,
+    CatanGame,
+    RoadNetworks,
+    award_longest_road,
+    board_topology,
+)
+
+WOOD, BRICK, SHEEP, WHEAT, ORE = range(len(RESOURCES))
+NO_ACTION, CITY, SETTLEMENT, ROAD, TRADE = range(5)
+
+
+def _padded(rows: Sequence[Sequence[int]], fill: int) -> np.ndarray:
+    width = max(len(r) for r in rows)
+    return np.array([sorted(r) + [fill] * (width - len(r)) for r in rows], dtype=np.intp)
+
+
+class VectorEngine:
+    """B independent games of the same player count, stepped together.
+
+    Node and edge arrays carry one extra sentinel column that is never owned,
+    so padded adjacency tables can be gathered without masking.
+    """
+
+    def __init__(self, layouts: Sequence[BoardLayout], num_players: int, seed: Optional[int] = None):
+        topo = layouts[0].topology
+        self.rng = np.random.default_rng(seed)
+        self.B = B = len(layouts)
+        self.P = num_players
+        self.N = N = len(topo.node_points)
+        self.E = E = len(topo.edge_ends)
+        self.T = T = len(topo.coords)
+
+        self.tile_nodes = np.array(topo.tile_nodes, dtype=np.intp)
+        self.node_nbrs = _padded([list(n) for n in topo.node_neighbors], N)
+        self.node_edges = _padded([list(e) for e in topo.node_edges], E)
+        self.edge_nodes = np.array(topo.edge_ends, dtype=np.intp)
+        edge_nbrs = [
+            sorted((topo.node_edges[a] | topo.node_edges[b]) - {eidx}) for eidx, (a, b) in enumerate(topo.edge_ends)
+        ]
+        self.edge_nbrs = _padded(edge_nbrs, E)
+
+        self.node_hexes = _padded([list(h) for h in topo.node_hexes], T)
+
+        # Tile arrays carry a sentinel column T (number 0) for the padded node_hexes table.
+        self.tile_res = np.array(
+            [[0 if r == "desert" else RESOURCES.index(r) for r in lay.resources] + [0] for lay in layouts],
+            dtype=np.intp,
+        )
+        self.tile_num = np.array([[n or 0 for n in lay.numbers] + [0] for lay in layouts], dtype=np.intp)
+        self.tile_pips = np.where(self.tile_num > 0, 6 - np.abs(7 - self.tile_num), 0)[:, :T]
+        producing = self.tile_num[:, :T, None] > 0
+        self.res_onehot = ((self.tile_res[:, :T, None] == np.arange(len(RESOURCES))) & producing).astype(np.int32)
+
+        self.node_owner = np.full((B, N + 1), -1, dtype=np.int8)
+        self.node_weight = np.zeros((B, N + 1), dtype=np.int8)
+        self.edge_owner = np.full((B, E + 1), -1, dtype=np.int8)
+        self.hands = np.zeros((B, num_players, len(RESOURCES)), dtype=np.int32)
+        self.robber = np.array([lay.desert_tile for lay in layouts], dtype=np.intp)
+        self.current = np.zeros(B, dtype=np.intp)
+        self.round_num = np.ones(B, dtype=np.int32)
+        self.winner = np.full(B, -1, dtype=np.intp)
+        self.rows = np.arange(B)
+        # production[b, roll, player, resource]: the batch version of CatanGame.production,
+        # kept current by builds and robber moves so a roll is a single gather.
+        self.production = np.zeros((B, 13, num_players, len(RESOURCES)), dtype=np.int32)
+        # Longest Road is tracked as bounds, road_lo <= length <= road_hi per game and player: a
+        # road raises hi by one, or to the player's road count when it links roads at both ends,
+        # and an opponent settlement through a road resets lo to 0. Trail lengths are searched
+        # (scalar, from scratch) only in games where the bounds cannot rule out a change of
+        # holder (-1 for none).
+        self.road_count = np.zeros((B, num_players), dtype=np.int32)
+        self.road_lo = np.zeros((B, num_players), dtype=np.int32)
+        self.road_hi = np.zeros((B, num_players), dtype=np.int32)
+        self.longest_road = np.full(B, -1, dtype=np.intp)
+        self.trails = RoadNetworks(topo, num_players)
+
+        # Decisions of the latest step, so callers can audit or replay them.
+        self.last_robber = np.full(B, -1, dtype=np.intp)
+        self.last_victim = np.full(B, -1, dtype=np.intp)
+        self.last_stolen = np.full(B, -1, dtype=np.intp)
+        self.last_actions: List[np.ndarray] = []
+
+    @classmethod
+    def from_games(cls, games: Sequence[CatanGame], seed: Optional[int] = None) -> "VectorEngine":
+        """Load scalar games (typically right after setup) into one batch."""
+        engine = cls([g.layout for g in games], len(games[0].players), seed)
+        for b, game in enumerate(games):
+            for node in game.nodes:
+                if node.owner is not None:
+                    engine.node_owner[b, node.idx] = node.owner
+                    engine.node_weight[b, node.idx] = 2 if node.is_city else 1
+            for edge in game.edges:
+                if edge.owner is not None:
+                    engine.edge_owner[b, edge.idx] = edge.owner
+            for pidx, player in enumerate(game.players):
+                engine.hands[b, pidx] = [player.hand[r] for r in RESOURCES]
+            for roll, payouts in enumerate(game.production):
+                for (pidx, res), amount in payouts.items():
+                    engine.production[b, roll, pidx, RESOURCES.index(res)] = amount
+            engine.road_count[b] = [len(player.roads) for player in game.players]
+            engine.road_lo[b] = engine.road_hi[b] = game.road_net.best
+            holder = game.road_net.holder
+            engine.longest_road[b] = -1 if holder is None else holder
+            engine.robber[b] = game.robber_tile
+            engine.current[b] = game.current_player
+            engine.round_num[b] = game.round_num
+        return engine
+
+    @classmethod
+    def random(cls, batch: int, num_players: int, seed: Optional[int] = None, radius: int = 2) -> "VectorEngine":
+        import random
+
+        rng = random.Random(seed)
+        layouts = [BoardLayout.shuffled(rng, board_topology(radius)) for _ in range(batch)]
+        return cls(layouts, num_players, seed)
+
+    # -- queries -----------------------------------------------------------------
+
+    @property
+    def active(self) -> np.ndarray:
+        return self.winner == -1
+
+    def victory_points(self, games: Optional[np.ndarray] = None) -> np.ndarray:
+        """(B, P) settlements + 2 * cities + Longest Road, or (len(games), P) for a subset of rows."""
+        rows = slice(None) if games is None else games
+        weight = self.node_weight[rows, : self.N].astype(np.int32)
+        owner = self.node_owner[rows, : self.N]
+        points = np.stack([(weight * (owner == p)).sum(1) for p in range(self.P)], axis=1)
+        return points + LONGEST_ROAD_POINTS * (self.longest_road[rows, None] == np.arange(self.P))
+
+    def _pick(self, legal: np.ndarray) -> np.ndarray:
+        """Uniform random True column per row of legal, -1 for rows with none."""
+        scores = np.where(legal, self.rng.random(legal.shape), -1.0)
+        choice = scores.argmax(1)
+        return np.where(legal.any(1), choice, -1)
+
+    def _settlement_spots(self, b: np.ndarray, players: np.ndarray, setup: bool = False) -> np.ndarray:
+        """(len(b), N) legal settlement nodes for players[i] in game b[i]."""
+        owner = self.node_owner[b]
+        legal = (owner[:, : self.N] < 0) & ~(owner[:, self.node_nbrs] >= 0).any(2)
+        if not setup:
+            legal &= (self.edge_owner[b][:, self.node_edges] == players[:, None, None]).any(2)
+        return legal
+
+    def _road_spots(self, b: np.ndarray, players: np.ndarray) -> np.ndarray:
+        """(len(b), E) legal road edges for players[i] in game b[i]."""
+        mine = players[:, None, None]
+        edges = self.edge_owner[b]
+        return (edges[:, : self.E] < 0) & (
+            (self.node_owner[b][:, self.edge_nodes] == mine).any(2) | (edges[:, self.edge_nbrs] == mine).any(2)
+        )
+
+    # -- setup ---------------------------------------------------------------------
+
+    def setup(self) -> None:
+        """Snake-order random placements with starting resources from each second settlement."""
+        order = list(range(self.P))
+        rows = self.rows
+        for turn, pidx in enumerate(order + order[::-1]):
+            players = np.full(self.B, pidx, dtype=np.intp)
+            nodes = self._pick(self._settlement_spots(rows, players, setup=True))
+            self.node_owner[rows, nodes] = pidx
+            self.node_weight[rows, nodes] = 1
+            self._add_production(rows, players, nodes)
+            incident = self.node_edges[nodes]
+            free = (self.edge_owner[rows[:, None], incident] < 0) & (incident < self.E)
+            edges = incident[rows, self._pick(free)]
+            self.edge_owner[rows, edges] = pidx
+            self.road_count[:, pidx] += 1
+            self.road_hi[:, pidx] = self.road_count[:, pidx]
+            if turn >= self.P:
+                touching = (self.tile_nodes[None, :, :] == nodes[:, None, None]).any(2)
+                self.hands[:, pidx] += np.einsum("bt,btr->br", touching.astype(np.int32), self.res_onehot)
+        self.current[:] = 0
+
+    # -- turn steps ------------------------------------------------------------------
+
+    def roll_dice(self) -> np.ndarray:
+        return self.rng.integers(1, 7, self.B) + self.rng.integers(1, 7, self.B)
+
+    def _add_production(self, b: np.ndarray, players: np.ndarray, nodes: np.ndarray) -> None:
+        """One more card per roll for players[i] from every producing tile around nodes[i] in game b[i]."""
+        tiles = self.node_hexes[nodes]
+        rows = b[:, None]
+        live = (self.tile_num[rows, tiles] > 0) & (tiles != self.robber[b][:, None])
+        index = (rows, self.tile_num[rows, tiles], players[:, None], self.tile_res[rows, tiles])
+        np.add.at(self.production, index, live.astype(np.int32))
+
+    def _set_tiles_producing(self, b: np.ndarray, tiles: np.ndarray, sign: int) -> None:
+        rows = b[:, None]
+        nodes = self.tile_nodes[tiles]
+        owner = self.node_owner[rows, nodes].astype(np.intp)
+        amount = sign * self.node_weight[rows, nodes].astype(np.int32) * (owner >= 0)
+        index = (rows, self.tile_num[b, tiles][:, None], np.maximum(owner, 0), self.tile_res[b, tiles][:, None])
+        np.add.at(self.production, index, amount)
+
+    def distribute_resources(self, rolls: np.ndarray) -> None:
+        paid = np.nonzero(self.active & (rolls != 7))[0]
+        self.hands[paid] += self.production[paid, rolls[paid]]
+
+    def discard_half(self, games: np.ndarray) -> None:
+        """Players over 7 cards drop half, one card at a time from their largest pile."""
+        totals = self.hands.sum(2)
+        b, p = np.nonzero((totals > 7) & games[:, None])
+        owed = totals[b, p] // 2
+        while len(b):
+            largest = self.hands[b, p].argmax(1)
+            self.hands[b, p, largest] -= 1
+            owed -= 1
+            left = owed > 0
+            b, p, owed = b[left], p[left], owed[left]
+
+    def move_robber(self, games: np.ndarray) -> None:
+        """Block the tile that costs opponents the most pips, then rob the richest victim there."""
+        self.last_robber = np.full(self.B, -1, dtype=np.intp)
+        self.last_victim = np.full(self.B, -1, dtype=np.intp)
+        self.last_stolen = np.full(self.B, -1, dtype=np.intp)
+        b = np.nonzero(games)[0]
+        if not len(b):
+            return
+        k = np.arange(len(b))
+        movers = self.current[b]
+        owners = self.node_owner[b][:, self.tile_nodes]
+        weights = self.node_weight[b][:, self.tile_nodes].astype(np.int32)
+        mine = owners == movers[:, None, None]
+        theirs = (owners >= 0) & ~mine
+        score = ((weights * theirs).sum(2) - (weights * mine).sum(2)) * self.tile_pips[b]
+        score[k, self.robber[b]] = np.iinfo(np.int32).min
+        tiles = score.argmax(1)
+        self._set_tiles_producing(b, self.robber[b], 1)
+        self.robber[b] = tiles
+        self._set_tiles_producing(b, tiles, -1)
+        self.last_robber[b] = tiles
+
+        on_tile = (owners[k, tiles][:, :, None] == np.arange(self.P)).any(1)
+        totals = self.hands[b].sum(2)
+        eligible = on_tile & (np.arange(self.P) != movers[:, None]) & (totals > 0)
+        robbed = eligible.any(1)
+        b, k, movers = b[robbed], k[robbed], movers[robbed]
+        victims = np.where(eligible[robbed], totals[robbed], -1).argmax(1)
+        self.last_victim[b] = victims
+
+        victim_hands = self.hands[b, victims]
+        draw = (self.rng.random(len(b)) * totals[k, victims]).astype(np.int32)
+        stolen = (victim_hands.cumsum(1) <= draw[:, None]).sum(1)
+        self.hands[b, victims, stolen] -= 1
+        self.hands[b, movers, stolen] += 1
+        self.last_stolen[b] = stolen
+
+    def build_phase(self, max_actions: int = 16) -> None:
+        """Greedy policy for the side to move: city, else settlement, else road, else a 4:1 trade.
+
+        Each pass only looks at games that acted on the previous pass, and each
+        legality mask is only computed for the games that can afford that build.
+        """
+        self.last_actions = []
+        games = np.nonzero(self.active)[0]
+        for _ in range(max_actions):
+            if not len(games):
+                break
+            players = self.current[games]
+            hand = self.hands[games, players]
+            kind = np.full(len(games), NO_ACTION, dtype=np.int8)
+            target = np.full(len(games), -1, dtype=np.intp)
+
+            sub = np.nonzero((hand[:, WHEAT] >= 2) & (hand[:, ORE] >= 3))[0]
+            if len(sub):
+                b = games[sub]
+                owned = (self.node_owner[b, : self.N] == players[sub, None]) & (self.node_weight[b, : self.N] == 1)
+                self._choose(kind, target, sub, CITY, self._pick(owned))
+
+            sub = np.nonzero((kind == NO_ACTION) & (hand[:, [WOOD, BRICK, SHEEP, WHEAT]] >= 1).all(1))[0]
+            if len(sub):
+                spots = self._settlement_spots(games[sub], players[sub])
+                self._choose(kind, target, sub, SETTLEMENT, self._pick(spots))
+
+            sub = np.nonzero((kind == NO_ACTION) & (hand[:, WOOD] >= 1) & (hand[:, BRICK] >= 1))[0]
+            if len(sub):
+                self._choose(kind, target, sub, ROAD, self._pick(self._road_spots(games[sub], players[sub])))
+
+            idx = np.arange(len(games))
+            give, get = hand.argmax(1), hand.argmin(1)
+            pick = (kind == NO_ACTION) & (hand[idx, give] >= 4) & (hand[idx, get] == 0)
+            kind[pick], target[pick] = TRADE, give[pick] * len(RESOURCES) + get[pick]
+
+            acted = kind != NO_ACTION
+            if not acted.any():
+                break
+            games, players, kind, target = games[acted], players[acted], kind[acted], target[acted]
+            self._apply(games, players, kind, target)
+            self.last_actions.append(np.stack([games, kind, target]))
+            won = self.victory_points(games)[np.arange(len(games)), players] >= WINNING_POINTS
+            self.winner[games[won]] = players[won]
+            games = games[~won]
+
+    @staticmethod
+    def _choose(kind: np.ndarray, target: np.ndarray, sub: np.ndarray, code: int, picks: np.ndarray) -> None:
+        found = picks >= 0
+        kind[sub[found]] = code
+        target[sub[found]] = picks[found]
+
+    def _apply(self, games: np.ndarray, players: np.ndarray, kind: np.ndarray, target: np.ndarray) -> None:
+        hands = self.hands
+        sel = kind == CITY
+        b, p, t = games[sel], players[sel], target[sel]
+        self.node_weight[b, t] = 2
+        self._add_production(b, p, t)
+        hands[b, p, WHEAT] -= 2
+        hands[b, p, ORE] -= 3
+
+        sel = kind == SETTLEMENT
+        b, p, t = games[sel], players[sel], target[sel]
+        self.node_owner[b, t] = p
+        self.node_weight[b, t] = 1
+        self._add_production(b, p, t)
+        for res in (WOOD, BRICK, SHEEP, WHEAT):
+            hands[b, p, res] -= 1
+        # Only a trail through the node, two or more of a player's roads meeting there, is cut.
+        meeting = self.edge_owner[b[:, None], self.node_edges[t]]
+        cut = ((meeting[:, :, None] == np.arange(self.P)).sum(1) >= 2) & (np.arange(self.P) != p[:, None])
+        self.road_lo[b] = np.where(cut, 0, self.road_lo[b])
+        touched = b
+
+        sel = kind == ROAD
+        b, p, t = games[sel], players[sel], target[sel]
+        self.edge_owner[b, t] = p
+        hands[b, p, WOOD] -= 1
+        hands[b, p, BRICK] -= 1
+        self.road_count[b, p] += 1
+        # Counting the new road itself, two or more of the player's roads at both ends may join two pieces.
+        ends = self.node_edges[self.edge_nodes[t]]
+        links = ((self.edge_owner[b[:, None, None], ends] == p[:, None, None]).sum(2) >= 2).all(1)
+        self.road_hi[b, p] = np.where(links, self.road_count[b, p], self.road_hi[b, p] + 1)
+        self._update_longest_road(np.concatenate([touched, b]))
+
+        sel = kind == TRADE
+        b, p = games[sel], players[sel]
+        give, get = np.divmod(target[sel], len(RESOURCES))
+        hands[b, p, give] -= 4
+        hands[b, p, get] += 1
+
+    def _update_longest_road(self, games: np.ndarray) -> None:
+        """Re-award Longest Road in games that just built, searching trails only where the bounds overlap."""
+        if not len(games):
+            return
+        lo, hi, holder = self.road_lo[games], self.road_hi[games], self.longest_road[games]
+        held = np.maximum(holder, 0)
+        held_lo = lo[np.arange(len(games)), held]
+        rivals = (hi > held_lo[:, None]) & (np.arange(self.P) != held[:, None])
+        settled = np.where(
+            holder >= 0, (held_lo >= LONGEST_ROAD_MIN) & ~rivals.any(1), (hi < LONGEST_ROAD_MIN).all(1)
+        )
+        for b in games[~settled].tolist():
+            self._award_longest_road(b)
+
+    def _award_longest_road(self, b: int) -> None:
+        """Search the lengths that can decide the award in game b, then award it as the scalar engine does."""
+        lo, hi = self.road_lo[b], self.road_hi[b]
+        holder = int(self.longest_road[b])
+        if holder >= 0:
+            self._search_road(b, holder)
+            candidates = [p for p in range(self.P) if p != holder and hi[p] > lo[holder]]
+        else:
+            candidates = [p for p in range(self.P) if hi[p] >= LONGEST_ROAD_MIN]
+        for pidx in candidates:
+            self._search_road(b, pidx)
+        # Every other player has hi <= the holder's length (or < LONGEST_ROAD_MIN), so lo stands in.
+        awarded = award_longest_road(None if holder < 0 else holder, lo.tolist())
+        self.longest_road[b] = -1 if awarded is None else awarded
+
+    def _search_road(self, b: int, pidx: int) -> None:
+        if self.road_lo[b, pidx] == self.road_hi[b, pidx]:
+            return
+        roads = sum(1 << e for e in np.flatnonzero(self.edge_owner[b, : self.E] == pidx).tolist())
+        owner = self.node_owner[b, : self.N]
+        blocked = sum(1 << n for n in np.flatnonzero((owner >= 0) & (owner != pidx)).tolist())
+        self.road_lo[b, pidx] = self.road_hi[b, pidx] = self.trails.longest_road(roads, blocked)
+
+    def end_turn(self) -> None:
+        live = self.active
+        self.current = np.where(live, (self.current + 1) % self.P, self.current)
+        self.round_num += live & (self.current == 0)
+
+    def step(self, rolls: Optional[np.ndarray] = None) -> np.ndarray:
+        """One full turn in every unfinished game; returns the dice used."""
+        if rolls is None:
+            rolls = self.roll_dice()
+        sevens = (rolls == 7) & self.active
+        self.distribute_resources(rolls)
+        self.discard_half(sevens)
+        self.move_robber(sevens)
+        self.build_phase()
+        self.end_turn()
+        return rolls
+
+    def run(self, max_rounds: int = 500) -> np.ndarray:
+        """Step until every game has a winner or hits max_rounds; returns winners (-1 if unfinished)."""
+        while (self.active & (self.round_num <= max_rounds)).any():
+            self.step()
+            self.winner = np.where(self.active & (self.round_num > max_rounds), -2, self.winner)
+        return np.where(self.winner >= 0, self.winner, -1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a batch of vectorized headless Catan games.")
+    parser.add_argument("--batch", type=int, default=4096)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-rounds", type=int, default=500)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    engine = VectorEngine.random(args.batch, args.players, args.seed)
+    engine.setup()
+    winners = engine.run(args.max_rounds)
+    elapsed = time.perf_counter() - start
+    finished = winners >= 0
+    rate = args.batch / elapsed * 60
+    print(f"{args.batch} games in {elapsed:.2f}s ({rate:,.0f} games/min), {finished.sum()} finished")
+    for seat in range(args.players):
+        print(f"  P{seat}: {(winners == seat).mean():.3f}")
+
+
+if __name__ == "__main__":
+    main()
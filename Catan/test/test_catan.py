@@ -0,0 +1,672 @@
+import builtins
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import catan  # noqa: E402
+
+
+def make_headless_game(seed=1, players=("Ann", "Ben", "Cal")):
+    agents = [catan.RandomAgent(seed * 10 + i) for i in range(len(players))]
+    return catan.CatanGame(list(players), seed=seed, agents=agents, verbose=False)
+
+
+@pytest.fixture
+def no_stdio(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("headless game touched stdio")
+
+    monkeypatch.setattr(builtins, "input", fail)
+    monkeypatch.setattr(builtins, "print", fail)
+
+
+def test_headless_game_runs_to_completion_without_stdio(no_stdio):
+    game = make_headless_game(seed=7)
+
+    winner = game.play(max_rounds=500)
+
+    assert winner is not None
+    assert game.players[winner].victory_points >= catan.WINNING_POINTS
+
+
+def test_headless_games_are_reproducible_from_seeds():
+    first = make_headless_game(seed=3)
+    second = make_headless_game(seed=3)
+
+    assert first.play(max_rounds=500) == second.play(max_rounds=500)
+    assert [p.hand for p in first.players] == [p.hand for p in second.players]
+    assert first.round_num == second.round_num
+
+
+def test_game_requires_one_agent_per_player():
+    with pytest.raises(ValueError):
+        catan.CatanGame(["Ann", "Ben"], agents=[catan.RandomAgent()])
+
+
+def test_rejected_discard_choices_are_asked_again():
+    class PickyDiscarder(catan.Agent):
+        def __init__(self):
+            self.answers = ["gold", "ore", "wood", "wood", "wood", "wood"]
+
+        def choose_discard(self, game, player_idx, remaining):
+            return self.answers.pop(0)
+
+        def choose_robber_tile(self, game, player_idx):
+            return (game.robber_tile + 1) % len(game.tiles)
+
+    agent = PickyDiscarder()
+    game = catan.CatanGame(["Ann", "Ben", "Cal"], seed=2, agents=[agent, catan.Agent(), catan.Agent()], verbose=False)
+    game.players[0].hand["wood"] = 8
+
+    game.handle_roll_seven(0)
+
+    assert game.players[0].hand["wood"] == 4
+    assert agent.answers == []
+
+
+def mask_of(ids):
+    out = 0
+    for i in ids:
+        out |= 1 << i
+    return out
+
+
+def test_bitboards_stay_consistent_with_player_pieces():
+    game = make_headless_game(seed=11)
+    game.play(max_rounds=500)
+
+    bits = game.bits
+    for idx, player in enumerate(game.players):
+        assert bits.roads[idx] == mask_of(player.roads)
+        assert bits.settlements[idx] == mask_of(player.settlements)
+        assert bits.cities[idx] == mask_of(player.cities)
+    assert bits.occupied == mask_of(n.idx for n in game.nodes if n.owner is not None)
+    assert bits.all_roads == mask_of(e.idx for e in game.edges if e.owner is not None)
+
+
+def test_bitboard_rule_checks_match_graph_walk():
+    game = make_headless_game(seed=5)
+    game.play(max_rounds=500)
+
+    for pidx in range(len(game.players)):
+        for node in game.nodes:
+            free = node.owner is None and all(game.nodes[n].owner is None for n in game.node_neighbors(node.idx))
+            linked = any(game.edges[e].owner == pidx for e in node.edges)
+            assert game.can_build_settlement(pidx, node.idx)[0] == (free and linked)
+        for edge in game.edges:
+            touching = any(
+                game.nodes[n].owner == pidx or any(game.edges[e].owner == pidx for e in game.nodes[n].edges)
+                for n in (edge.a, edge.b)
+            )
+            assert game.can_build_road(pidx, edge.idx)[0] == (edge.owner is None and touching)
+
+
+def test_board_topology_is_built_once_and_shared():
+    first = make_headless_game(seed=1)
+    second = make_headless_game(seed=2)
+
+    topo = catan.board_topology(2)
+    assert first.topology is topo and second.topology is topo
+    assert (len(topo.coords), len(topo.node_points), len(topo.edge_ends)) == (19, 54, 72)
+    assert first.nodes[0].edges is second.nodes[0].edges
+    assert [t.resource for t in first.tiles] != [t.resource for t in second.tiles]
+
+
+def test_board_topology_matches_tile_geometry():
+    topo = catan.board_topology(2)
+
+    for tidx, corners in enumerate(topo.tile_nodes):
+        assert len(set(corners)) == 6
+        for i in range(6):
+            a, b = corners[i], corners[(i + 1) % 6]
+            assert b in topo.node_neighbors[a]
+            assert tidx in topo.node_hexes[a]
+    assert sum(len(h) for h in topo.node_hexes) == 6 * 19
+    assert all(2 <= len(n) <= 3 for n in topo.node_neighbors)
+
+
+@pytest.mark.parametrize("radius", [1, 3, 12])
+def test_board_topology_scales_with_radius(radius):
+    topo = catan.board_topology(radius)
+
+    assert len(topo.coords) == 3 * radius * radius + 3 * radius + 1
+    assert len(topo.node_points) == 6 * (radius + 1) ** 2
+    assert len(topo.edge_ends) == 9 * radius * radius + 15 * radius + 6
+    assert len(set(topo.node_points)) == len(topo.node_points)
+    assert all(isinstance(x, int) and isinstance(y, int) for x, y in topo.node_points)
+    inner = sum(1 for hexes in topo.node_hexes if len(hexes) == 3)
+    assert inner == len(topo.node_points) - 6 * (2 * radius + 1)
+
+
+def test_distributions_scale_with_board_size():
+    assert catan.resource_counts(19) == catan.RESOURCE_COUNTS
+    assert catan.number_tokens(18) == catan.NUMBER_TOKENS
+
+    for radius in (1, 3, 6):
+        layout = catan.BoardLayout.shuffled(catan.random.Random(radius), catan.board_topology(radius))
+        counts = catan.resource_counts(len(layout.resources))
+        assert sum(counts.values()) == len(layout.resources)
+        assert all(layout.resources.count(res) == n for res, n in counts.items())
+        assert all((num is None) == (res == "desert") for res, num in zip(layout.resources, layout.numbers))
+        assert 7 not in layout.numbers
+
+
+def test_headless_game_runs_on_a_large_board(no_stdio):
+    agents = [catan.RandomAgent(i) for i in range(4)]
+    game = catan.CatanGame(["A", "B", "C", "D"], seed=3, agents=agents, verbose=False, radius=5)
+
+    assert len(game.tiles) == 91
+    assert game.tiles[game.robber_tile].resource == "desert"
+    game.play(max_rounds=60)
+    assert game.round_num > 1
+
+
+def test_layout_and_radius_are_exclusive():
+    layout = catan.BoardLayout.shuffled(catan.random.Random(1), catan.board_topology(3))
+    agents = [catan.RandomAgent(i) for i in range(3)]
+
+    assert len(catan.CatanGame(["A", "B", "C"], agents=agents, verbose=False, layout=layout).tiles) == 37
+    with pytest.raises(ValueError):
+        catan.CatanGame(["A", "B", "C"], agents=agents, verbose=False, layout=layout, radius=3)
+
+
+def scanned_payouts(game, roll):
+    gains = {}
+    for tile in game.tiles:
+        if tile.idx == game.robber_tile or tile.number != roll:
+            continue
+        for nidx in tile.nodes:
+            node = game.nodes[nidx]
+            if node.owner is not None:
+                key = (node.owner, tile.resource)
+                gains[key] = gains.get(key, 0) + (2 if node.is_city else 1)
+    return gains
+
+
+def test_production_index_tracks_builds_and_robber_moves():
+    game = make_headless_game(seed=21)
+    game.play(max_rounds=500)
+
+    for tile in game.tiles:
+        if tile.idx != game.robber_tile:
+            game.move_robber(game.current_player, tile.idx)
+        for roll in range(2, 13):
+            assert game.production[roll] == scanned_payouts(game, roll)
+
+
+def test_distribute_resources_pays_out_from_index():
+    game = make_headless_game(seed=4)
+    game.setup_phase()
+    roll = next(t.number for t in game.tiles if t.number and scanned_payouts(game, t.number))
+    before = [dict(p.hand) for p in game.players]
+
+    game.distribute_resources(roll)
+
+    for (pidx, res), amount in scanned_payouts(game, roll).items():
+        before[pidx][res] += amount
+    assert [p.hand for p in game.players] == before
+
+
+def test_random_streams_do_not_shift_each_other():
+    plain, busy = catan.GameRandom(9), catan.GameRandom(9)
+    hand = {"wood": 0, "brick": 2, "sheep": 1, "wheat": 0, "ore": 5}
+
+    rolls = [plain.roll() for _ in range(600)]
+    busy_rolls = []
+    for _ in range(600):
+        busy_rolls.append(busy.roll())
+        assert hand[busy.steal(hand)] > 0
+    assert busy_rolls == rolls
+    assert set(rolls) <= set(range(2, 13)) and 70 < rolls.count(7) < 130
+
+    state = busy.getstate()
+    resumed = catan.GameRandom(0)
+    resumed.setstate(state)
+    assert [resumed.roll() for _ in range(300)] == [busy.roll() for _ in range(300)]
+    assert [resumed.steal(hand) for _ in range(50)] == [busy.steal(hand) for _ in range(50)]
+
+
+def test_weighted_steal_matches_drawing_from_a_bag():
+    hand = {"wood": 3, "brick": 0, "sheep": 1, "wheat": 2, "ore": 0}
+    bag = [res for res in catan.RESOURCES for _ in range(hand[res])]
+    shared = catan.SharedRandom(4)
+    reference = catan.random.Random(4)
+
+    assert [shared.steal(hand) for _ in range(200)] == [reference.choice(bag) for _ in range(200)]
+
+
+def test_node_values_read_production_off_the_tiles():
+    game = make_headless_game(seed=6)
+
+    for node, value in zip(game.nodes, game.placement.values):
+        tiles = [game.tiles[t] for t in node.hexes if game.tiles[t].number]
+        pips = [6 - abs(7 - t.number) for t in tiles]
+        assert value.pips == sum(pips)
+        assert value.diversity == len({t.resource for t in tiles})
+        assert value.exposure == (max(pips) / sum(pips) if pips else 0.0)
+        for res, income in zip(catan.RESOURCES, value.income):
+            assert income * 36 == pytest.approx(sum(p for p, t in zip(pips, tiles) if t.resource == res))
+
+
+def test_placement_index_returns_the_best_legal_spot_in_both_setup_rounds():
+    agents = [catan.GreedySetupAgent(i) for i in range(4)]
+    game = catan.CatanGame(["A", "B", "C", "D"], seed=2, agents=agents, verbose=False)
+    scores = [v.score for v in game.placement.values]
+    picks = []
+
+    def check(event):
+        if type(event) is catan.SetupTurn:
+            legal = [n.idx for n in game.nodes if game.can_build_settlement(event.player, n.idx, setup=True)[0]]
+            ranked = sorted(legal, key=lambda n: -scores[n])
+            assert scores[game.placement.best()] == scores[ranked[0]]
+            assert [scores[n] for n in game.placement.top(5)] == [scores[n] for n in ranked[:5]]
+            assert [scores[n] for n in game.placement.top(5)] == [scores[n] for n in ranked[:5]]
+        elif type(event) is catan.SettlementBuilt:
+            picks.append(event.node)
+
+    game.events.subscribe(check)
+    game.setup_phase()
+    assert len(picks) == 8
+    assert all(game.nodes[n].owner is not None for n in picks)
+
+
+def scanned_robber_targets(game, pidx):
+    """Every legal robber tile by a scan of its nodes, best first, as (tile, score, denied, lost, victims)."""
+    rows = []
+    for tile in game.tiles:
+        if tile.idx == game.robber_tile:
+            continue
+        rate = catan.PIPS[tile.number or 0] / 36
+        denied = lost = 0.0
+        for nidx in tile.nodes:
+            node = game.nodes[nidx]
+            if node.owner is not None:
+                amount = rate * (2 if node.is_city else 1)
+                if node.owner == pidx:
+                    lost += amount
+                else:
+                    denied += amount
+        victims = tuple(game.robber_victims(pidx, tile.idx))
+        score = denied - lost + (0.05 if victims else 0.0)
+        rows.append((tile.idx, score, denied, lost, victims))
+    return sorted(rows, key=lambda row: (-round(row[1], 9), row[0]))
+
+
+def test_robber_index_ranks_targets_like_a_board_scan_throughout_a_game():
+    checked = []
+
+    class CheckingAgent(catan.GreedyRobberAgent):
+        def choose_robber_tile(self, game, player_idx):
+            targets = game.robber_targets(player_idx)
+            scanned = scanned_robber_targets(game, player_idx)
+            assert [t.tile for t in targets] == [row[0] for row in scanned]
+            for target, (_, score, denied, lost, victims) in zip(targets, scanned):
+                assert (target.score, target.denied, target.lost) == pytest.approx((score, denied, lost))
+                assert target.victims == victims
+                assert target.hand_sizes == tuple(game.players[v].resource_count for v in victims)
+            choice = super().choose_robber_tile(game, player_idx)
+            assert choice == targets[0].tile
+            checked.append(choice)
+            return choice
+
+    game = catan.CatanGame(["A", "B", "C"], seed=6, agents=[CheckingAgent(i) for i in range(3)], verbose=False)
+    assert game.play(max_rounds=500) is not None
+    assert len(checked) > 5
+
+
+def test_robber_target_splits_denied_production_by_seat():
+    game = make_headless_game(seed=6)
+    game.play(max_rounds=40)
+    targets = {target.tile: target for target in game.robber_targets(0)}
+    tile = next(
+        t for t in game.tiles if t.idx in targets and len({game.nodes[n].owner for n in t.nodes} - {None, 0}) == 2
+    )
+
+    expected = [0.0] * len(game.players)
+    for nidx in tile.nodes:
+        node = game.nodes[nidx]
+        if node.owner not in (None, 0):
+            expected[node.owner] += catan.PIPS[tile.number or 0] * (2 if node.is_city else 1) / 36
+    target = targets[tile.idx]
+    assert target.denied_by_player == pytest.approx(tuple(expected))
+    assert sum(target.denied_by_player) == pytest.approx(target.denied)
+    assert target.denied_by_player[0] == 0.0
+
+
+def scanned_builds(game, pidx):
+    return (
+        {n.idx for n in game.nodes if game.can_build_city(pidx, n.idx)[0]},
+        {n.idx for n in game.nodes if game.can_build_settlement(pidx, n.idx)[0]},
+        {e.idx for e in game.edges if game.can_build_road(pidx, e.idx)[0]},
+    )
+
+
+def walked_road_length(game, pidx):
+    """Longest Road by brute force: every trail over pidx's roads, stopping at opponents' buildings."""
+    blocked = {n.idx for n in game.nodes if n.owner not in (None, pidx)}
+
+    def walk(node, used):
+        if used and node in blocked:
+            return 0
+        best = 0
+        for eidx in game.nodes[node].edges:
+            edge = game.edges[eidx]
+            if edge.owner == pidx and eidx not in used:
+                best = max(best, 1 + walk(edge.b if edge.a == node else edge.a, used | {eidx}))
+        return best
+
+    return max((walk(n, frozenset()) for e in game.players[pidx].roads for n in game.topology.edge_ends[e]), default=0)
+
+
+def test_longest_road_matches_brute_force_throughout_a_game():
+    class CheckingAgent(catan.RandomAgent):
+        def choose_action(self, game, player_idx):
+            for pidx in range(len(game.players)):
+                assert game.road_net.length(pidx) == walked_road_length(game, pidx)
+            holder = game.road_net.holder
+            assert [p.has_longest_road for p in game.players] == [i == holder for i in range(3)]
+            if holder is not None:
+                assert game.road_net.length(holder) >= catan.LONGEST_ROAD_MIN
+            return super().choose_action(game, player_idx)
+
+    game = catan.CatanGame(["Ann", "Ben", "Cal"], seed=4, agents=[CheckingAgent(i) for i in range(3)], verbose=False)
+    game.play(max_rounds=120)
+    assert max(game.road_net.length(p) for p in range(3)) >= catan.LONGEST_ROAD_MIN
+
+
+def test_opponent_settlement_breaks_longest_road():
+    game = make_headless_game(seed=6)
+    events = []
+    game.events.subscribe(events.append)
+    path, edges = [0], []
+    while len(edges) < 6:
+        node = path[-1]
+        eidx, nxt = next(
+            (e, b if a == node else a)
+            for e in sorted(game.nodes[node].edges)
+            for a, b in [game.topology.edge_ends[e]]
+            if (b if a == node else a) not in path
+        )
+        path.append(nxt)
+        edges.append(eidx)
+
+    game.build_settlement(0, path[0], free=True, setup=True)
+    for eidx in edges:
+        assert game.build_road(0, eidx, free=True)
+    assert game.road_net.length(0) == 6
+    assert game.players[0].victory_points == 1 + catan.LONGEST_ROAD_POINTS
+    assert catan.LongestRoad(0, 5) in events
+
+    assert game.build_settlement(1, path[3], free=True, setup=True)
+    assert game.road_net.length(0) == 3
+    assert game.road_net.holder is None
+    assert game.players[0].victory_points == 1
+    assert events[-1] == catan.LongestRoad(None, 0)
+
+
+def test_legal_actions_match_rule_checks_throughout_a_game():
+    class CheckingAgent(catan.RandomAgent):
+        def choose_action(self, game, player_idx):
+            rich = {r: 9 for r in catan.RESOURCES}
+            hand = game.players[player_idx].hand
+            saved = dict(hand)
+            hand.update(rich)
+            actions = game.legal_actions(player_idx)
+            hand.update(saved)
+            cities, settlements, roads = scanned_builds(game, player_idx)
+            assert {a[1] for a in actions if a[0] == "city"} == cities
+            assert {a[1] for a in actions if a[0] == "settlement"} == settlements
+            assert {a[1] for a in actions if a[0] == "road"} == roads
+            assert len([a for a in actions if a[0] == "trade"]) == 20
+            return super().choose_action(game, player_idx)
+
+    game = catan.CatanGame(["Ann", "Ben", "Cal"], seed=8, agents=[CheckingAgent(i) for i in range(3)], verbose=False)
+    assert game.play(max_rounds=500) is not None
+
+
+def test_legal_actions_cover_setup_placements_and_affordability():
+    game = make_headless_game(seed=9)
+    assert len(game.legal_actions(0)) == len(game.nodes)
+
+    game.build_settlement(0, 10, free=True, setup=True)
+    game.phase, game.setup_node = catan.PHASE_SETUP_ROAD, 10
+    assert {a[1] for a in game.legal_actions(0)} == set(game.nodes[10].edges)
+
+    game.phase = catan.PHASE_MAIN
+    assert game.legal_actions(0) == [("end",)]
+    game.players[0].hand.update({"wood": 4, "brick": 1})
+    kinds = {a[0] for a in game.legal_actions(0)}
+    assert kinds == {"road", "trade", "end"}
+
+
+def state_key(state):
+    hands = [dict(h) for h in state.hands]
+    return (state.bits.snapshot(), state.road_net.snapshot(), hands, state.robber, state.current)
+
+
+def test_game_state_clone_is_independent():
+    game = make_headless_game(seed=12)
+    game.play(max_rounds=30)
+    state = game.snapshot()
+    copy = state.clone()
+
+    copy.hands[0]["ore"] += 5
+    copy.build_road(copy.current, next(iter(catan.iter_bits(copy.bits.road_frontier[copy.current]))), free=True)
+
+    assert state_key(state) == state_key(game.snapshot())
+    assert state_key(copy) != state_key(state)
+    assert [state.victory_points(i) for i in range(3)] == [p.victory_points for p in game.players]
+
+
+def test_game_state_undo_reverses_every_move_exactly():
+    game = make_headless_game(seed=13)
+    game.play(max_rounds=30)
+    state = game.snapshot()
+    for hand in state.hands:
+        hand.update({r: 10 for r in catan.RESOURCES})
+    start = state_key(state)
+    rng = catan.random.Random(0)
+
+    for _ in range(60):
+        actions = state.legal_actions()
+        state.apply(rng.choice(actions))
+        if rng.random() < 0.3:
+            state.distribute_resources(rng.randint(2, 12))
+        if rng.random() < 0.2:
+            state.move_robber(rng.randrange(len(game.tiles)))
+            victim = (state.current + 1) % 3
+            res = next(r for r in catan.RESOURCES if state.hands[victim][r] > 0)
+            state.steal(state.current, victim, res)
+    assert state_key(state) != start
+
+    while state.history:
+        state.undo()
+    assert state_key(state) == start
+
+
+def test_zobrist_hash_is_updated_incrementally_and_undone_exactly():
+    game = make_headless_game(seed=16)
+    game.play(max_rounds=25)
+    state = game.snapshot()
+    for hand in state.hands:
+        hand.update({r: 6 for r in catan.RESOURCES})
+    start = state.rehash()
+    rng = catan.random.Random(1)
+    seen = {start}
+
+    for _ in range(80):
+        state.apply(rng.choice(state.legal_actions()))
+        if rng.random() < 0.3:
+            state.distribute_resources(rng.randint(2, 12))
+        if rng.random() < 0.2:
+            state.move_robber(rng.choice([t for t in range(len(game.tiles)) if t != state.robber]))
+            victim = (state.current + 1) % 3
+            res = next((r for r in catan.RESOURCES if state.hands[victim][r] > 0), None)
+            if res is not None:
+                state.steal(state.current, victim, res)
+        incremental = state.zobrist
+        assert incremental == state.rehash()
+        seen.add(incremental)
+    assert len(seen) > 40
+
+    while state.history:
+        state.undo()
+        assert state.zobrist == state.rehash()
+    assert state.zobrist == start
+
+
+def test_transposed_move_orders_reach_the_same_hash():
+    game = make_headless_game(seed=17)
+    game.play(max_rounds=20)
+    first = game.snapshot()
+    first.hands[first.current].update({"wood": 4, "brick": 4, "ore": 8})
+    first.rehash()
+    second = first.clone()
+    a, b = list(catan.iter_bits(first.bits.road_frontier[first.current]))[:2]
+
+    for state, order in ((first, (a, b)), (second, (b, a))):
+        for edge in order:
+            state.apply(("road", edge))
+        state.apply(("trade", "ore", "wheat"))
+        state.apply(("end",))
+    assert first.zobrist == second.zobrist
+    first.undo()
+    assert first.zobrist != second.zobrist
+
+
+def road_path(topology, start, length, avoid):
+    """Edges of a simple path of length roads from node start that touches no node in avoid."""
+    def walk(node, path, seen):
+        if len(path) == length:
+            return path, seen
+        for eidx in sorted(topology.node_edges[node]):
+            nxt = next(n for n in topology.edge_ends[eidx] if n != node)
+            if nxt not in seen and nxt not in avoid:
+                found = walk(nxt, path + [eidx], seen | {nxt})
+                if found:
+                    return found
+        return None
+
+    return walk(start, [], {start})
+
+
+def test_longest_road_holder_is_part_of_the_hash():
+    game = catan.CatanGame(["A", "B", "C"], seed=1, agents=[catan.RandomAgent(i) for i in range(3)], verbose=False)
+    topo = game.topology
+    roads_a, used = road_path(topo, 0, catan.LONGEST_ROAD_MIN, set())
+    far = len(topo.node_points) - 1
+    roads_b, _ = road_path(topo, far, catan.LONGEST_ROAD_MIN, used)
+    first, second = game.snapshot(), game.snapshot()
+
+    for state, order in ((first, (0, 1)), (second, (1, 0))):
+        for pidx in order:
+            for eidx in (roads_a, roads_b)[pidx]:
+                state.build_road(pidx, eidx, free=True)
+    assert first.bits.snapshot() == second.bits.snapshot() and first.hands == second.hands
+    assert (first.road_net.holder, second.road_net.holder) == (0, 1)
+    assert first.zobrist != second.zobrist
+    assert first.zobrist == first.clone().rehash() and second.zobrist == second.clone().rehash()
+
+    for _ in roads_b:
+        first.undo()
+    assert first.road_net.holder == 0 and first.zobrist == first.clone().rehash()
+    for _ in roads_a:
+        first.undo()
+    assert first.zobrist == game.snapshot().zobrist
+
+
+def test_transposition_table_is_bounded_and_prefers_deep_results():
+    table = catan.TranspositionTable(capacity=8)
+    assert table.capacity == 8
+    same_bucket = [k << 2 | 1 for k in range(1, 4)]
+
+    table.store(same_bucket[0], depth=5, value=1.0, action=("end",))
+    table.store(same_bucket[1], depth=2, value=2.0)
+    assert table.probe(same_bucket[0]).depth == 5
+    assert table.probe(same_bucket[1]).value == 2.0
+
+    table.store(same_bucket[2], depth=1, value=3.0)
+    assert table.probe(same_bucket[0]) is not None
+    assert table.probe(same_bucket[1]) is None
+    table.store(same_bucket[2], depth=7, value=4.0, bound=catan.LOWER_BOUND)
+    assert table.probe(same_bucket[2]) == (same_bucket[2], 7, 4.0, catan.LOWER_BOUND, None)
+    assert table.probe(same_bucket[0]).value == 1.0
+
+    table.new_search()
+    table.store(same_bucket[1], depth=0, value=5.0)
+    assert table.probe(same_bucket[1]).value == 5.0
+    assert table.probe(same_bucket[2]).depth == 7
+
+    for key in range(1000):
+        table.store(key, depth=key % 4, value=0.0)
+    assert len(table) <= table.capacity
+    assert table.hits and table.misses
+
+
+@pytest.mark.parametrize("capacity", [2, 3, 5])
+def test_transposition_table_capacity_is_an_upper_bound(capacity):
+    table = catan.TranspositionTable(capacity=capacity)
+    for key in range(100):
+        table.store(key, depth=key % 3, value=0.0)
+
+    assert len(table) <= table.capacity <= capacity
+    with pytest.raises(ValueError):
+        catan.TranspositionTable(capacity=1)
+
+
+def test_game_state_roll_matches_live_production_index():
+    game = make_headless_game(seed=14)
+    game.play(max_rounds=30)
+
+    for roll in range(2, 13):
+        state = game.snapshot()
+        state.distribute_resources(roll)
+        expected = [dict(p.hand) for p in game.players]
+        for (pidx, res), amount in game.production[roll].items():
+            expected[pidx][res] += amount
+        assert state.hands == expected
+
+
+def test_event_log_round_trips_a_whole_game(tmp_path):
+    game = make_headless_game(seed=15)
+    seen = []
+    path = tmp_path / "game.log"
+    with open(path, "w") as fh:
+        game.events.subscribe(catan.EventLog(fh))
+        game.events.subscribe(seen.append)
+        winner = game.play(max_rounds=500)
+
+    with open(path) as fh:
+        replayed = list(catan.EventLog.read(fh))
+
+    assert replayed == seen
+    assert replayed[-1] == catan.GameWon(winner, game.players[winner].victory_points)
+    built = {e.edge for e in replayed if isinstance(e, catan.RoadBuilt) and e.player == 0}
+    assert built == game.players[0].roads
+
+
+def test_console_renderer_reproduces_terminal_messages():
+    lines = []
+    agents = [catan.RandomAgent(i) for i in range(3)]
+    game = catan.CatanGame(["Ann", "Ben", "Cal"], seed=3, agents=agents, verbose=False)
+    game.events.subscribe(catan.ConsoleRenderer([p.name for p in game.players], out=lines.append))
+
+    game.build_settlement(1, 20, free=True, setup=True)
+    game.build_settlement(1, 21, free=True, setup=True)
+    game.bank_trade(1, "wood", "ore")
+
+    assert lines == [
+        "Ben built settlement on node 20.",
+        "Distance rule violated (adjacent settlement/city).",
+        "Need 4 cards of the given resource.",
+    ]
+
+
+def test_null_sink_keeps_the_bus_empty():
+    game = make_headless_game(seed=16)
+    game.events.subscribe(catan.NullSink())
+
+    assert game.events.subscribers == []
@@ -0,0 +1,54 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import catan_batch  # noqa: E402
+
+
+def test_batch_results_do_not_depend_on_worker_count():
+    serial = list(catan_batch.run_batch(12, master_seed=3, workers=1, num_players=3))
+    pooled = list(catan_batch.run_batch(12, master_seed=3, workers=2, num_players=3, chunksize=2))
+
+    assert [r.index for r in pooled] == list(range(12))
+    assert serial == pooled
+    assert len({r.seed for r in serial}) == 12
+
+
+def test_batch_result_records_curve_and_production():
+    (result,) = catan_batch.run_batch(1, master_seed=9, workers=1, num_players=3)
+
+    assert result.winner is not None
+    assert result.vp_curve[-1][result.winner] >= 10
+    assert len(result.vp_curve) == result.rounds
+    assert all(sum(hand.values()) > 0 for hand in result.produced)
+
+
+def test_unfinished_games_report_the_rounds_they_played():
+    results = list(catan_batch.run_batch(3, master_seed=2, workers=1, num_players=3, max_rounds=4))
+
+    assert all(r.winner is None for r in results)
+    assert all(r.rounds == len(r.vp_curve) == 4 for r in results)
+
+
+def test_batch_stops_early_once_win_rates_are_tight():
+    results = list(
+        catan_batch.run_batch(10_000, master_seed=1, workers=1, num_players=3, ci_halfwidth=0.2, min_games=10)
+    )
+
+    stats = catan_batch.WinRates(3)
+    for result in results[:-1]:
+        stats.add(result)
+    assert stats.halfwidth() > 0.2
+    stats.add(results[-1])
+    assert stats.halfwidth() <= 0.2
+    assert 10 <= len(results) < 100
+
+
+def test_batch_does_not_stop_early_on_unfinished_games():
+    results = list(
+        catan_batch.run_batch(30, master_seed=1, workers=1, num_players=3, max_rounds=1, ci_halfwidth=0.2, min_games=10)
+    )
+
+    assert len(results) == 30
+    assert all(r.winner is None for r in results)
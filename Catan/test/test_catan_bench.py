@@ -0,0 +1,24 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import catan_bench  # noqa: E402
+
+
+def result(value, better="lower"):
+    return {"value": value, "unit": "us/op", "better": better}
+
+
+def test_compare_flags_only_regressions_beyond_tolerance():
+    baseline = {"results": {"a": result(10.0), "b": result(10.0), "c": result(100.0, "higher")}}
+    current = {"results": {"a": result(11.0), "b": result(14.0), "c": result(70.0, "higher")}}
+
+    assert catan_bench.compare(current, baseline, tolerance=0.25) == ["b", "c"]
+
+
+def test_benchmarks_produce_comparable_results():
+    current = catan_bench.run(["distribute_resources", "game_memory"])
+
+    assert set(current["results"]) == {"distribute_resources", "game_memory"}
+    assert catan_bench.compare(current, current, tolerance=0.0) == []
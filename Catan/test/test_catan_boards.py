@@ -0,0 +1,83 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import catan  # noqa: E402
+import catan_boards  # noqa: E402
+
+PIPS = {n: 6 - abs(7 - n) for n in range(2, 13)}
+
+
+def scalar_metrics(layout):
+    topo = layout.topology
+    index = {coord: tidx for tidx, coord in enumerate(topo.coords)}
+    pairs = [
+        (tidx, index[(q + dq, r + dr)])
+        for tidx, (q, r) in enumerate(topo.coords)
+        for dq, dr in catan_boards.HEX_DIRECTIONS
+        if (q + dq, r + dr) in index and index[(q + dq, r + dr)] > tidx
+    ]
+    numbers = layout.numbers
+    pips = [PIPS.get(n, 0) for n in numbers]
+    mean = sum(pips) / sum(n is not None for n in numbers)
+    return {
+        "red_pairs": sum(numbers[a] in (6, 8) and numbers[b] in (6, 8) for a, b in pairs),
+        "twin_pairs": sum(numbers[a] is not None and numbers[a] == numbers[b] for a, b in pairs),
+        "node_pips": max(sum(pips[t] for t in hexes) for hexes in topo.node_hexes),
+        "resource_share": [
+            sum(p for p, kind in zip(pips, layout.resources) if kind == res) / (layout.resources.count(res) * mean)
+            for res in catan.RESOURCES
+        ],
+    }
+
+
+@pytest.mark.parametrize("radius", [2, 3])
+def test_vectorized_scores_match_a_scalar_recount(radius):
+    kinds, numbers = catan_boards.deal(np.random.default_rng(radius), 50, radius)
+    metrics = catan_boards.score(kinds, numbers, radius)
+    library = catan_boards.LayoutLibrary(radius, kinds, numbers)
+
+    for row, layout in enumerate(library):
+        expected = scalar_metrics(layout)
+        counts = catan.resource_counts(len(layout.resources))
+        assert all(layout.resources.count(res) == n for res, n in counts.items())
+        assert metrics["red_pairs"][row] == expected["red_pairs"]
+        assert metrics["twin_pairs"][row] == expected["twin_pairs"]
+        assert metrics["node_pips"][row] == expected["node_pips"]
+        assert metrics["resource_share"][row] == pytest.approx(expected["resource_share"])
+
+
+def test_generated_library_meets_the_rules_and_round_trips(tmp_path):
+    rules = catan_boards.FairnessRules(max_node_pips=11)
+    library = catan_boards.generate(200, rules, seed=4, batch=2048)
+    assert len(library) == 200
+    assert np.array_equal(library.kinds, catan_boards.generate(200, rules, seed=4, batch=2048).kinds)
+
+    for layout in library:
+        metrics = scalar_metrics(layout)
+        assert metrics["red_pairs"] == metrics["twin_pairs"] == 0
+        assert metrics["node_pips"] <= 11
+        assert rules.min_resource_share <= min(metrics["resource_share"])
+        assert max(metrics["resource_share"]) <= rules.max_resource_share
+
+    path = str(tmp_path / "boards.npz")
+    library.save(path)
+    loaded = catan_boards.LayoutLibrary.load(path)
+    assert loaded.rules == rules and len(loaded) == len(library)
+    assert loaded.for_seed(9) == library.for_seed(9)
+
+    agents = [catan.RandomAgent(i) for i in range(3)]
+    game = catan.CatanGame(["A", "B", "C"], seed=9, agents=agents, verbose=False, layout=loaded.for_seed(9))
+    assert game.layout == loaded.for_seed(9)
+    game.play(max_rounds=20)
+
+
+def test_impossible_rules_give_up_with_an_error():
+    rules = catan_boards.FairnessRules(max_node_pips=3)
+    with pytest.raises(ValueError):
+        catan_boards.generate(1, rules, seed=0, batch=256, max_candidates=1024)
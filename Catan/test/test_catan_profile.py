@@ -0,0 +1,70 @@
+import io
+import signal
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import catan  # noqa: E402
+import catan_profile  # noqa: E402
+
+
+def play(seed, profiler=None):
+    agents = [catan.RandomAgent(seed * 10 + i) for i in range(4)]
+    game = catan.CatanGame(list("ABCD"), seed=seed, agents=agents, verbose=False, profiler=profiler)
+    seen = []
+    game.events.subscribe(seen.append)
+    winner = game.play(max_rounds=200)
+    return game, winner, seen
+
+
+def test_profiled_game_plays_the_same_and_counts_every_hot_call():
+    plain, winner, events = play(3)
+    profiler = catan_profile.GameProfiler()
+    game, profiled_winner, profiled_events = play(3, profiler)
+
+    assert profiled_winner == winner and profiled_events == events
+    assert not set(catan_profile.HOT_PATHS) & set(vars(plain))
+    kinds = [type(e).__name__ for e in events]
+    stats = profiler.stats
+    rolls = [e.roll for e in events if type(e) is catan.DiceRolled]
+    assert stats["distribute_resources"][0] == sum(r != 7 for r in rolls)
+    assert stats["discard_half"][0] == kinds.count("MustDiscard")
+    assert stats["move_robber"][0] >= kinds.count("RobberMoved")
+    assert stats["build_settlement"][0] >= kinds.count("SettlementBuilt")
+    assert stats["take_turn"][0] == len(rolls)
+    assert sum(stats[f"agent{s}.turn"][0] for s in range(4)) == len(rolls)
+    assert sum(stats[f"agent{s}.setup_settlement"][0] for s in range(4)) >= 8
+    for count, total, worst in stats.values():
+        assert count > 0 and 0 <= worst <= total
+
+
+def test_profiles_merge_into_an_aggregate_report():
+    profiles = list(catan_profile.profile_games(3, seed=2))
+    total = catan_profile.GameProfiler()
+    for profile in profiles:
+        total.merge_dict(profile.as_dict())
+
+    for name, (count, total_time, worst) in total.stats.items():
+        assert count == sum(p.stats.get(name, [0])[0] for p in profiles)
+        assert total_time == pytest.approx(sum(p.stats.get(name, [0, 0.0])[1] for p in profiles))
+        assert worst == max(p.stats.get(name, [0, 0.0, 0.0])[2] for p in profiles)
+    report = total.report(limit=5).splitlines()
+    assert len(report) == 6 and report[1].startswith("take_turn")
+
+
+@pytest.mark.skipif(not hasattr(signal, "setitimer"), reason="needs SIGPROF")
+def test_sampling_profiler_writes_folded_stacks():
+    with catan_profile.SamplingProfiler(interval=0.0005) as sampler:
+        while sum(sampler.samples.values()) < 20:
+            play(5)
+    out = io.StringIO()
+    sampler.write_collapsed(out)
+
+    lines = out.getvalue().splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) >= 1 and "test_catan_profile.py:" in stack
+    assert any("catan.py:" in line for line in lines)
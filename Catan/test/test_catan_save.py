@@ -0,0 +1,96 @@
+import copy
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import catan_save  # noqa: E402
+from catan import PHASE_MAIN, CatanGame, RandomAgent, SharedRandom, derive_seed  # noqa: E402
+
+NAMES = ["A", "B", "C", "D"]
+
+
+def random_agents(seed):
+    return [RandomAgent(derive_seed(seed, "agent", seat)) for seat in range(len(NAMES))]
+
+
+def test_loaded_save_plays_on_exactly_like_the_original():
+    game, _ = catan_save.recorded_game(NAMES, 5, random_agents(5))
+    assert game.play(max_rounds=15) is None
+    saved = catan_save.encode_state(game)
+    loaded = catan_save.load_game(saved, agents=copy.deepcopy([a.inner for a in game.agents]))
+
+    assert catan_save.encode_state(loaded) == saved
+    assert loaded.phase == PHASE_MAIN
+    assert loaded.production == game.production
+    assert loaded.robber_targets(0) == game.robber_targets(0)
+    assert loaded.bits.snapshot() == game.bits.snapshot()
+    assert [p.hand for p in loaded.players] == [p.hand for p in game.players]
+
+    assert loaded.play() == game.play()
+    assert catan_save.encode_state(loaded) == catan_save.encode_state(game)
+
+
+def test_saves_round_trip_seeds_outside_64_bits():
+    for seed in (-7, 2**70, "table 3"):
+        game = CatanGame(NAMES, seed=seed, agents=random_agents(seed), verbose=False)
+        game.play(max_rounds=5)
+        saved = catan_save.encode_state(game)
+        loaded = catan_save.load_game(saved, agents=random_agents(seed))
+
+        assert loaded.rng.getstate() == game.rng.getstate()
+        assert catan_save.encode_state(loaded) == saved
+
+
+def test_action_log_round_trips_a_negative_seed():
+    game, log = catan_save.recorded_game(NAMES, -12, random_agents(-12))
+    game.play(max_rounds=10)
+
+    assert catan_save.ActionLog.from_bytes(log.to_bytes()).seed == log.seed == game.rng.seed
+    assert catan_save.encode_state(catan_save.replay(log.to_bytes())) == catan_save.encode_state(game)
+
+
+def test_action_log_replays_to_the_same_final_position():
+    for seed, max_rounds in ((1, None), (2, None), (3, 12)):
+        game, log = catan_save.recorded_game(NAMES, seed, random_agents(seed))
+        game.play(max_rounds=max_rounds)
+
+        replayed = catan_save.replay(log.to_bytes())
+        assert catan_save.encode_state(replayed) == catan_save.encode_state(game)
+
+
+def test_single_stream_saves_and_logs_from_before_version_3_still_load():
+    log = catan_save.ActionLog(6, NAMES, version=2)
+    agents = [catan_save.RecordingAgent(agent, log) for agent in random_agents(6)]
+    game = CatanGame(NAMES, agents=agents, verbose=False, rng=SharedRandom(6))
+    game.play(max_rounds=20)
+
+    replayed = catan_save.replay(log.to_bytes())
+    assert isinstance(replayed.rng, SharedRandom)
+    assert catan_save.encode_state(replayed) == catan_save.encode_state(game)
+
+    saved = catan_save.decode_state(catan_save.encode_state(game))
+    assert saved.rng_kind == catan_save.RNG_SHARED
+    assert saved.to_game().rng.getstate() == game.rng.getstate()
+
+
+def test_archive_reader_maps_records_without_copying(tmp_path):
+    records = []
+    for seed in range(4):
+        game, log = catan_save.recorded_game(NAMES, seed, random_agents(seed))
+        game.play(max_rounds=8)
+        records += [log.to_bytes(), catan_save.encode_state(game)]
+    path = tmp_path / "games.bin"
+    with open(path, "wb") as fh:
+        writer = catan_save.ArchiveWriter(fh)
+        for record in records:
+            writer.write(record)
+
+    with catan_save.ArchiveReader(str(path)) as reader:
+        assert len(reader) == len(records)
+        assert [bytes(view) for view in reader] == records
+        view = reader[3]
+        assert isinstance(view, memoryview)
+        assert catan_save.decode_state(view).round_num == 9
+        assert catan_save.ActionLog.from_bytes(reader[2]).seed == 1
+        del view
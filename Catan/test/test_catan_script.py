@@ -0,0 +1,184 @@
+import builtins
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import catan_save  # noqa: E402
+from catan import Agent, CatanGame, RandomAgent, derive_seed, format_command  # noqa: E402
+from catan_script import ScriptDriver, run_script  # noqa: E402
+
+NAMES = ["A", "B", "C"]
+SEVEN_SEED = 6  # seat 0 has a tile where both opponents have a building
+
+
+class Transcript:
+    """Script lines for the decisions of a game, merging each seat's discards into one command."""
+
+    def __init__(self):
+        self.lines = []
+        self.discards = []
+        self.discard_seat = None
+
+    def add(self, line):
+        if self.discards:
+            self.lines.append("discard " + " ".join(self.discards))
+            self.discards = []
+        self.lines.append(line)
+
+    def discard(self, seat, res):
+        if seat != self.discard_seat:
+            self.add("# discards")
+            self.discard_seat = seat
+        self.discards.append(res)
+
+
+class TranscriptAgent(Agent):
+    def __init__(self, inner, transcript):
+        self.inner = inner
+        self.transcript = transcript
+
+    def before_roll(self, game, player_idx):
+        self.transcript.add("roll")
+
+    def choose_setup_settlement(self, game, player_idx):
+        nidx = self.inner.choose_setup_settlement(game, player_idx)
+        self.transcript.add(f"build settlement {nidx}")
+        return nidx
+
+    def choose_setup_road(self, game, player_idx, node_idx):
+        eidx = self.inner.choose_setup_road(game, player_idx, node_idx)
+        self.transcript.add(f"build road {eidx}")
+        return eidx
+
+    def choose_action(self, game, player_idx):
+        action = self.inner.choose_action(game, player_idx)
+        self.transcript.add(format_command(action))
+        return action
+
+    def choose_discard(self, game, player_idx, remaining):
+        res = self.inner.choose_discard(game, player_idx, remaining)
+        self.transcript.discard(player_idx, res)
+        return res
+
+    def choose_robber_tile(self, game, player_idx):
+        self.transcript.discard_seat = None
+        tidx = self.inner.choose_robber_tile(game, player_idx)
+        self.transcript.add(f"robber {tidx}")
+        return tidx
+
+    def choose_victim(self, game, player_idx, victims):
+        vidx = self.inner.choose_victim(game, player_idx, victims)
+        if len(victims) > 1:
+            self.transcript.add(f"victim {vidx}")
+        return vidx
+
+
+def recorded_script(seed, max_rounds=None):
+    transcript = Transcript()
+    agents = [TranscriptAgent(RandomAgent(derive_seed(seed, "agent", s)), transcript) for s in range(len(NAMES))]
+    game = CatanGame(NAMES, seed=seed, agents=agents, verbose=False)
+    winner = game.play(max_rounds=max_rounds)
+    transcript.add("# end of game")
+    return game, winner, transcript.lines
+
+
+def test_script_replays_a_recorded_game_without_touching_stdio(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("script mode touched stdio")
+
+    monkeypatch.setattr(builtins, "input", fail)
+    monkeypatch.setattr(builtins, "print", fail)
+    for seed, max_rounds in ((1, None), (2, None), (3, 15)):
+        game, winner, lines = recorded_script(seed, max_rounds)
+
+        driver = ScriptDriver(CatanGame(NAMES, seed=seed, verbose=False))
+        results = list(driver.run(iter(lines)))
+
+        assert all(r.ok for r in results), [r for r in results if not r.ok][:3]
+        assert len(results) == sum(1 for line in lines if not line.startswith("#"))
+        assert driver.winner == winner
+        assert driver.finished == (winner is not None)
+        assert catan_save.encode_state(driver.game) == catan_save.encode_state(game)
+
+
+def test_commands_are_checked_against_the_waiting_decision():
+    game = CatanGame(NAMES, seed=4, verbose=False)
+    node, edge = next((n, e) for n in range(len(game.nodes)) for e in game.nodes[n].edges)
+    script = [
+        "roll",
+        "build settlement 9999",
+        "",
+        "# comments are skipped",
+        f"build road {edge}",
+        f"build settlement {node}",
+        f"build settlement {node}",
+        f"build road {edge}",
+    ]
+
+    results = run_script(game, script)
+
+    assert [(r.line, r.prompt, r.ok) for r in results] == [
+        (1, "setup_settlement", False),
+        (2, "setup_settlement", False),
+        (5, "setup_settlement", False),
+        (6, "setup_settlement", True),
+        (7, "setup_road", False),
+        (8, "setup_road", True),
+    ]
+    assert results[0].error == "Unknown command."
+    assert results[1].error == "Invalid node id."
+    assert results[4].error == "Expected: build road <id>."
+    assert game.players[0].settlements == {node}
+    assert game.players[0].roads == {edge}
+    assert results[-1].seat == 0
+
+
+def test_forced_seven_asks_for_discards_robber_and_victim_in_turn():
+    _, _, lines = recorded_script(SEVEN_SEED, max_rounds=1)
+    driver = ScriptDriver(CatanGame(NAMES, seed=SEVEN_SEED, verbose=False))
+    list(driver.run(lines[: lines.index("roll")]))
+    game = driver.game
+    assert driver.prompt == (0, "roll")
+    for player in game.players:
+        player.hand.update(dict.fromkeys(player.hand, 2))
+    game.players[1].hand["ore"] = 0
+    tile = next(t.idx for t in game.tiles if t.idx != game.robber_tile and len(game.robber_victims(0, t.idx)) > 1)
+    victim = game.robber_victims(0, tile)[-1]
+
+    results = list(
+        driver.run(
+            [
+                "roll 7",
+                "discard wood brick sheep wheat ore",
+                "discard ore wood brick sheep",
+                "discard wood brick sheep wheat",
+                "discard wood brick sheep wheat ore",
+                f"robber {game.robber_tile}",
+                f"robber {tile}",
+                "victim 0",
+                f"victim {victim}",
+                "roll",
+                "end",
+            ]
+        )
+    )
+
+    assert [(r.seat, r.prompt, r.ok) for r in results] == [
+        (0, "roll", True),
+        (0, "discard", True),
+        (1, "discard", False),
+        (1, "discard", True),
+        (2, "discard", True),
+        (0, "robber", False),
+        (0, "robber", True),
+        (0, "victim", False),
+        (0, "victim", True),
+        (0, "action", False),
+        (0, "action", True),
+    ]
+    assert results[2].error == "Expected: discard followed by 4 resources from your hand."
+    assert results[9].error == "Unknown command."
+    assert game.robber_tile == tile
+    assert [p.resource_count for p in game.players] == [6, 4 - (victim == 1), 5 - (victim == 2)]
+    assert driver.prompt == (1, "roll")
@@ -0,0 +1,206 @@
+import asyncio
+import json
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import catan_server  # noqa: E402
+
+
+class Client:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, port):
+        return cls(*await asyncio.open_connection("127.0.0.1", port))
+
+    async def send(self, line):
+        self.writer.write(line.encode() + b"\n")
+        await self.writer.drain()
+
+    async def recv(self):
+        line = await asyncio.wait_for(self.reader.readline(), 5)
+        assert line, "server closed the connection"
+        return json.loads(line)
+
+    async def until(self, kind):
+        while True:
+            message = await self.recv()
+            if message[0] == kind:
+                return message
+
+    def close(self):
+        self.writer.close()
+
+
+def answer(rng, prompt):
+    """A random legal reply to one Prompt message."""
+    _, _, kind, *details = prompt
+    if kind in ("setup_settlement", "setup_road"):
+        return f"build {kind[6:]} {rng.choice(details[0])}"
+    if kind == "roll":
+        return "roll"
+    if kind == "action":
+        options = [c for c in details[0] if c != "end"]
+        return rng.choice(options) if options and rng.random() < 0.8 else "end"
+    if kind == "discard":
+        count, hand = details
+        cards = [res for res, n in hand.items() for _ in range(n)]
+        return "discard " + " ".join(rng.sample(cards, count))
+    if kind == "robber":
+        return f"robber {rng.choice([t for t in range(19) if t != details[0]])}"
+    return f"victim {rng.choice(details[0])}"
+
+
+async def seat_players(port, room, count):
+    clients, tokens = [], []
+    for seat in range(count):
+        client = await Client.connect(port)
+        await client.send(f"join {room} P{seat}")
+        joined = await client.until("Joined")
+        assert joined[1:3] == [room, seat]
+        clients.append(client)
+        tokens.append(joined[3])
+    return clients, tokens
+
+
+async def play_until(client, seat, rounds, rng, errors):
+    while True:
+        message = await client.recv()
+        if message[0] == "Error":
+            errors.append(message)
+        elif message[0] == "GameWon" or message[0] == "TurnStarted" and message[1] > rounds:
+            return
+        elif message[0] == "Prompt" and message[1] == seat:
+            await client.send(answer(rng, message))
+
+
+def test_rooms_play_concurrently_over_tcp():
+    async def scenario():
+        host = catan_server.CatanServer(seed=1)
+        server = await host.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        errors = []
+        games = []
+        for room in ("a", "b"):
+            clients, _ = await seat_players(port, room, 3)
+            await clients[0].send("start")
+            games.append([play_until(c, seat, 6, random.Random(seat), errors) for seat, c in enumerate(clients)])
+        await asyncio.gather(*(task for tasks in games for task in tasks))
+        assert errors == []
+        assert all(host.rooms[room].game.round_num > 6 for room in ("a", "b"))
+        assert host.rooms["a"].game.layout != host.rooms["b"].game.layout
+        await host.close()
+
+    asyncio.run(scenario())
+
+
+def test_dropped_seat_rejoins_and_is_prompted_again():
+    async def scenario():
+        host = catan_server.CatanServer(seed=2)
+        server = await host.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        clients, tokens = await seat_players(port, "r", 3)
+        await clients[1].send("start")
+        assert (await clients[1].until("Error"))[1] == "Only seat 0 can start the game."
+        await clients[0].send("start")
+        prompt = await clients[0].until("Prompt")
+        assert prompt[1:3] == [0, "setup_settlement"]
+        await clients[1].send("build settlement 0")
+        assert (await clients[1].until("Error"))[1] == "Not your turn."
+
+        clients[0].close()
+        await asyncio.sleep(0.05)
+        assert host.rooms["r"].seats[0].conn is None
+        back = await Client.connect(port)
+        await back.send(f"rejoin r 0 {tokens[1]}")
+        assert (await back.until("Error"))[1] == "No such seat."
+        await back.send(f"rejoin r 0 {tokens[0]}")
+        assert (await back.until("Joined"))[2] == 0
+        assert await back.until("Prompt") == prompt
+
+        await back.send(f"build settlement {prompt[3][0]}")
+        assert (await back.until("SettlementBuilt"))[1:] == [0, prompt[3][0]]
+        assert (await back.until("Prompt"))[1:3] == [0, "setup_road"]
+        await host.close()
+
+    asyncio.run(scenario())
+
+
+def test_prompt_details_only_go_to_the_prompted_seat():
+    async def record(client, seat, rng, seen):
+        while True:
+            message = await client.recv()
+            if message[0] == "Prompt":
+                seen.append((seat, message))
+                if message[1] == seat:
+                    await client.send(answer(rng, message))
+            elif message[0] == "GameWon" or message[0] == "TurnStarted" and message[1] > 4:
+                return
+
+    async def scenario():
+        host = catan_server.CatanServer(seed=4)
+        server = await host.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        clients, tokens = await seat_players(port, "p", 3)
+        await clients[0].send("start")
+        assert len(await clients[0].until("Prompt")) > 3
+        clients[2].close()
+        await asyncio.sleep(0.05)
+        back = await Client.connect(port)
+        await back.send(f"rejoin p 2 {tokens[2]}")
+        assert await back.until("Prompt") == ["Prompt", 0, "setup_settlement"]
+
+        await clients[0].send(f"build settlement {host.rooms['p'].prompt[3][0]}")
+        seen = []
+        clients[2] = back
+        await asyncio.gather(*(record(c, seat, random.Random(seat), seen) for seat, c in enumerate(clients)))
+        assert {m[2] for _, m in seen} >= {"setup_road", "roll", "action"}
+        assert all(len(m) == 3 for seat, m in seen if m[1] != seat)
+        assert all(len(m) > 3 for seat, m in seen if m[1] == seat and m[2] != "roll")
+        await host.close()
+
+    asyncio.run(scenario())
+
+
+def test_stolen_card_is_only_shown_to_thief_and_victim():
+    async def scenario():
+        host = catan_server.CatanServer(seed=3)
+        server = await host.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        clients, _ = await seat_players(port, "s", 3)
+        await clients[0].send("start")
+        await clients[0].until("Prompt")
+
+        host.rooms["s"].publish(catan_server.Stolen(2, 0, "ore"))
+        seen = [await client.until("Stolen") for client in clients]
+        assert seen == [["Stolen", 2, 0, "ore"], ["Stolen", 2, 0, None], ["Stolen", 2, 0, "ore"]]
+        await host.close()
+
+    asyncio.run(scenario())
+
+
+def test_idle_rooms_are_evicted():
+    async def scenario():
+        host = catan_server.CatanServer(idle_timeout=60.0)
+        server = await host.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        (client,), _ = await seat_players(port, "quiet", 1)
+        (busy,), _ = await seat_players(port, "busy", 1)
+        now = asyncio.get_running_loop().time()
+
+        assert host.evict_idle(now + 30) == []
+        host.rooms["busy"].last_active = now + 50
+        assert host.evict_idle(now + 61) == ["quiet"]
+        assert await client.until("Closed") == ["Closed", "quiet", "Idle room evicted."]
+        assert list(host.rooms) == ["busy"]
+
+        await client.send("join fresh P0")
+        assert (await client.until("Joined"))[1] == "fresh"
+        await host.close()
+
+    asyncio.run(scenario())
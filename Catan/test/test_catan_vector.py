@@ -0,0 +1,139 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import catan  # noqa: E402
+import catan_vector  # noqa: E402
+
+
+class ReplayAgent(catan.Agent):
+    """Scalar seat that makes whatever decision the vector engine just made."""
+
+    def __init__(self):
+        self.robber_tile = -1
+        self.victim = -1
+
+    def choose_discard(self, game, player_idx, remaining):
+        hand = game.players[player_idx].hand
+        return max(catan.RESOURCES, key=lambda r: hand[r])
+
+    def choose_robber_tile(self, game, player_idx):
+        return self.robber_tile
+
+    def choose_victim(self, game, player_idx, victims):
+        assert self.victim in victims
+        return self.victim
+
+
+class StolenCard:
+    def __init__(self, resource):
+        self.resource = resource
+
+    def steal(self, hand):
+        assert hand[self.resource] > 0
+        return self.resource
+
+
+def replay_step(game, engine, b, roll):
+    pidx = game.current_player
+    if roll == 7:
+        for agent in game.agents:
+            agent.robber_tile = int(engine.last_robber[b])
+            agent.victim = int(engine.last_victim[b])
+        rng = game.rng
+        if engine.last_stolen[b] >= 0:
+            game.rng = StolenCard(catan.RESOURCES[engine.last_stolen[b]])
+        game.handle_roll_seven(pidx)
+        game.rng = rng
+        assert game.robber_tile == engine.robber[b]
+    else:
+        game.distribute_resources(int(roll))
+
+    for games, kinds, targets in engine.last_actions:
+        for kind, target in zip(kinds[games == b], targets[games == b]):
+            target = int(target)
+            if kind == catan_vector.CITY:
+                assert game.build_city(pidx, target)
+            elif kind == catan_vector.SETTLEMENT:
+                assert game.build_settlement(pidx, target)
+            elif kind == catan_vector.ROAD:
+                assert game.build_road(pidx, target)
+            else:
+                give, get = divmod(target, len(catan.RESOURCES))
+                assert game.bank_trade(pidx, catan.RESOURCES[give], catan.RESOURCES[get])
+
+    if engine.winner[b] == pidx:
+        assert game.players[pidx].victory_points >= catan.WINNING_POINTS
+        return True
+    game.current_player = (pidx + 1) % len(game.players)
+    return False
+
+
+def test_vector_engine_matches_scalar_rules_on_shared_seeds():
+    games = []
+    for seed in range(12):
+        agents = [catan.RandomAgent(seed + i) for i in range(4)]
+        game = catan.CatanGame(["A", "B", "C", "D"], seed=seed, agents=agents, verbose=False)
+        game.setup_phase()
+        game.agents = [ReplayAgent() for _ in range(4)]
+        games.append(game)
+    engine = catan_vector.VectorEngine.from_games(games, seed=5)
+    finished = [False] * len(games)
+
+    for _ in range(2000):
+        live = engine.active.copy()
+        assert list(engine.current[live]) == [g.current_player for g, a in zip(games, live) if a]
+        rolls = engine.step()
+        for b, game in enumerate(games):
+            if not live[b]:
+                continue
+            finished[b] = replay_step(game, engine, b, rolls[b])
+            assert engine.hands[b].tolist() == [[p.hand[r] for r in catan.RESOURCES] for p in game.players]
+            assert engine.victory_points()[b].tolist() == [p.victory_points for p in game.players]
+        if not engine.active.any():
+            break
+
+    assert sum(finished) >= 10
+    for b, game in enumerate(games):
+        if finished[b]:
+            assert engine.winner[b] == game.current_player
+
+
+def test_vector_engine_runs_a_batch_to_completion():
+    engine = catan_vector.VectorEngine.random(64, 3, seed=1)
+    engine.setup()
+
+    winners = engine.run(max_rounds=500)
+
+    assert (winners >= 0).mean() > 0.9
+    vp = engine.victory_points()
+    done = winners >= 0
+    assert (vp[done, winners[done]] >= catan.WINNING_POINTS).all()
+    assert (engine.hands >= 0).all()
+
+
+def test_longest_road_bounds_hold_and_the_holder_is_longest():
+    engine = catan_vector.VectorEngine.random(48, 4, seed=3)
+    engine.setup()
+    trails = catan.RoadNetworks(catan.board_topology(2), 4)
+
+    for _ in range(40):
+        engine.step()
+        for b in range(engine.B):
+            owners = engine.node_owner[b, : engine.N]
+            lengths = []
+            for pidx in range(engine.P):
+                roads = sum(1 << int(e) for e in np.flatnonzero(engine.edge_owner[b, : engine.E] == pidx))
+                blocked = sum(1 << int(n) for n in np.flatnonzero((owners >= 0) & (owners != pidx)))
+                lengths.append(trails.longest_road(roads, blocked))
+            assert (engine.road_lo[b] <= lengths).all() and (lengths <= engine.road_hi[b]).all()
+            holder = engine.longest_road[b]
+            if holder >= 0:
+                assert lengths[holder] == max(lengths) >= catan.LONGEST_ROAD_MIN
+            else:
+                assert max(lengths) < catan.LONGEST_ROAD_MIN